@@ -0,0 +1,6 @@
+# benchmarks/__init__.py
+"""
+Bộ benchmark offline của pipeline: dữ liệu tổng hợp (synthetic), các thành phần
+giả lập Ollama/embedding/vector store (fakes) và trình chạy đo từng giai đoạn (run).
+Chạy bằng `python -m benchmarks.run` hoặc `bash scripts/run_benchmark.sh`.
+"""
@@ -0,0 +1,172 @@
+# benchmarks/fakes.py
+"""
+Các thành phần giả lập tất định dùng cho benchmark, thay cho Ollama, mô hình embedding
+và Qdrant, với độ trễ cấu hình được. Nhờ đó benchmark chạy offline, lặp lại được và đo
+đúng chi phí của code pipeline (chia lô, song song, cache, ...) thay vì của dịch vụ ngoài.
+"""
+
+import hashlib
+import json
+import re
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from src.embedding.model import EmbeddingModel
+from src.vectordb.backend import VectorBackend, VectorBatch
+
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _approx_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class FakeLLM:
+    """
+    LLM giả lập: phản hồi chỉ phụ thuộc vào prompt. Độ trễ mô phỏng một model chạy CPU:
+    prefill tỉ lệ với số token của prompt, sinh token tỉ lệ với số token trả về.
+    Hỗ trợ `invoke` và `stream` (mỗi token một đoạn) như OllamaLLM.
+    """
+    def __init__(self, prefill_ms_per_token: float = 0.05, generate_ms_per_token: float = 1.0,
+                 trailing_tokens: int = 30):
+        self.model = "fake-llm"
+        self.temperature = 0.0
+        self.prefill_s = prefill_ms_per_token / 1000
+        self.generate_s = generate_ms_per_token / 1000
+        # Phần đuôi thừa sau JSON mà model thật hay sinh thêm (để đo hiệu quả dừng sớm)
+        self.trailing_tokens = trailing_tokens
+        self.calls = 0
+
+    def _respond(self, prompt: str) -> str:
+        seed = _stable_hash(prompt)
+        if "correct_answers" in prompt:
+            letters = sorted({"ABCD"[seed % 4], "ABCD"[(seed >> 8) % 4]})[: 1 + (seed >> 16) % 2]
+            answer = {
+                "reasoning": "Đối chiếu từng lựa chọn với tài liệu tham khảo.",
+                "analysis": {k: ("Đúng" if k in letters else "Sai") + " - theo tài liệu" for k in "ABCD"},
+                "correct_count": len(letters),
+                "correct_answers": letters,
+            }
+            return json.dumps(answer, ensure_ascii=False) + " Ghi chú thêm" * self.trailing_tokens
+        if "best sentence to split at" in prompt:
+            window = len(re.findall(r"^\d+\. ", prompt, flags=re.MULTILINE))
+            return str(2 + seed % max(1, window - 2))
+        if "PROPOSITIONS:" in prompt:
+            text = prompt.split("---")[1]
+            return "\n".join(s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if s.strip())
+        return "OK"
+
+    def _tokens(self, response: str) -> List[str]:
+        return re.findall(r"\S+\s*", response) or [response]
+
+    def invoke(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        response = self._respond(prompt)
+        time.sleep(self.prefill_s * _approx_tokens(prompt) + self.generate_s * len(self._tokens(response)))
+        return response
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        self.calls += 1
+        response = self._respond(prompt)
+        time.sleep(self.prefill_s * _approx_tokens(prompt))
+        for token in self._tokens(response):
+            time.sleep(self.generate_s)
+            yield token
+
+
+class FakeSentenceTransformer:
+    """
+    Thay cho SentenceTransformer: vector là tổng các vector ngẫu nhiên (tất định) của từng từ,
+    nên văn bản chung từ vựng có cosine cao - đủ để tìm kiếm và semantic chunking có ý nghĩa.
+    Độ trễ tỉ lệ với (số văn bản x độ dài dài nhất), như một forward pass có padding.
+    """
+    def __init__(self, dimension: int = 384, ms_per_padded_token: float = 0.002, max_seq_length: int = 512):
+        self.dimension = dimension
+        self.max_seq_length = max_seq_length
+        self.seconds_per_padded_token = ms_per_padded_token / 1000
+        self._word_vectors: Dict[str, np.ndarray] = {}
+
+    def _word_vector(self, word: str) -> np.ndarray:
+        vector = self._word_vectors.get(word)
+        if vector is None:
+            vector = np.random.default_rng(_stable_hash(word)).standard_normal(self.dimension).astype(np.float32)
+            self._word_vectors[word] = vector
+        return vector
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True) -> np.ndarray:
+        longest = max((min(self.max_seq_length, _approx_tokens(t)) for t in texts), default=0)
+        time.sleep(self.seconds_per_padded_token * longest * len(texts))
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split()[:self.max_seq_length]:
+                embeddings[row] += self._word_vector(word)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.where(norms == 0, 1.0, norms)
+
+
+class FakeEmbeddingModel(EmbeddingModel):
+    """EmbeddingModel thật (chia lô theo độ dài, ma trận float32) chạy trên FakeSentenceTransformer."""
+
+    def __init__(self, dimension: int = 384, ms_per_padded_token: float = 0.002):
+        self._fake = FakeSentenceTransformer(dimension, ms_per_padded_token)
+        super().__init__(model_name="fake-embedding", use_cache=False, backend="torch")
+
+    def _load_model(self, backend: str):
+        return self._fake
+
+
+class LatencyBackend(VectorBackend):
+    """Bọc một VectorBackend (thường là LocalBackend trong thư mục tạm) và thêm độ trễ mạng giả lập mỗi request."""
+
+    def __init__(self, backend: VectorBackend, request_ms: float = 1.0):
+        self.backend = backend
+        self.request_s = request_ms / 1000
+        self.delete_batch_size = backend.delete_batch_size
+
+    def _delay(self):
+        if self.request_s > 0:
+            time.sleep(self.request_s)
+
+    def collection_exists(self, collection_name: str) -> bool:
+        self._delay()
+        return self.backend.collection_exists(collection_name)
+
+    def create_collection(self, collection_name: str, dimension: int, quantization: str = "none"):
+        self._delay()
+        return self.backend.create_collection(collection_name, dimension, quantization)
+
+    def recreate_collection(self, collection_name: str, dimension: int, quantization: str = "none"):
+        self._delay()
+        return self.backend.recreate_collection(collection_name, dimension, quantization)
+
+    def upsert(self, collection_name: str, ids: List[str], vectors: VectorBatch,
+               payloads: List[Dict[str, Any]], wait: bool = True):
+        self._delay()
+        return self.backend.upsert(collection_name, ids, vectors, payloads, wait=wait)
+
+    def delete(self, collection_name: str, ids: List[str]):
+        self._delay()
+        return self.backend.delete(collection_name, ids)
+
+    def count(self, collection_name: str) -> int:
+        self._delay()
+        return self.backend.count(collection_name)
+
+    def search(self, collection_name: str, query_vectors: VectorBatch, limit: int,
+               score_threshold: Optional[float] = None):
+        self._delay()
+        return self.backend.search(collection_name, query_vectors, limit, score_threshold)
+
+    def collection_info(self, collection_name: str) -> dict:
+        return self.backend.collection_info(collection_name)
+
+    def memory_footprint(self, collection_name: str) -> Dict[str, Any]:
+        return self.backend.memory_footprint(collection_name)
@@ -0,0 +1,447 @@
+# benchmarks/run.py
+"""
+Benchmark tái lập được cho pipeline, chạy hoàn toàn offline:
+dữ liệu tổng hợp (benchmarks.synthetic) và các thành phần giả lập Ollama, mô hình
+embedding, Qdrant với độ trễ cấu hình được (benchmarks.fakes).
+
+Các giai đoạn được đo (throughput và latency, lặp lại --repeat lần):
+- pdf: PDFMarkdownConverter.convert trên PDF tổng hợp (trang/giây).
+- chunking.<strategy>: từng chiến lược trong STRATEGIES (ký tự/giây).
+- embedding: EmbeddingModel.encode (văn bản/giây).
+- index: index_documents vào vector store cục bộ.
+- retrieval: HybridRetriever.retrieve (latency mỗi truy vấn) và retrieve_batch.
+- qa: vòng lặp QAHandler.process_questions_csv (câu hỏi/giây).
+
+Kết quả được ghi ra file JSON và so sánh với baseline theo ngưỡng trong
+benchmarks/thresholds.json; trả mã lỗi 1 nếu có giai đoạn chậm hơn ngưỡng cho phép.
+
+Cách dùng:
+    python -m benchmarks.run --profile smoke
+    python -m benchmarks.run --save-baseline
+    python -m benchmarks.run --baseline benchmarks/results/baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCHMARK_DIR.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# Cấu hình cố định của benchmark (ghi đè .env mà các module gọi load_dotenv() đọc), để kết quả
+# chỉ phụ thuộc vào code. Giá trị là mặc định trong code; đổi bằng --env KEY=VALUE
+# (được ghi vào config của kết quả, nên so sánh với baseline khác cấu hình sẽ có cảnh báo).
+BENCHMARK_ENV = {
+    # Đo cùng một lượng công việc ở mọi lần chạy: tắt các cache/tiến độ lưu trên đĩa
+    "PROPOSITIONS_PROGRESS_DIR": "",
+    "LLM_WINDOW_TIME_BUDGET": "0",
+    "EMBEDDING_CACHE": "false",
+    "LLM_CACHE": "false",
+    # PDF, chunking, embedding, index
+    "PDF_WORKERS": "1",
+    "PDF_PAGES_PER_TASK": "32",
+    "SEMANTIC_WINDOW_SIZE": "256",
+    "SEMANTIC_LOCAL_WINDOW": "0",
+    "LLM_WINDOW_MAX_IN_FLIGHT": "4",
+    "PROPOSITIONAL_SEGMENT_CHARS": "2000",
+    "PROPOSITIONAL_MAX_IN_FLIGHT": "4",
+    "EMBEDDING_MAX_BATCH_TOKENS": "16384",
+    "INDEX_BATCH_SIZE": "128",
+    "INDEX_UPLOAD_WORKERS": "2",
+    "INDEX_MAX_PENDING_BATCHES": "4",
+    "VECTOR_QUANTIZATION": "none",
+    "VECTOR_RESCORE_OVERSAMPLING": "2.0",
+    "LOCAL_MAX_PENDING_POINTS": "32768",
+    # QA
+    "QA_BATCH_SIZE": "32",
+    "LLM_MAX_IN_FLIGHT": "4",
+    "LLM_MAX_RETRIES": "3",
+    "QA_STREAMING": "true",
+    "QA_MAX_NEW_TOKENS": "1024",
+    "QA_PROMPT_LAYOUT": "classic",
+    "MAX_CONTEXT_TOKENS": "2000",
+    "TRACE_ENABLED": "true",
+    "TRACE_MEMORY": "false",
+}
+os.environ.update(BENCHMARK_ENV)
+
+from benchmarks import synthetic  # noqa: E402
+from benchmarks.fakes import FakeEmbeddingModel, FakeLLM, LatencyBackend  # noqa: E402
+from src.telemetry.tracing import TRACER  # noqa: E402
+
+PROFILES = {
+    # Chạy nhanh (vài giây) để kiểm tra benchmark còn chạy được
+    "smoke": {"pdfs": 1, "pages": 4, "documents": 2, "sections": 6, "questions": 6, "repeat": 1},
+    "default": {"pdfs": 2, "pages": 20, "documents": 5, "sections": 20, "questions": 30, "repeat": 3},
+    "large": {"pdfs": 4, "pages": 60, "documents": 20, "sections": 40, "questions": 100, "repeat": 3},
+}
+
+DEFAULT_BASELINE = BENCHMARK_DIR / "results" / "baseline.json"
+DEFAULT_OUTPUT = BENCHMARK_DIR / "results" / "latest.json"
+DEFAULT_THRESHOLDS = BENCHMARK_DIR / "thresholds.json"
+
+
+class StageSkipped(Exception):
+    """Giai đoạn không chạy được trong môi trường hiện tại (ví dụ thiếu thư viện)."""
+
+
+def _quiet(verbose: bool):
+    # Pipeline in rất nhiều log; ẩn đi để không làm nhiễu kết quả
+    return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))]
+
+
+def _summarize(durations: List[float], units: float, unit: str, samples: Optional[List[float]] = None) -> Dict[str, Any]:
+    """Thống kê của một giai đoạn; `samples` là latency từng thao tác (ví dụ từng truy vấn) nếu có."""
+    p50 = statistics.median(durations)
+    result = {
+        "repeat": len(durations),
+        "p50_s": round(p50, 6),
+        "mean_s": round(statistics.fmean(durations), 6),
+        "min_s": round(min(durations), 6),
+        "max_s": round(max(durations), 6),
+        "units": units,
+        "unit": unit,
+        "throughput_per_s": round(units / p50, 3) if p50 > 0 else None,
+    }
+    if samples:
+        result["latency_p50_ms"] = round(_percentile(samples, 0.50) * 1000, 3)
+        result["latency_p95_ms"] = round(_percentile(samples, 0.95) * 1000, 3)
+    return result
+
+
+class BenchmarkRunner:
+    """Chuẩn bị dữ liệu tổng hợp, các thành phần giả lập và đo từng giai đoạn."""
+
+    def __init__(self, config: Dict[str, Any], work_dir: Path, verbose: bool = False):
+        self.config = config
+        self.work_dir = work_dir
+        self.verbose = verbose
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.corpus = synthetic.generate_corpus(config["documents"], config["sections"],
+                                                config["table_density"], seed=config["seed"])
+        self.questions = synthetic.generate_questions(self.corpus, config["questions"], seed=config["seed"])
+        self.embedder = FakeEmbeddingModel(ms_per_padded_token=config["embed_ms_per_token"])
+        self.llm = FakeLLM(prefill_ms_per_token=config["llm_prefill_ms_per_token"],
+                           generate_ms_per_token=config["llm_generate_ms_per_token"])
+        self._vector_store = None
+        self._retriever = None
+
+    def _install_embedding_fake(self):
+        """Các module pipeline lấy model embedding qua singleton: thay bằng bản giả lập."""
+        import src.embedding.model as embedding_module
+        embedding_module._embedding_model_instance = self.embedder
+
+    def _install_fakes(self):
+        """Thay cả model embedding và LLM (singleton của get_llm) bằng bản giả lập."""
+        self._install_embedding_fake()
+        try:
+            import src.llm.client as llm_client
+        except ImportError as e:
+            raise StageSkipped(f"thiếu thư viện LLM ({e})")
+        llm_client._llm_instance = self.llm
+
+    def measure(self, name: str, fn: Callable[[], Any], units: float, unit: str,
+                per_call_samples: bool = False):
+        """
+        Chạy `fn` một lần khởi động rồi --repeat lần có đo. Nếu `per_call_samples`,
+        `fn` trả về danh sách latency từng thao tác để tính p50/p95 theo thao tác.
+        """
+        print(f"  ▶ {name} ...", end=" ", flush=True)
+        try:
+            with _quiet(self.verbose):
+                fn()  # Khởi động: import, JIT của thư viện, cache của hệ điều hành
+                durations, samples = [], []
+                TRACER.reset(name)
+                for _ in range(self.config["repeat"]):
+                    start = time.perf_counter()
+                    output = fn()
+                    durations.append(time.perf_counter() - start)
+                    if per_call_samples and output:
+                        samples.extend(output)
+        except StageSkipped as e:
+            print(f"bỏ qua ({e})")
+            self.results[name] = {"skipped": str(e)}
+            return
+        except ImportError as e:
+            print(f"bỏ qua (thiếu thư viện: {e})")
+            self.results[name] = {"skipped": f"ImportError: {e}"}
+            return
+        except Exception as e:
+            print(f"❌ lỗi: {e}")
+            if self.verbose:
+                traceback.print_exc()
+            self.results[name] = {"error": f"{type(e).__name__}: {e}"}
+            return
+        result = _summarize(durations, units, unit, samples)
+        # Thời gian theo giai đoạn con từ lớp tracing (ví dụ embedding.batch trong index)
+        stages = TRACER.summary()["stages"]
+        if stages:
+            result["trace"] = {stage: {"count": s["count"], "total_ms": s["total_ms"]} for stage, s in stages.items()}
+        self.results[name] = result
+        throughput = f", {result['throughput_per_s']:.1f} {unit}/s" if result["throughput_per_s"] else ""
+        print(f"p50 {result['p50_s'] * 1000:.1f} ms{throughput}")
+
+    # --- Các giai đoạn -------------------------------------------------------------
+
+    def bench_pdf(self):
+        from src.data_processing.pdf_parser import PDFMarkdownConverter
+
+        pdf_dir = self.work_dir / "pdfs"
+        pdfs, pages, stats = [], 0, {"tables": 0, "images": 0}
+        for i in range(self.config["pdfs"]):
+            pdf = pdf_dir / f"synthetic_{i + 1}.pdf"
+            info = synthetic.generate_pdf(pdf, self.config["pages"], self.config["table_density"],
+                                          self.config["image_density"], seed=self.config["seed"] + i)
+            pdfs.append(pdf)
+            pages += info["pages"]
+            stats["tables"] += info["tables"]
+            stats["images"] += info["images"]
+
+        def run():
+            converter = PDFMarkdownConverter()
+            for pdf in pdfs:
+                converter.convert(pdf, pdf_dir / pdf.stem / "images")
+
+        self.measure("pdf", run, pages, "page")
+        if "p50_s" in self.results["pdf"]:
+            self.results["pdf"].update(stats)
+
+    def bench_chunking(self):
+        from src.chunking import STRATEGIES
+
+        text_chars = sum(len(text) for text in self.corpus.values())
+        for strategy in STRATEGIES:
+            def run(strategy=strategy):
+                if strategy in ("llm_window", "propositional"):
+                    self._install_fakes()
+                elif strategy == "semantic_similarity":
+                    self._install_embedding_fake()  # Không cần LLM (và langchain)
+                chunk = STRATEGIES[strategy]
+                return [chunk(text) for text in self.corpus.values()]
+
+            self.measure(f"chunking.{strategy}", run, text_chars, "char")
+
+    def bench_embedding(self):
+        texts = [p for text in self.corpus.values() for p in text.split("\n\n") if p.strip()]
+        self.measure("embedding", lambda: self.embedder.encode(texts), len(texts), "text")
+
+    def _build_vector_store(self):
+        from src.vectordb.local_backend import LocalBackend
+        from src.vectordb.store import VectorStore
+
+        backend = LatencyBackend(LocalBackend(self.work_dir / "vectors", index="exact"),
+                                 request_ms=self.config["vector_request_ms"])
+        return VectorStore("benchmark", self.embedder, backend=backend)
+
+    def bench_index(self):
+        from src.vectordb.indexer import index_documents
+
+        os.environ["CHUNKING_STRATEGY"] = "recursive_char"
+        with _quiet(self.verbose):
+            vector_store = self._build_vector_store()
+        corpus_entries: List[Dict] = []
+
+        def run():
+            corpus_entries[:] = index_documents(self.corpus, vector_store, recreate=True)
+
+        self.measure("index", run, len(self.corpus), "document")
+        if corpus_entries:
+            self.results["index"]["chunks"] = len(corpus_entries)
+            self._vector_store, self._corpus_entries = vector_store, corpus_entries
+
+    def _get_retriever(self):
+        if self._retriever is None:
+            if self._vector_store is None:
+                raise StageSkipped("cần giai đoạn index")
+            from src.rag_system.retriever import HybridRetriever
+            with _quiet(self.verbose):
+                self._retriever = HybridRetriever(self._vector_store, self._corpus_entries)
+        return self._retriever
+
+    def bench_retrieval(self):
+        queries = [question for question, _ in self.questions]
+
+        def run_single():
+            retriever = self._get_retriever()
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                retriever.retrieve(query, top_k=10)
+                latencies.append(time.perf_counter() - start)
+            return latencies
+
+        self.measure("retrieval", run_single, len(queries), "query", per_call_samples=True)
+        self.measure("retrieval.batch", lambda: self._get_retriever().retrieve_batch(queries, top_k=10),
+                     len(queries), "query")
+
+    def bench_qa(self):
+        question_csv = self.work_dir / "question.csv"
+        synthetic.write_question_csv(question_csv, self.questions)
+
+        def run():
+            retriever = self._get_retriever()
+            self._install_fakes()
+            from src.rag_system.qa_handler import QAHandler
+            results = QAHandler(retriever).process_questions_csv(question_csv)
+            if not results or len(results) != len(self.questions):
+                raise RuntimeError("QA không trả lời đủ câu hỏi")
+
+        self.measure("qa", run, len(self.questions), "question")
+
+    STAGES = ("pdf", "chunking", "embedding", "index", "retrieval", "qa")
+
+    def run(self, stages: List[str]) -> Dict[str, Dict[str, Any]]:
+        for stage in self.STAGES:
+            if stage in stages:
+                getattr(self, f"bench_{stage}")()
+        return self.results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], thresholds: Dict[str, Any]) -> List[str]:
+    """
+    So sánh p50 của từng giai đoạn với baseline.
+    Returns:
+        Danh sách các giai đoạn bị chậm hơn ngưỡng cho phép (max_slowdown, tương đối).
+    """
+    if results["config"] != baseline.get("config"):
+        print("⚠️ Cấu hình benchmark khác với baseline: kết quả so sánh chỉ mang tính tham khảo.")
+    default = thresholds.get("default", {}).get("max_slowdown", 0.15)
+    per_stage = thresholds.get("stages", {})
+    regressions = []
+    print(f"\n{'Giai đoạn':<28} {'baseline':>11} {'hiện tại':>11} {'thay đổi':>9}  ngưỡng")
+    for name, current in results["results"].items():
+        previous = baseline.get("results", {}).get(name, {})
+        if "p50_s" not in current or "p50_s" not in previous or previous["p50_s"] <= 0:
+            continue
+        max_slowdown = per_stage.get(name, {}).get("max_slowdown", default)
+        change = current["p50_s"] / previous["p50_s"] - 1
+        regressed = change > max_slowdown
+        status = "❌" if regressed else "✅"
+        print(f"{name:<28} {previous['p50_s'] * 1000:>9.1f}ms {current['p50_s'] * 1000:>9.1f}ms "
+              f"{change * 100:>+8.1f}%  +{max_slowdown * 100:.0f}% {status}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark pipeline với dữ liệu tổng hợp và dịch vụ giả lập.")
+    parser.add_argument("--profile", choices=PROFILES, default="default", help="Kích thước dữ liệu mặc định.")
+    parser.add_argument("--stages", default=",".join(BenchmarkRunner.STAGES),
+                        help=f"Các giai đoạn cần đo, phân tách bằng dấu phẩy ({', '.join(BenchmarkRunner.STAGES)}).")
+    parser.add_argument("--pdfs", type=int, help="Số PDF tổng hợp.")
+    parser.add_argument("--pages", type=int, help="Số trang mỗi PDF.")
+    parser.add_argument("--table-density", type=float, default=0.3, help="Xác suất một trang/mục có bảng.")
+    parser.add_argument("--image-density", type=float, default=0.3, help="Xác suất một trang có ảnh.")
+    parser.add_argument("--documents", type=int, help="Số tài liệu trong corpus tổng hợp.")
+    parser.add_argument("--sections", type=int, help="Số mục mỗi tài liệu.")
+    parser.add_argument("--questions", type=int, help="Số câu hỏi.")
+    parser.add_argument("--repeat", type=int, help="Số lần đo mỗi giai đoạn (sau một lần khởi động).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-prefill-ms-per-token", type=float, default=0.05, help="Độ trễ prefill của LLM giả lập.")
+    parser.add_argument("--llm-generate-ms-per-token", type=float, default=1.0, help="Độ trễ sinh token của LLM giả lập.")
+    parser.add_argument("--embed-ms-per-token", type=float, default=0.002, help="Độ trễ của model embedding giả lập.")
+    parser.add_argument("--vector-request-ms", type=float, default=1.0, help="Độ trễ mỗi request tới vector store.")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="File kết quả JSON.")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="File baseline để so sánh.")
+    parser.add_argument("--thresholds", type=Path, default=DEFAULT_THRESHOLDS, help="File ngưỡng regression.")
+    parser.add_argument("--save-baseline", action="store_true", help="Ghi kết quả làm baseline mới.")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Ghi đè một biến cấu hình của benchmark (xem BENCHMARK_ENV), có thể lặp lại.")
+    parser.add_argument("--verbose", action="store_true", help="Hiện log của pipeline.")
+    args = parser.parse_args()
+
+    for item in args.env:
+        key, sep, value = item.partition("=")
+        if not sep or not key:
+            parser.error(f"--env phải có dạng KEY=VALUE: {item}")
+        os.environ[key] = value
+
+    config = dict(PROFILES[args.profile])
+    for key in ("pdfs", "pages", "documents", "sections", "questions", "repeat"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    config.update({
+        "profile": args.profile,
+        "table_density": args.table_density,
+        "image_density": args.image_density,
+        "seed": args.seed,
+        "llm_prefill_ms_per_token": args.llm_prefill_ms_per_token,
+        "llm_generate_ms_per_token": args.llm_generate_ms_per_token,
+        "embed_ms_per_token": args.embed_ms_per_token,
+        "vector_request_ms": args.vector_request_ms,
+        # Cấu hình pipeline thực tế của lần chạy (khác baseline -> cảnh báo khi so sánh)
+        "env": {key: os.environ[key] for key in sorted(set(BENCHMARK_ENV) | {item.partition("=")[0] for item in args.env})},
+    })
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(BenchmarkRunner.STAGES)
+    if unknown:
+        parser.error(f"Giai đoạn không hợp lệ: {', '.join(sorted(unknown))}")
+
+    print(f"🏁 Benchmark (profile {args.profile}): {', '.join(stages)}")
+    with tempfile.TemporaryDirectory(prefix="pipeline_bench_") as work_dir:
+        with _quiet(args.verbose):
+            runner = BenchmarkRunner(config, Path(work_dir), verbose=args.verbose)
+        results = runner.run(stages)
+
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": config,
+        "results": results,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n💾 Đã lưu kết quả vào: {args.output}")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"💾 Đã lưu baseline vào: {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"ℹ️ Chưa có baseline ({args.baseline}); chạy với --save-baseline để tạo.")
+        return 0
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    thresholds = json.loads(args.thresholds.read_text(encoding="utf-8")) if args.thresholds.exists() else {}
+    regressions = compare(report, baseline, thresholds)
+    if regressions:
+        print(f"\n❌ Regression ở: {', '.join(regressions)}")
+        return 1
+    print("\n✅ Không có regression so với baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
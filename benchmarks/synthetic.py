@@ -0,0 +1,141 @@
+# benchmarks/synthetic.py
+"""
+Sinh dữ liệu tổng hợp, tất định (cùng seed -> cùng nội dung) cho benchmark:
+- PDF nhiều trang với mật độ bảng (có đường kẻ, để pdfplumber nhận diện) và ảnh cấu hình được.
+- Corpus Markdown giống đầu ra của PDFMarkdownConverter (tiêu đề, đoạn văn, bảng).
+- Bộ câu hỏi trắc nghiệm dạng question.csv, lấy từ chính nội dung corpus.
+"""
+
+import csv
+import random
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import fitz  # PyMuPDF
+
+_SUBJECTS = ["Cảm biến nhiệt độ", "Bộ vi điều khiển", "Module Wi-Fi", "Gateway Zigbee", "Bộ nguồn",
+             "Firmware", "Giao thức MQTT", "Cổng UART", "Bộ nhớ flash", "Ăng-ten BLE"]
+_PREDICATES = ["hoạt động ở điện áp", "hỗ trợ tốc độ truyền", "có dải nhiệt độ", "tiêu thụ dòng điện",
+               "được cấu hình với chu kỳ", "sử dụng tần số", "lưu trữ tối đa", "kết nối qua cổng"]
+_UNITS = ["V", "kbps", "°C", "mA", "ms", "MHz", "KB", "pin"]
+_TEXT_LINE_HEIGHT = 14
+
+
+def _sentence(rng: random.Random) -> str:
+    i = rng.randrange(len(_PREDICATES))
+    return f"{rng.choice(_SUBJECTS)} {_PREDICATES[i]} {rng.randint(1, 999)} {_UNITS[i]}."
+
+
+def _paragraph(rng: random.Random, sentences: int) -> str:
+    return " ".join(_sentence(rng) for _ in range(sentences))
+
+
+def _table_rows(rng: random.Random, rows: int, cols: int) -> List[List[str]]:
+    header = [f"Thông số {c + 1}" for c in range(cols)]
+    return [header] + [[f"{rng.randint(1, 999)} {rng.choice(_UNITS)}" for _ in range(cols)] for _ in range(rows)]
+
+
+def generate_pdf(path: Path, pages: int = 10, table_density: float = 0.3, image_density: float = 0.3,
+                 seed: int = 0) -> Dict[str, int]:
+    """
+    Tạo một PDF tổng hợp.
+
+    Args:
+        path: File PDF đích.
+        pages: Số trang.
+        table_density: Xác suất một trang có bảng (bảng kẻ ô, pdfplumber nhận diện được).
+        image_density: Xác suất một trang có ảnh (>= 50px, không bị coi là icon).
+        seed: Seed cho nội dung và vị trí bảng/ảnh.
+
+    Returns:
+        Thống kê của PDF: số trang, số bảng, số ảnh.
+    """
+    rng = random.Random(seed)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    doc = fitz.open()
+    stats = {"pages": pages, "tables": 0, "images": 0}
+    # Một ảnh RGB 120x80 dùng chung (nội dung ảnh không ảnh hưởng tới chi phí trích xuất)
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 120, 80), False)
+    pixmap.set_rect(pixmap.irect, (40, 120, 200))
+    image_bytes = pixmap.tobytes("png")
+
+    for page_number in range(pages):
+        page = doc.new_page(width=595, height=842)
+        y = 60
+        page.insert_text((50, y), f"{page_number + 1} Chương {page_number + 1}: {rng.choice(_SUBJECTS)}",
+                         fontsize=14, fontname="helv")
+        y += 2 * _TEXT_LINE_HEIGHT
+        for _ in range(rng.randint(8, 14)):
+            page.insert_text((50, y), _sentence(rng), fontsize=10, fontname="helv")
+            y += _TEXT_LINE_HEIGHT
+
+        if rng.random() < table_density:
+            rows, cols, cell_w, cell_h = rng.randint(3, 6), rng.randint(2, 4), 120, 18
+            for r, row in enumerate(_table_rows(rng, rows, cols)):
+                for c, value in enumerate(row):
+                    rect = fitz.Rect(50 + c * cell_w, y + r * cell_h, 50 + (c + 1) * cell_w, y + (r + 1) * cell_h)
+                    page.draw_rect(rect, color=(0, 0, 0), width=0.8)
+                    page.insert_text((rect.x0 + 4, rect.y1 - 5), value, fontsize=9, fontname="helv")
+            y += (rows + 1) * cell_h + _TEXT_LINE_HEIGHT
+            stats["tables"] += 1
+
+        if rng.random() < image_density:
+            page.insert_image(fitz.Rect(50, y, 170, y + 80), stream=image_bytes)
+            y += 80 + _TEXT_LINE_HEIGHT
+            stats["images"] += 1
+
+        while y < 780:
+            page.insert_text((50, y), _sentence(rng), fontsize=10, fontname="helv")
+            y += _TEXT_LINE_HEIGHT
+
+    doc.save(str(path))
+    doc.close()
+    return stats
+
+
+def generate_corpus(documents: int = 5, sections: int = 20, table_density: float = 0.3,
+                    seed: int = 0) -> Dict[str, str]:
+    """Sinh nội dung Markdown (tên tài liệu -> main.md) giống đầu ra của bước chuyển đổi PDF."""
+    rng = random.Random(seed)
+    corpus = {}
+    for d in range(documents):
+        parts = [f"# Tài liệu kỹ thuật {d + 1}"]
+        for s in range(sections):
+            parts.append(f"## {s + 1} {rng.choice(_SUBJECTS)}")
+            for _ in range(rng.randint(2, 4)):
+                parts.append(_paragraph(rng, rng.randint(3, 7)))
+            if rng.random() < table_density:
+                rows = _table_rows(rng, rng.randint(3, 6), rng.randint(2, 4))
+                lines = ["| " + " | ".join(rows[0]) + " |", "| " + " | ".join(["---"] * len(rows[0])) + " |"]
+                lines += ["| " + " | ".join(row) + " |" for row in rows[1:]]
+                parts.append("\n".join(lines))
+        corpus[f"doc_{d + 1:03d}"] = "\n\n".join(parts)
+    return corpus
+
+
+def generate_questions(corpus: Dict[str, str], count: int = 20, seed: int = 0) -> List[Tuple[str, Dict[str, str]]]:
+    """Sinh câu hỏi 4 lựa chọn: câu hỏi là một câu lấy từ corpus với số liệu bị che."""
+    rng = random.Random(seed)
+    sentences = [s for text in corpus.values() for line in text.split("\n")
+                 if line and not line.startswith(("#", "|")) for s in line.split(". ") if s]
+    questions = []
+    for _ in range(count):
+        words = rng.choice(sentences).rstrip(".").split()
+        answer = next((w for w in reversed(words) if w.isdigit()), "1")
+        question = " ".join("___" if w == answer else w for w in words) + "?"
+        options = [answer] + [str(rng.randint(1, 999)) for _ in range(3)]
+        rng.shuffle(options)
+        questions.append((question, dict(zip("ABCD", options))))
+    return questions
+
+
+def write_question_csv(path: Path, questions: List[Tuple[str, Dict[str, str]]]):
+    """Ghi câu hỏi theo định dạng question.csv của cuộc thi (câu hỏi, A, B, C, D)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Question", "A", "B", "C", "D"])
+        for question, options in questions:
+            writer.writerow([question] + [options[k] for k in "ABCD"])
@@ -14,7 +14,24 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 
 from src.config.paths import setup_project_paths
-from src.pipeline.tasks import run_extract_task, run_qa_task
+
+def _run_import_report(task: str, budget_ms: float = None) -> int:
+    """In thời gian import lúc khởi động và của các module mà tác vụ sẽ dùng."""
+    import os
+    from src.chunking import _STRATEGY_MODULES, DEFAULT_STRATEGY
+    from src.pipeline.tasks import TASK_MODULES
+    from src.telemetry.imports import print_import_report
+
+    tasks = ["extract", "qa"] if task == "full" else [task]
+    task_modules = list(dict.fromkeys(m for t in tasks for m in TASK_MODULES[t]))
+    if "extract" in tasks:
+        strategy = os.getenv("CHUNKING_STRATEGY", DEFAULT_STRATEGY)
+        task_modules.append(f"src.chunking.{_STRATEGY_MODULES.get(strategy, _STRATEGY_MODULES[DEFAULT_STRATEGY])}")
+
+    # Ngân sách chỉ áp dụng cho phần khởi động (mọi lần gọi CLI đều phải trả)
+    ok = print_import_report("khởi động (main.py)", ["src.config.paths", "src.pipeline.tasks"], budget_ms=budget_ms)
+    ok = print_import_report(f"tác vụ {task}", task_modules) and ok
+    return 0 if ok else 1
 
 def main():
     """
@@ -42,8 +59,25 @@ def main():
              " - qa: Chỉ chạy phần trả lời câu hỏi (yêu cầu đã chạy extract trước).\n"
              " - full: Chạy toàn bộ pipeline từ đầu đến cuối (mặc định)."
     )
+    parser.add_argument(
+        "--import-report",
+        action="store_true",
+        help="In báo cáo thời gian import (khởi động và các module của tác vụ) rồi thoát."
+    )
+    parser.add_argument(
+        "--import-budget-ms",
+        type=float,
+        default=None,
+        help="Dùng với --import-report: trả mã lỗi 1 nếu thời gian import lúc khởi động vượt ngưỡng (ms)."
+    )
     args = parser.parse_args()
 
+    if args.import_report:
+        sys.exit(_run_import_report(args.task, args.import_budget_ms))
+
+    # Import tại đây để --help và --import-report không phải nạp pipeline
+    from src.pipeline.tasks import run_extract_task, run_qa_task
+
     print(f"\n{'*'*80}\n{' BẮT ĐẦU PIPELINE '.center(80,'*')}\n{'*'*80}")
     print(f"Chế độ: {args.mode.upper()} | Tác vụ: {args.task.upper()}")
 
@@ -0,0 +1,34 @@
+#!/bin/bash
+# scripts/run_benchmark.sh
+
+# Script để chạy benchmark offline của pipeline (dữ liệu tổng hợp, LLM/embedding/vector store giả lập)
+# và so sánh với baseline theo ngưỡng trong benchmarks/thresholds.json.
+# Cách dùng:
+#   bash scripts/run_benchmark.sh                      # profile default, so sánh với baseline
+#   bash scripts/run_benchmark.sh smoke                # chạy nhanh để kiểm tra
+#   bash scripts/run_benchmark.sh default --save-baseline
+#   bash scripts/run_benchmark.sh default --stages pdf,chunking
+
+# Lấy profile từ đối số đầu tiên, nếu không có thì mặc định là 'default'
+PROFILE=${1:-default}
+[ $# -gt 0 ] && shift
+
+echo "================================================="
+echo "      BẮT ĐẦU CHẠY BENCHMARK"
+echo "      PROFILE: $PROFILE"
+echo "================================================="
+
+# Di chuyển lên thư mục gốc của dự án để đảm bảo python path đúng
+cd "$(dirname "$0")/.."
+
+python -m benchmarks.run --profile "$PROFILE" "$@"
+STATUS=$?
+
+echo "================================================="
+if [ $STATUS -eq 0 ]; then
+    echo "      BENCHMARK HOÀN TẤT!"
+else
+    echo "      BENCHMARK PHÁT HIỆN REGRESSION HOẶC LỖI (mã $STATUS)"
+fi
+echo "================================================="
+exit $STATUS
@@ -3,23 +3,42 @@
 This package contains various text chunking strategies.
 The STRATEGIES dictionary maps strategy names (used in .env) to their
 corresponding chunking functions, providing a clean way to select a method.
+Strategy modules are imported only when first looked up, so selecting
+"recursive_char" never loads the embedding model or LLM dependencies of the others.
 """
-from . import recursive_character
-from . import token_based
-from . import semantic_similarity
-from . import llm_window
-from . import propositional
+import importlib
+import sys
+from collections.abc import Mapping
 
-# A mapping from strategy names (string) to the actual functions.
+# Strategy name -> module inside this package that defines `chunk`
+# (and optionally `iter_chunks`, which yields chunks as they are produced).
 # This makes it easy to add new strategies and select them from config.
-STRATEGIES = {
-    "recursive_char": recursive_character.chunk,
-    "token": token_based.chunk,
-    "semantic_similarity": semantic_similarity.chunk,
-    "llm_window": llm_window.chunk,
-    "propositional": propositional.chunk,
+_STRATEGY_MODULES = {
+    "recursive_char": "recursive_character",
+    "token": "token_based",
+    "semantic_similarity": "semantic_similarity",
+    "llm_window": "llm_window",
+    "propositional": "propositional",
 }
 
+
+class _LazyStrategies(Mapping):
+    """Read-only mapping from strategy names to chunk functions, importing each module on first access."""
+
+    def __getitem__(self, name):
+        module = importlib.import_module(f".{_STRATEGY_MODULES[name]}", __name__)
+        return module.chunk
+
+    def __iter__(self):
+        return iter(_STRATEGY_MODULES)
+
+    def __len__(self):
+        return len(_STRATEGY_MODULES)
+
+
+# A mapping from strategy names (string) to the actual functions.
+STRATEGIES = _LazyStrategies()
+
 DEFAULT_STRATEGY = "recursive_char"
 
 def get_chunking_strategy(strategy_name: str):
@@ -32,3 +51,15 @@ def get_chunking_strategy(strategy_name: str):
               f"Falling back to '{DEFAULT_STRATEGY}'.")
         strategy_name = DEFAULT_STRATEGY
     return STRATEGIES[strategy_name]
+
+def get_chunk_iterator(strategy_name: str):
+    """
+    Like get_chunking_strategy, but returns a function that yields chunks one at a time.
+    Strategies that define `iter_chunks` stream their chunks as they are produced,
+    so callers can embed and upload them before the whole document is chunked.
+    """
+    chunk_fn = get_chunking_strategy(strategy_name)
+    iter_fn = getattr(sys.modules[chunk_fn.__module__], "iter_chunks", None)
+    if iter_fn is None:
+        return lambda text: iter(chunk_fn(text))
+    return iter_fn
@@ -1,23 +1,36 @@
 # src/chunking/llm_window.py
+import os
 import re
-from typing import List
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
 from src.llm.client import get_llm
+from src.llm.executor import ConcurrentLLMExecutor
 
-def chunk(text: str, window_size: int = 15, step_size: int = 5) -> List[str]:
+_MIN_WINDOW = 5
+
+
+def _split_sentences(text: str) -> Tuple[List[str], List[bool]]:
     """
-    Uses a sliding window and an LLM to identify semantic split points.
+    Splits text into sentences and records, for each sentence, whether it starts a
+    structural block (a Markdown heading/table/list item, or the first sentence after a blank line).
     """
-    print("...Using strategy: LLM Window-Based Chunking")
-    sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text.strip()) if s.strip()]
-    if not sentences: return []
+    parts = re.split(r'(?<=[.!?])(\s+)', text.strip())
+    sentences, block_starts = [], []
+    after_blank_line = True
+    for i in range(0, len(parts), 2):
+        sentence = parts[i].strip()
+        if sentence:
+            sentences.append(sentence)
+            block_starts.append(after_blank_line or sentence.startswith(("#", "|", "- ", "* ")))
+        separator = parts[i + 1] if i + 1 < len(parts) else ""
+        after_blank_line = separator.count("\n") >= 2
+    return sentences, block_starts
+
 
-    split_indices = set()
-    for i in range(0, len(sentences), step_size):
-        window = sentences[i : i + window_size]
-        if len(window) < 5: continue
-        
-        numbered_window_text = "\n".join(f"{idx + 1}. {sent}" for idx, sent in enumerate(window))
-        prompt = f"""Analyze the following sentences and identify the most significant topic change.
+def _window_prompt(window: List[str]) -> str:
+    numbered_window_text = "\n".join(f"{idx + 1}. {sent}" for idx, sent in enumerate(window))
+    return f"""Analyze the following sentences and identify the most significant topic change.
 Return ONLY the INTEGER number of that sentence. For example: '5'.
 
 TEXT:
@@ -26,19 +39,87 @@ TEXT:
 ---
 
 The number of the best sentence to split at is:"""
-        try:
-            llm = get_llm(temperature=0.0)
-            response = llm.invoke(prompt)
-            split_num = int(re.findall(r'\d+', response)[0])
-            if 1 < split_num < len(window):
-                split_indices.add(i + split_num - 1)
-        except (ValueError, IndexError, Exception):
-            continue
 
-    if not split_indices: return [text]
+
+def _parse_split(response: Optional[str], window_len: int) -> Optional[int]:
+    """Returns the 1-based split sentence from the LLM response, or None if unusable."""
+    if not response:
+        return None
+    numbers = re.findall(r'\d+', response)
+    if not numbers:
+        return None
+    split_num = int(numbers[0])
+    return split_num if 1 < split_num < window_len else None
+
+
+def _structural_split(block_starts: List[bool], start: int, window_len: int) -> Optional[int]:
+    """Fallback split for a window: the structural block start closest to the window middle."""
+    candidates = [n for n in range(2, window_len) if block_starts[start + n - 1]]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda n: abs(n - (window_len + 1) / 2))
+
+
+def chunk(text: str, window_size: int = 15, step_size: int = 5) -> List[str]:
+    """
+    Uses a sliding window and an LLM to identify semantic split points.
+
+    Window prompts are deduplicated and dispatched concurrently
+    (LLM_WINDOW_MAX_IN_FLIGHT, default LLM_MAX_IN_FLIGHT); responses are cached by prompt
+    content through the LLM response cache, so reruns do not call the model again.
+    LLM_WINDOW_TIME_BUDGET bounds the time spent per document (seconds, 0 = unlimited):
+    windows that fail or are not sent in time fall back to structural split points
+    (headings, blank lines), and no chunk grows beyond `window_size` sentences.
+    """
+    print("...Using strategy: LLM Window-Based Chunking")
+    sentences, block_starts = _split_sentences(text)
+    if not sentences: return []
+
+    windows = [
+        (i, sentences[i : i + window_size])
+        for i in range(0, len(sentences), step_size)
+        if len(sentences[i : i + window_size]) >= _MIN_WINDOW
+    ]
+
+    # Identical windows (e.g. repeated boilerplate) are sent only once
+    prompts = [_window_prompt(window) for _, window in windows]
+    unique_prompts = list(dict.fromkeys(prompts))
+
+    max_in_flight = int(os.getenv("LLM_WINDOW_MAX_IN_FLIGHT", os.getenv("LLM_MAX_IN_FLIGHT", 4)))
+    time_budget = float(os.getenv("LLM_WINDOW_TIME_BUDGET", 600))
+    deadline = time.monotonic() + time_budget if time_budget > 0 else None
+
+    executor = ConcurrentLLMExecutor(get_llm(temperature=0.0), max_in_flight=max_in_flight)
+    responses: Dict[str, Optional[str]] = dict(zip(unique_prompts, executor.map(unique_prompts, deadline=deadline)))
+
+    split_indices: Set[int] = set()
+    fallbacks = 0
+    for (start, window), prompt in zip(windows, prompts):
+        split_num = _parse_split(responses[prompt], len(window))
+        if split_num is None:
+            fallbacks += 1
+            split_num = _structural_split(block_starts, start, len(window))
+        if split_num is not None:
+            split_indices.add(start + split_num - 1)
+
+    if fallbacks:
+        print(f"   ⚠️ {fallbacks}/{len(windows)} windows failed or ran out of time budget; "
+              f"used structural split points for them.")
+
+    # Bound chunk length when neither the LLM nor the structure gave a split point
+    points, start_idx = [], 0
+    for point in sorted(split_indices) + [len(sentences)]:
+        while point - start_idx > window_size:
+            start_idx += window_size
+            points.append(start_idx)
+        if point < len(sentences):
+            points.append(point)
+        start_idx = point
+
+    if not points: return [text]
 
     chunks, start_idx = [], 0
-    for point in sorted(list(split_indices)):
+    for point in points:
         chunks.append(" ".join(sentences[start_idx:point]))
         start_idx = point
     chunks.append(" ".join(sentences[start_idx:]))
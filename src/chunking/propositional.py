@@ -1,46 +1,208 @@
 # src/chunking/propositional.py
-from typing import List
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from src.config.paths import PROJECT_ROOT
 from src.llm.client import get_llm
+from src.llm.executor import ConcurrentLLMExecutor
 from . import recursive_character # Use as fallback
 
-def chunk(text: str, chunk_size: int = 256) -> List[str]:
-    """
-    Uses an LLM to extract propositions (atomic pieces of information),
-    then groups them into chunks.
-    """
-    print("...Using strategy: Propositional (Agentic) Chunking")
-    llm = get_llm(temperature=0.0)
-    
-    prompt = f"""Decompose the following text into a list of simple propositions, one per line.
+# Bump when the prompt or the segmentation changes, so stale progress files are not reused
+_PROGRESS_VERSION = 1
+
+
+def _proposition_prompt(segment: str) -> str:
+    return f"""Decompose the following text into a list of simple propositions, one per line.
 Each proposition must be a self-contained, factual statement.
 
 ORIGINAL TEXT:
 ---
-{text[:2000]}
+{segment}
 ---
 
 PROPOSITIONS:
 """
+
+
+def _split_long(paragraph: str, max_chars: int) -> List[str]:
+    """Splits a paragraph longer than max_chars at sentence boundaries, then at whitespace."""
+    pieces, current = [], ""
+    for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _segments(text: str, max_chars: int) -> List[str]:
+    """Packs consecutive paragraphs into segments of at most max_chars characters, covering the whole text."""
+    segments, current = [], ""
+    for paragraph in re.split(r'\n\s*\n', text.strip()):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        for piece in _split_long(paragraph, max_chars) if len(paragraph) > max_chars else [paragraph]:
+            if current and len(current) + 2 + len(piece) > max_chars:
+                segments.append(current)
+                current = piece
+            else:
+                current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        segments.append(current)
+    return segments
+
+
+class _Progress:
+    """
+    Append-only JSONL record of the propositions extracted per segment
+    ({"segment": i, "propositions": [...]}), so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done: Dict[int, List[str]] = {}
+        if path is None or not path.exists():
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    self.done[int(record["segment"])] = list(record["propositions"])
+                except (ValueError, KeyError, TypeError):
+                    continue  # A line truncated by a crash is simply redone
+
+    def save(self, segment: int, propositions: List[str]):
+        if self.path is None:
+            return
+        line = json.dumps({"segment": segment, "propositions": propositions}, ensure_ascii=False)
+        with self._lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                print(f"   ⚠️ Could not save proposition progress ({e}).")
+
+    def discard(self):
+        """Removes the progress file once the whole document has been extracted."""
+        if self.path is None:
+            return
+        try:
+            self.path.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"   ⚠️ Could not remove proposition progress ({e}).")
+
+
+def _progress_path(text: str, segment_chars: int) -> Optional[Path]:
+    progress_dir = os.getenv("PROPOSITIONS_PROGRESS_DIR", ".cache/propositions")
+    if not progress_dir:
+        return None
+    key = hashlib.sha256(
+        f"{_PROGRESS_VERSION}\x00{os.getenv('CHAT_MODEL', 'qwen2.5:3b')}\x00{segment_chars}\x00{text}".encode("utf-8")
+    ).hexdigest()
+    return PROJECT_ROOT / progress_dir / f"{key}.jsonl"
+
+
+def _extract(executor: ConcurrentLLMExecutor, progress: _Progress, index: int, segment: str) -> Optional[List[str]]:
+    """Map step: propositions of one segment, or None if the LLM call failed."""
+    if index in progress.done:
+        return progress.done[index]
     try:
-        response = llm.invoke(prompt)
-        propositions = [p.strip() for p in response.split('\n') if p.strip()]
+        response = executor.invoke(_proposition_prompt(segment))
     except Exception as e:
-        print(f"Error extracting propositions: {e}. Falling back to recursive chunking.")
-        return recursive_character.chunk(text)
+        print(f"Error extracting propositions from segment {index + 1}: {e}. Falling back to recursive chunking.")
+        return None
+    propositions = [p.strip() for p in response.split('\n') if p.strip()]
+    if propositions:
+        progress.save(index, propositions)
+    return propositions
+
+
+def iter_chunks(text: str, chunk_size: int = 256, segment_chars: int = None,
+                max_in_flight: int = None) -> Iterator[str]:
+    """
+    Map-reduce propositional chunking over the whole document, yielding chunks lazily.
+
+    The text is split into segments of at most `segment_chars` characters
+    (PROPOSITIONAL_SEGMENT_CHARS, default 2000) on paragraph and sentence boundaries.
+    Propositions are extracted from up to `max_in_flight` segments at once
+    (PROPOSITIONAL_MAX_IN_FLIGHT, default LLM_MAX_IN_FLIGHT), and are packed into chunks of
+    at most `chunk_size` words in document order as soon as the earlier segments are done.
+    Finished segments are appended to a progress file under PROPOSITIONS_PROGRESS_DIR
+    (default .cache/propositions, empty to disable), so a rerun after a crash only
+    processes the remaining segments; the file is removed once every segment succeeded.
+    Segments whose extraction fails fall back to recursive character chunking.
+    """
+    if not isinstance(text, str) or not text.strip():
+        return
+    if segment_chars is None:
+        segment_chars = int(os.getenv("PROPOSITIONAL_SEGMENT_CHARS", 2000))
+    if max_in_flight is None:
+        max_in_flight = int(os.getenv("PROPOSITIONAL_MAX_IN_FLIGHT", os.getenv("LLM_MAX_IN_FLIGHT", 4)))
+    segment_chars = max(200, segment_chars)
 
-    if not propositions:
-        return recursive_character.chunk(text)
+    segments = _segments(text, segment_chars)
+    progress = _Progress(_progress_path(text, segment_chars))
+    if progress.done:
+        print(f"   ↻ Resuming: {len(progress.done)}/{len(segments)} segments already extracted.")
 
-    chunks = []
+    executor = ConcurrentLLMExecutor(get_llm(temperature=0.0), max_in_flight=max_in_flight)
     current_chunk = ""
-    for prop in propositions:
-        if len(current_chunk.split()) + len(prop.split()) > chunk_size:
-            chunks.append(current_chunk.strip())
-            current_chunk = prop
-        else:
-            current_chunk += f" {prop}"
-            
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-        
-    return chunks
+    failed = 0
+    with ThreadPoolExecutor(max_workers=executor.max_in_flight) as pool:
+        futures = [pool.submit(_extract, executor, progress, i, segment) for i, segment in enumerate(segments)]
+        try:
+            # Reduce step: consume segments in document order while later ones are still running
+            for segment, future in zip(segments, futures):
+                propositions = future.result()
+                if not propositions:
+                    failed += 1
+                    if current_chunk:
+                        yield current_chunk.strip()
+                        current_chunk = ""
+                    yield from recursive_character.chunk(segment)
+                    continue
+                for prop in propositions:
+                    if current_chunk and len(current_chunk.split()) + len(prop.split()) > chunk_size:
+                        yield current_chunk.strip()
+                        current_chunk = prop
+                    else:
+                        current_chunk += f" {prop}"
+        finally:
+            # Consumer stopped early: do not start the segments that are still queued
+            for future in futures:
+                future.cancel()
+
+    if current_chunk.strip():
+        yield current_chunk.strip()
+    # Keep the progress of a partly failed document so a rerun retries only the failed segments
+    if not failed:
+        progress.discard()
+
+
+def chunk(text: str, chunk_size: int = 256) -> List[str]:
+    """
+    Uses an LLM to extract propositions (atomic pieces of information),
+    then groups them into chunks.
+    """
+    print("...Using strategy: Propositional (Agentic) Chunking")
+    return list(iter_chunks(text, chunk_size))
@@ -1,42 +1,150 @@
 # src/chunking/semantic_similarity.py
+import os
 import re
+from itertools import chain, islice
+from typing import Iterator, List, Optional, Tuple
+
 import numpy as np
-from typing import List
 from src.embedding.model import get_embedding_model
 
-def _cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
-    """Calculates cosine similarity between two vectors."""
-    dot_product = np.dot(vec1, vec2)
-    norm_a = np.linalg.norm(vec1)
-    norm_b = np.linalg.norm(vec2)
-    return dot_product / (norm_a * norm_b) if norm_a != 0 and norm_b != 0 else 0
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
 
-def chunk(text: str, percentile_threshold: int = 90) -> List[str]:
+
+def _iter_sentences(text: str) -> Iterator[str]:
+    """Lazily yields the same sentences as `re.split(r'(?<=[.!?])\\s+', text)`."""
+    start = 0
+    for match in _SENTENCE_BOUNDARY.finditer(text):
+        yield text[start:match.start()]
+        start = match.end()
+    yield text[start:]
+
+
+def _iter_similarity_windows(sentences: Iterator[str], window_size: int) -> Iterator[Tuple[List[str], np.ndarray]]:
     """
-    Splits text based on semantic changes between adjacent sentences.
+    Embeds sentences window by window and yields (window sentences, similarities).
+    Similarities are cosine similarities between consecutive sentences, computed as one
+    row-wise dot product of normalized embeddings. The last embedding of each window is
+    carried over, so the first similarity of a window links it to the previous one.
+    Only one window of embeddings is held in memory at a time.
+    """
+    embedder = get_embedding_model()
+    previous: Optional[np.ndarray] = None
+    while True:
+        window = list(islice(sentences, window_size))
+        if not window:
+            return
+        embeddings = np.asarray(embedder.encode(window), dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1.0, norms)
+        if previous is not None:
+            embeddings = np.vstack([previous, embeddings])
+        similarities = np.einsum("ij,ij->i", embeddings[:-1], embeddings[1:])
+        previous = embeddings[-1:]
+        yield window, similarities
+
+
+def _local_thresholds(similarities: np.ndarray, first: int, last: int, half_width: int,
+                      percentile_threshold: float) -> np.ndarray:
+    """
+    Percentile of the similarities in a centered window [i - half_width, i + half_width]
+    for every i in [first, last). Positions outside the array are ignored (NaN padding).
+    """
+    padded = np.full(len(similarities) + 2 * half_width, np.nan)
+    padded[half_width:half_width + len(similarities)] = similarities
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * half_width + 1)[first:last]
+    return np.nanpercentile(windows, percentile_threshold, axis=1)
+
+
+def _split_points(sentences: Iterator[str], percentile_threshold: float, window_size: int,
+                  local_window: int) -> Iterator[List[str]]:
+    """Yields the sentences of each chunk, in order."""
+    if local_window <= 0:
+        # Global percentile: similarities (one float per sentence) are kept, embeddings are not
+        all_sentences: List[str] = []
+        similarity_parts: List[np.ndarray] = []
+        for window, similarities in _iter_similarity_windows(sentences, window_size):
+            all_sentences.extend(window)
+            similarity_parts.append(similarities)
+        similarities = np.concatenate(similarity_parts)
+        split_threshold = np.percentile(similarities, percentile_threshold)
+        start = 0
+        for i in np.flatnonzero(similarities < split_threshold):
+            yield all_sentences[start:i + 1]
+            start = i + 1
+        yield all_sentences[start:]
+        return
+
+    # Sliding local percentile: a boundary is decided once half_width later similarities are known
+    half_width = max(1, local_window // 2)
+    buffer: List[str] = []    # sentences of the current chunk onwards
+    similarities = np.empty(0, dtype=np.float32)
+    offset = 0                # global index of similarities[0]
+    decided = 0               # next global similarity index to decide
+    chunk_start = 0           # global index of buffer[0]
+
+    def decide(upto: int):
+        nonlocal similarities, offset, decided, chunk_start
+        if upto <= decided:
+            return
+        first, last = decided - offset, upto - offset
+        thresholds = _local_thresholds(similarities, first, last, half_width, percentile_threshold)
+        for i in np.flatnonzero(similarities[first:last] < thresholds) + decided:
+            end = i + 1 - chunk_start
+            yield buffer[:end]
+            del buffer[:end]
+            chunk_start = i + 1
+        decided = upto
+        # Keep only the similarities still needed as left context
+        keep_from = max(0, decided - half_width - offset)
+        similarities = similarities[keep_from:]
+        offset += keep_from
+
+    for window, window_similarities in _iter_similarity_windows(sentences, window_size):
+        buffer.extend(window)
+        similarities = np.concatenate([similarities, window_similarities])
+        yield from decide(offset + len(similarities) - half_width)
+    yield from decide(offset + len(similarities))
+    yield buffer
+
+
+def iter_chunks(text: str, percentile_threshold: int = 90, window_size: int = None,
+                local_window: int = None) -> Iterator[str]:
+    """
+    Splits text based on semantic changes between adjacent sentences, yielding chunks lazily.
+
+    Args:
+        text: Input document.
+        percentile_threshold: A split happens where the similarity of two adjacent sentences
+            is below this percentile of the similarities.
+        window_size: Number of sentences embedded at a time (SEMANTIC_WINDOW_SIZE, default 256).
+        local_window: Number of neighbouring similarities the percentile is computed over
+            (SEMANTIC_LOCAL_WINDOW). 0 uses one global percentile for the whole document;
+            a positive value adapts the threshold to each section and lets chunks stream out
+            with a look-ahead of only local_window / 2 sentences.
     """
-    print("...Using strategy: Semantic Similarity Chunking")
     if not isinstance(text, str) or not text.strip():
-        return []
+        return
+    if window_size is None:
+        window_size = int(os.getenv("SEMANTIC_WINDOW_SIZE", 256))
+    if local_window is None:
+        local_window = int(os.getenv("SEMANTIC_LOCAL_WINDOW", 0))
+    window_size = max(2, window_size)
 
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-    if len(sentences) <= 1:
-        return sentences
+    sentences = _iter_sentences(text.strip())
+    head = list(islice(sentences, 2))
+    if len(head) <= 1:
+        yield from head
+        return
 
-    embedder = get_embedding_model()
-    embeddings = np.array(embedder.encode(sentences))
-
-    similarities = [_cosine_similarity(embeddings[i], embeddings[i+1]) for i in range(len(embeddings) - 1)]
-    
-    split_threshold = np.percentile(similarities, percentile_threshold)
-
-    chunks = []
-    current_chunk_start_idx = 0
-    for i, sim in enumerate(similarities):
-        if sim < split_threshold:
-            chunk_content = " ".join(sentences[current_chunk_start_idx : i+1])
-            chunks.append(chunk_content)
-            current_chunk_start_idx = i + 1
-
-    chunks.append(" ".join(sentences[current_chunk_start_idx:]))
-    return [c for c in chunks if c.strip()]
+    for chunk_sentences in _split_points(chain(head, sentences), percentile_threshold, window_size, local_window):
+        chunk_text = " ".join(chunk_sentences)
+        if chunk_text.strip():
+            yield chunk_text
+
+
+def chunk(text: str, percentile_threshold: int = 90) -> List[str]:
+    """
+    Splits text based on semantic changes between adjacent sentences.
+    """
+    print("...Using strategy: Semantic Similarity Chunking")
+    return list(iter_chunks(text, percentile_threshold))
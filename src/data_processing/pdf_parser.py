@@ -3,11 +3,20 @@
 Module này chứa class `PDFMarkdownConverter` chịu trách nhiệm cho tất cả logic
 trích xuất nội dung từ file PDF và chuyển đổi nó thành định dạng Markdown.
 Bao gồm xử lý văn bản, bảng, hình ảnh, và các yếu tố cấu trúc khác.
+
+Ngoài chế độ tuần tự (`PDFMarkdownConverter.convert`), hàm `convert_documents`
+chuyển đổi nhiều PDF song song bằng process pool, chia việc theo tài liệu và theo
+khoảng trang với PDF lớn, rồi ghép các trang lại đúng thứ tự. Ảnh được đánh số
+lại sau khi ghép nên tên ảnh và `main.md` giống hệt kết quả chạy tuần tự.
 """
 import fitz  # PyMuPDF
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Any, List, Dict, Tuple, Optional, Union
+
+from src.telemetry.tracing import TRACER, count, span
 
 class PDFMarkdownConverter:
     """
@@ -20,6 +29,13 @@ class PDFMarkdownConverter:
             r'^Figure\s+\d+[\.:]\s*(.+)$',
         ]
         self.global_image_counter = 0
+        # Khi chạy trong worker: ảnh được lưu với tên tạm (prefix này) và được đánh số lại khi ghép
+        self._temp_image_prefix: Optional[str] = None
+        self._page_images: List[str] = []
+        # Tài liệu pdfplumber dùng chung cho mọi trang trong một lần chuyển đổi
+        self._plumber_pdf = None
+        # Số nét kẻ tối thiểu (đường thẳng, mỗi hình chữ nhật tính 4) để chạy nhận diện bảng
+        self.min_table_edges = 3
 
     def _get_file_title(self, pdf_path: str) -> str:
         """Tạo tiêu đề chính cho file Markdown từ tên file PDF."""
@@ -47,29 +63,74 @@ class PDFMarkdownConverter:
             return f"*{text}*"
         return text
 
+    def _open_table_source(self, pdf_path: Path):
+        """Mở tài liệu pdfplumber một lần cho cả lần chuyển đổi (thay vì mỗi trang một lần)."""
+        try:
+            import pdfplumber
+            self._plumber_pdf = pdfplumber.open(pdf_path)
+        except Exception as e:
+            print(f"Lỗi khi mở {Path(pdf_path).name} bằng pdfplumber: {e}")
+            self._plumber_pdf = None
+
+    def _close_table_source(self):
+        if self._plumber_pdf is not None:
+            self._plumber_pdf.close()
+            self._plumber_pdf = None
+
+    def _page_may_have_tables(self, page) -> bool:
+        """
+        Kiểm tra nhanh bằng PyMuPDF: bảng (chiến lược 'lines' của pdfplumber) cần các
+        đường kẻ hoặc hình chữ nhật. Trang không có đủ nét kẻ thì bỏ qua find_tables().
+        """
+        edges = 0
+        for drawing in page.get_drawings():
+            for item in drawing.get("items", ()):
+                if item[0] == "l":
+                    edges += 1
+                elif item[0] in ("re", "qu"):
+                    edges += 4
+                if edges >= self.min_table_edges:
+                    return True
+        return False
+
     def _extract_tables(self, page) -> List[Dict]:
         """Sử dụng pdfplumber để trích xuất bảng một cách hiệu quả."""
         try:
-            import pdfplumber
-            with pdfplumber.open(page.parent.name) as pdf:
-                plumber_page = pdf.pages[page.number]
-                tables = plumber_page.find_tables()
-                extracted = []
-                for tbl in tables:
-                    content_raw = tbl.extract()
-                    if not content_raw:
-                        continue
-                    # Chuyển đổi list của list thành bảng Markdown
-                    header = "| " + " | ".join(map(str, content_raw[0])) + " |"
-                    separator = "| " + " | ".join(["---"] * len(content_raw[0])) + " |"
-                    body = "\n".join(["| " + " | ".join(map(str, row)) + " |" for row in content_raw[1:]])
-                    md_table = f"{header}\n{separator}\n{body}"
-                    extracted.append({'content': md_table, 'bbox': tbl.bbox, 'y_pos': tbl.bbox[1]})
-                return extracted
+            if not self._page_may_have_tables(page):
+                return []
+            if self._plumber_pdf is None:
+                # Gọi trực tiếp ngoài convert(): mở tạm tài liệu cho trang này
+                self._open_table_source(page.parent.name)
+                try:
+                    return self._find_tables(page)
+                finally:
+                    self._close_table_source()
+            return self._find_tables(page)
         except Exception as e:
             print(f"Lỗi khi trích xuất bảng ở trang {page.number}: {e}")
             return []
 
+    def _find_tables(self, page) -> List[Dict]:
+        """Chạy find_tables() của pdfplumber trên trang tương ứng và chuyển thành Markdown."""
+        plumber_page = self._plumber_pdf.pages[page.number]
+        try:
+            tables = plumber_page.find_tables()
+            extracted = []
+            for tbl in tables:
+                content_raw = tbl.extract()
+                if not content_raw:
+                    continue
+                # Chuyển đổi list của list thành bảng Markdown
+                header = "| " + " | ".join(map(str, content_raw[0])) + " |"
+                separator = "| " + " | ".join(["---"] * len(content_raw[0])) + " |"
+                body = "\n".join(["| " + " | ".join(map(str, row)) + " |" for row in content_raw[1:]])
+                md_table = f"{header}\n{separator}\n{body}"
+                extracted.append({'content': md_table, 'bbox': tbl.bbox, 'y_pos': tbl.bbox[1]})
+            return extracted
+        finally:
+            # Giải phóng cache đối tượng của trang để bộ nhớ không tăng theo số trang
+            plumber_page.close()
+
 
     def _extract_images(self, page, images_dir: Path) -> List[Dict]:
         """Trích xuất và lưu hình ảnh từ một trang."""
@@ -86,7 +147,11 @@ class PDFMarkdownConverter:
                     continue
                 
                 self.global_image_counter += 1
-                image_filename = f"image_{page.number}_{self.global_image_counter}.{base_image['ext']}"
+                if self._temp_image_prefix is None:
+                    image_filename = f"image_{page.number}_{self.global_image_counter}.{base_image['ext']}"
+                else:
+                    image_filename = f"{self._temp_image_prefix}{page.number}_{self.global_image_counter}.{base_image['ext']}"
+                    self._page_images.append(image_filename)
                 image_path = images_dir / image_filename
                 
                 with open(image_path, "wb") as f_img:
@@ -113,11 +178,17 @@ class PDFMarkdownConverter:
                     elements.append({'type': 'text', 'content': l, 'bbox': fitz.Rect(l['bbox']), 'y_pos': l['bbox'][1]})
         
         # Lấy ảnh
-        for img in self._extract_images(page, images_dir):
+        with span("pdf.images", page=page.number + 1):
+            images = self._extract_images(page, images_dir)
+        count("pdf.images", len(images))
+        for img in images:
             elements.append({'type': 'image', 'content': img, 'bbox': img['bbox'], 'y_pos': img['y_pos']})
             
         # Lấy bảng
-        for tbl in self._extract_tables(page):
+        with span("pdf.tables", page=page.number + 1):
+            tables = self._extract_tables(page)
+        count("pdf.tables", len(tables))
+        for tbl in tables:
              elements.append({'type': 'table', 'content': tbl['content'], 'bbox': fitz.Rect(tbl['bbox']), 'y_pos': tbl['y_pos']})
 
         # Sắp xếp tất cả các element theo vị trí dọc (y_pos)
@@ -139,6 +210,43 @@ class PDFMarkdownConverter:
 
         return "\n".join(md_content)
 
+    def _finalize(self, pdf_path: Path, output_dir: Path, page_contents: List[str]) -> str:
+        """Ghép tiêu đề và nội dung các trang, dọn dẹp Markdown và ghi ra main.md."""
+        output_file = output_dir.parent / "main.md"
+        final_md = "\n".join([self._get_file_title(str(pdf_path))] + page_contents)
+        # Hậu xử lý để dọn dẹp file Markdown
+        final_md = re.sub(r'\n{3,}', '\n\n', final_md).strip()
+        
+        output_file.write_text(final_md, encoding='utf-8')
+        print(f"✅ Chuyển đổi thành công: {output_file}")
+        return final_md
+
+    def convert_pages(self, pdf_path: Path, images_dir: Path, start: int, stop: int, temp_prefix: str) -> List[Tuple[str, List[str]]]:
+        """
+        Chuyển đổi các trang [start, stop) của một PDF (dùng trong worker).
+        Ảnh được lưu với tên tạm `temp_prefix...`; trả về (markdown, [tên ảnh tạm]) cho từng trang.
+        """
+        images_dir.mkdir(parents=True, exist_ok=True)
+        self.global_image_counter = 0
+        self._temp_image_prefix = temp_prefix
+        results = []
+
+        doc = fitz.open(pdf_path)
+        self._open_table_source(pdf_path)
+        try:
+            for page_number in range(start, stop):
+                print(f" - {pdf_path.name}: Trang {page_number + 1}/{len(doc)}")
+                self._page_images = []
+                with span("pdf.page", doc=pdf_path.name, page=page_number + 1):
+                    page_content = self._process_page_elements(doc[page_number], images_dir)
+                count("pdf.pages")
+                results.append((page_content, self._page_images))
+        finally:
+            self._close_table_source()
+            doc.close()
+            self._temp_image_prefix = None
+        return results
+
     def convert(self, pdf_path: str, output_dir: str) -> Tuple[str, int]:
         """
         Hàm chính thực hiện việc chuyển đổi.
@@ -146,29 +254,118 @@ class PDFMarkdownConverter:
         """
         pdf_path = Path(pdf_path)
         output_dir = Path(output_dir)
-        output_file = output_dir.parent / "main.md"
         images_dir = output_dir
 
         images_dir.mkdir(parents=True, exist_ok=True)
         self.global_image_counter = 0
 
         doc = fitz.open(pdf_path)
-        all_md_content = [self._get_file_title(str(pdf_path))]
+        self._open_table_source(pdf_path)
+        page_contents = []
         
         print(f"Bắt đầu xử lý {pdf_path.name}...")
-        for i, page in enumerate(doc):
-            print(f" - Trang {i+1}/{len(doc)}")
-            page_content = self._process_page_elements(page, images_dir)
-            all_md_content.append(page_content)
-
-        doc.close()
+        try:
+            for i, page in enumerate(doc):
+                print(f" - Trang {i+1}/{len(doc)}")
+                with span("pdf.page", doc=pdf_path.name, page=i + 1):
+                    page_content = self._process_page_elements(page, images_dir)
+                count("pdf.pages")
+                page_contents.append(page_content)
+        finally:
+            self._close_table_source()
+            doc.close()
 
-        final_md = "\n".join(all_md_content)
-        # Hậu xử lý để dọn dẹp file Markdown
-        final_md = re.sub(r'\n{3,}', '\n\n', final_md).strip()
-        
-        output_file.write_text(final_md, encoding='utf-8')
-        print(f"✅ Chuyển đổi thành công: {output_file}")
+        final_md = self._finalize(pdf_path, output_dir, page_contents)
         
         # Trả về nội dung markdown và số lượng ảnh
         return final_md, self.global_image_counter
+
+
+def _convert_page_range(pdf_path: Path, images_dir: Path, start: int, stop: int) -> Tuple[List[Tuple[str, List[str]]], Dict[str, Any]]:
+    """
+    Worker của process pool: chuyển đổi một khoảng trang với tên ảnh tạm.
+    Trả về kèm các sự kiện trace của worker để tiến trình chính gộp vào báo cáo.
+    """
+    # Worker tạo bằng fork thừa hưởng sự kiện của tiến trình cha: bỏ đi để không bị tính hai lần
+    TRACER.drain_events()
+    page_results = PDFMarkdownConverter().convert_pages(pdf_path, images_dir, start, stop, temp_prefix=f"__tmp_p{start}_")
+    return page_results, TRACER.drain_events()
+
+
+def _assemble_document(pdf_path: Path, images_dir: Path, page_results: List[Tuple[str, List[str]]]) -> Tuple[str, int]:
+    """
+    Ghép các trang theo thứ tự và đánh số lại ảnh giống hệt chế độ tuần tự:
+    image_<trang>_<số thứ tự ảnh trong tài liệu>.<ext>.
+    """
+    counter = 0
+    page_contents = []
+    for page_content, temp_images in page_results:
+        for temp_name in temp_images:
+            counter += 1
+            page_number, ext = temp_name.rsplit("_", 1)[0].split("_")[-1], temp_name.rsplit(".", 1)[1]
+            final_name = f"image_{page_number}_{counter}.{ext}"
+            os.replace(images_dir / temp_name, images_dir / final_name)
+            page_content = page_content.replace(temp_name, final_name)
+        page_contents.append(page_content)
+
+    final_md = PDFMarkdownConverter()._finalize(pdf_path, images_dir, page_contents)
+    return final_md, counter
+
+
+def convert_documents(jobs: List[Tuple[Path, Path]], workers: int = 1,
+                      pages_per_task: int = 32) -> Dict[str, Union[Tuple[str, int], Exception]]:
+    """
+    Chuyển đổi nhiều PDF, song song bằng process pool nếu `workers` > 1.
+    PDF lớn được chia thành các khoảng `pages_per_task` trang để chia đều cho các worker.
+
+    Args:
+        jobs: Danh sách (đường dẫn PDF, thư mục ảnh) như tham số của `convert`.
+        workers: Số process; <= 1 để chạy tuần tự trong process hiện tại.
+        pages_per_task: Số trang tối đa trong một task; <= 0 để mỗi tài liệu là một task.
+
+    Returns:
+        Dict theo tên file (stem): (md_content, image_count) hoặc Exception nếu lỗi.
+    """
+    results: Dict[str, Union[Tuple[str, int], Exception]] = {}
+    if workers <= 1:
+        converter = PDFMarkdownConverter()
+        for pdf_path, images_dir in jobs:
+            try:
+                results[Path(pdf_path).stem] = converter.convert(pdf_path, images_dir)
+            except Exception as e:
+                results[Path(pdf_path).stem] = e
+        return results
+
+    print(f"🚀 Chuyển đổi {len(jobs)} PDF song song với {workers} process...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Gửi toàn bộ task (theo tài liệu và khoảng trang) trước để các worker luôn bận
+        pending = {}
+        for pdf_path, images_dir in jobs:
+            pdf_path, images_dir = Path(pdf_path), Path(images_dir)
+            try:
+                images_dir.mkdir(parents=True, exist_ok=True)
+                with fitz.open(pdf_path) as doc:
+                    page_count = len(doc)
+                step = pages_per_task if pages_per_task > 0 else max(page_count, 1)
+                pending[pdf_path] = (images_dir, [
+                    pool.submit(_convert_page_range, pdf_path, images_dir, start, min(start + step, page_count))
+                    for start in range(0, page_count, step)
+                ])
+            except Exception as e:
+                results[pdf_path.stem] = e
+
+        # Ghép kết quả theo đúng thứ tự trang của từng tài liệu
+        for pdf_path, (images_dir, futures) in pending.items():
+            try:
+                page_results = []
+                for future in futures:
+                    pages, worker_events = future.result()
+                    TRACER.merge_events(worker_events)
+                    page_results.extend(pages)
+                with span("pdf.assemble", doc=pdf_path.name):
+                    results[pdf_path.stem] = _assemble_document(pdf_path, images_dir, page_results)
+            except Exception as e:
+                for temp_file in images_dir.glob("__tmp_p*"):
+                    temp_file.unlink(missing_ok=True)
+                results[pdf_path.stem] = e
+    return results
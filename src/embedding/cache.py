@@ -0,0 +1,175 @@
+# src/embedding/cache.py
+"""
+Module này cung cấp cache embedding trên đĩa, định danh theo nội dung
+(tên model + hash của văn bản). Vector được lưu dạng float32 trong một file
+mảng được memory-map, kèm một file chỉ mục hash theo đúng thứ tự hàng.
+Cả hai file chỉ được ghi nối thêm (append-only), nên một lần chạy bị ngắt giữa
+chừng chỉ làm mất các vector chưa ghi xong chứ không làm hỏng cache.
+Nhiều instance/tiến trình có thể dùng chung một thư mục cache: việc ghi được tuần tự
+hóa bằng khóa file (fcntl.flock), và mỗi instance đọc thêm các hàng do instance khác ghi.
+"""
+
+import hashlib
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock, chỉ an toàn khi một tiến trình ghi cache
+    fcntl = None
+
+# Độ dài (byte) của mỗi khóa trong file chỉ mục: sha256 digest
+_KEY_SIZE = 32
+
+
+class EmbeddingCache:
+    """
+    Cache vector embedding cho một model cụ thể.
+    - `vectors.f32`: ma trận float32 (số hàng x dim), đọc bằng np.memmap.
+    - `keys.bin`: các digest sha256 của văn bản, hàng thứ i ứng với vector thứ i.
+    """
+    def __init__(self, cache_dir: Path, model_name: str, dimension: int):
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.cache_dir = Path(cache_dir) / slug
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.dimension = dimension
+        self.vectors_path = self.cache_dir / "vectors.f32"
+        self.keys_path = self.cache_dir / "keys.bin"
+        self.lock_path = self.cache_dir / ".lock"
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        # Số hàng đã đọc từ file (có thể lớn hơn len(_index) nếu hai instance cùng ghi một khóa)
+        self._rows = 0
+        self._vectors: Optional[np.memmap] = None
+        self._load()
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool = True):
+        """Khóa thư mục cache giữa các instance và tiến trình (ghi: độc quyền, đọc: chia sẻ)."""
+        with open(self.lock_path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _file_rows(self) -> Tuple[int, int]:
+        """Số hàng (khóa, vector) hoàn chỉnh hiện có trong hai file."""
+        key_rows = self.keys_path.stat().st_size // _KEY_SIZE if self.keys_path.exists() else 0
+        vector_rows = (self.vectors_path.stat().st_size // (self.dimension * 4)
+                       if self.vectors_path.exists() else 0)
+        return key_rows, vector_rows
+
+    def _repair(self):
+        """Cắt bỏ phần ghi dở ở cuối hai file. Chỉ gọi khi giữ khóa độc quyền (không ai đang ghi)."""
+        rows = min(self._file_rows())
+        if self.keys_path.exists() and self.keys_path.stat().st_size != rows * _KEY_SIZE:
+            with open(self.keys_path, "r+b") as f:
+                f.truncate(rows * _KEY_SIZE)
+        if self.vectors_path.exists() and self.vectors_path.stat().st_size != rows * self.dimension * 4:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(rows * self.dimension * 4)
+
+    def _sync(self):
+        """Đọc các hàng mà instance/tiến trình khác đã ghi thêm. Gọi khi đang giữ khóa file."""
+        rows = min(self._file_rows())
+        if rows <= self._rows:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._rows * _KEY_SIZE)
+            keys = f.read((rows - self._rows) * _KEY_SIZE)
+        for offset in range(rows - self._rows):
+            # Khóa trùng (hai instance cùng ghi một văn bản): giữ hàng đầu tiên
+            self._index.setdefault(keys[offset * _KEY_SIZE:(offset + 1) * _KEY_SIZE], self._rows + offset)
+        self._rows = rows
+        self._remap(rows)
+
+    def _load(self):
+        """Đọc chỉ mục hash và memory-map file vector; bỏ qua phần ghi dở ở cuối file."""
+        with self._lock, self._file_lock():
+            self._repair()
+            self._sync()
+
+    def _remap(self, rows: int):
+        self._vectors = (
+            np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+            if rows else None
+        )
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @staticmethod
+    def text_key(text: str) -> bytes:
+        """Khóa của một văn bản: sha256 của nội dung (UTF-8)."""
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def lookup(self, texts: Sequence[str]) -> Tuple[np.ndarray, List[int]]:
+        """
+        Tra cứu nhiều văn bản cùng lúc.
+        Returns:
+            (vectors, missing): ma trận float32 (len(texts) x dim) đã điền sẵn các vector
+            có trong cache, và danh sách vị trí các văn bản chưa có (cache miss).
+        """
+        result = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        keys = [self.text_key(text) for text in texts]
+        with self._lock:
+            if any(key not in self._index for key in keys) and min(self._file_rows()) > self._rows:
+                # Instance/tiến trình khác đã ghi thêm vector: đọc phần mới trước khi báo miss
+                with self._file_lock(exclusive=False):
+                    self._sync()
+            missing = []
+            for i, key in enumerate(keys):
+                row = self._index.get(key)
+                if row is None:
+                    missing.append(i)
+                else:
+                    result[i] = self._vectors[row]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return result, missing
+
+    def add(self, texts: Sequence[str], vectors: np.ndarray):
+        """Ghi nối thêm các vector mới vào cache (bỏ qua văn bản đã có)."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(texts), self.dimension)
+        with self._lock, self._file_lock():
+            # Vị trí hàng lấy từ file (dưới khóa), không từ chỉ mục trong bộ nhớ
+            self._repair()
+            self._sync()
+            new_keys, new_rows, seen = [], [], set()
+            for text, vector in zip(texts, vectors):
+                key = self.text_key(text)
+                if key in self._index or key in seen:
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                new_rows.append(vector)
+            if not new_keys:
+                return
+
+            start = self._rows
+            # Ghi vector trước, chỉ mục sau: nếu bị ngắt, hàng thiếu khóa sẽ bị cắt bỏ khi load
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack(new_rows).tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(new_keys))
+            for offset, key in enumerate(new_keys):
+                self._index[key] = start + offset
+            self._rows = start + len(new_keys)
+            self._remap(self._rows)
+
+    def stats(self) -> Dict[str, float]:
+        """Thống kê cache: số lần hit/miss và số vector đã lưu."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._index),
+        }
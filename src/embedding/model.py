@@ -3,45 +3,212 @@
 Module này định nghĩa class `EmbeddingModel` để xử lý việc tạo vector embeddings
 cho văn bản. Nó đóng gói mô hình SentenceTransformer và cung cấp một giao diện
 đơn giản để mã hóa văn bản.
+
+Backend suy luận chọn qua EMBEDDING_BACKEND (cùng một model, chỉ khác cách chạy trên CPU):
+- torch: PyTorch float32 (mặc định).
+- onnx: đồ thị ONNX chạy bằng onnxruntime (sentence-transformers >= 3.2 và optimum[onnxruntime]).
+- int8: PyTorch với trọng số các lớp Linear được lượng tử hóa động sang int8.
 """
 import os
+import numpy as np
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
+
+from src.config.paths import PROJECT_ROOT
+from .cache import EmbeddingCache
 
 load_dotenv()
 
+EMBEDDING_BACKENDS = ("torch", "onnx", "int8")
+
+# Câu mẫu cho kiểm tra độ khớp giữa backend đang dùng và PyTorch float32
+_PARITY_SAMPLES = [
+    "query: Giao thức nào được dùng để truyền dữ liệu giữa các thiết bị IoT?",
+    "passage: Bộ vi điều khiển sử dụng giao tiếp SPI với tốc độ xung nhịp tối đa 10 MHz.",
+    "passage: Nhiệt độ hoạt động của cảm biến nằm trong khoảng -40°C đến 85°C.",
+    "passage: The firmware update is transferred over UART and verified with a CRC32 checksum.",
+    "query: Điện áp cấp nguồn tối thiểu của module là bao nhiêu?",
+]
+
 class EmbeddingModel:
     """
     Wrapper cho mô hình SentenceTransformer để tạo embeddings.
     """
-    def __init__(self, model_name: str = None):
+    def __init__(self, model_name: str = None, use_cache: bool = None, backend: str = None, num_threads: int = None):
         """
         Khởi tạo và tải mô hình embedding.
         Args:
             model_name (str): Tên của mô hình từ Hugging Face.
                               Nếu không được cung cấp, sẽ lấy từ biến môi trường.
+            use_cache (bool): Dùng cache embedding trên đĩa (mặc định theo EMBEDDING_CACHE).
+            backend (str): "torch", "onnx" hoặc "int8" (mặc định theo EMBEDDING_BACKEND).
+            num_threads (int): Số thread CPU cho suy luận; 0 = mặc định của thư viện
+                               (mặc định theo EMBEDDING_THREADS).
         """
         if model_name is None:
             model_name = os.getenv("DENSE_MODEL", "intfloat/multilingual-e5-base")
+        if use_cache is None:
+            use_cache = os.getenv("EMBEDDING_CACHE", "true").lower() in ("1", "true", "yes")
+        if backend is None:
+            backend = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"EMBEDDING_BACKEND không được hỗ trợ: {backend} (chỉ hỗ trợ {', '.join(EMBEDDING_BACKENDS)}).")
+        if num_threads is None:
+            num_threads = int(os.getenv("EMBEDDING_THREADS", 0))
+        self.model_name = model_name
+        self.backend = backend
+        self.num_threads = num_threads
         
         # Thư mục cache model để tránh tải lại
-        cache_dir = os.path.join(os.path.dirname(__file__), "model_cache")
+        self._model_cache_dir = os.path.join(os.path.dirname(__file__), "model_cache")
         
-        print(f"Đang tải embedding model: {model_name}...")
-        self.model = SentenceTransformer(model_name, cache_folder=cache_dir)
+        print(f"Đang tải embedding model: {model_name} (backend: {backend})...")
+        self.model = self._load_model(backend)
+        # Ngân sách token mỗi batch khi gom văn bản theo độ dài (0 = số văn bản cố định mỗi batch)
+        self.max_batch_tokens = int(os.getenv("EMBEDDING_MAX_BATCH_TOKENS", 16384))
         print("✅ Tải embedding model thành công.")
 
-    def encode(self, texts: list[str] | str, batch_size: int = 32) -> list[list[float]] | list[float]:
+        if os.getenv("EMBEDDING_PARITY_CHECK", "false").lower() in ("1", "true", "yes") and backend != "torch":
+            self.parity_check(min_cosine=float(os.getenv("EMBEDDING_PARITY_MIN_COSINE", 0.99)))
+
+        # Cache embedding theo (tên model, hash văn bản): chỉ văn bản mới mới cần qua model
+        self.cache = None
+        if use_cache:
+            embedding_cache_dir = PROJECT_ROOT / os.getenv("EMBEDDING_CACHE_DIR", ".cache/embeddings")
+            try:
+                # Mỗi backend có không gian cache riêng: vector int8/ONNX không trộn với vector float32
+                cache_namespace = self.model_name if backend == "torch" else f"{self.model_name}@{backend}"
+                self.cache = EmbeddingCache(embedding_cache_dir, cache_namespace, self.get_dimension())
+                print(f"✅ Bật cache embedding ({len(self.cache)} vector) tại: {self.cache.cache_dir}")
+            except Exception as e:
+                print(f"⚠️ Không thể mở cache embedding ({e}). Tiếp tục không dùng cache.")
+
+    def _load_model(self, backend: str):
+        """Tải SentenceTransformer theo backend và áp dụng giới hạn số thread."""
+        # Import tại đây: sentence-transformers kéo theo torch (vài giây), chỉ cần khi thật sự tạo model
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if self.num_threads > 0:
+            torch.set_num_threads(self.num_threads)
+
+        if backend == "onnx":
+            model_kwargs = {"provider": "CPUExecutionProvider"}
+            if self.num_threads > 0:
+                import onnxruntime
+                session_options = onnxruntime.SessionOptions()
+                session_options.intra_op_num_threads = self.num_threads
+                model_kwargs["session_options"] = session_options
+            try:
+                # Lần đầu tự export model sang ONNX, các lần sau dùng lại file đã export trong cache
+                return SentenceTransformer(self.model_name, cache_folder=self._model_cache_dir,
+                                           device="cpu", backend="onnx", model_kwargs=model_kwargs)
+            except TypeError as e:
+                raise RuntimeError(
+                    "EMBEDDING_BACKEND=onnx cần sentence-transformers >= 3.2 và optimum[onnxruntime]."
+                ) from e
+
+        model = SentenceTransformer(self.model_name, cache_folder=self._model_cache_dir,
+                                    device="cpu" if backend == "int8" else None)
+        if backend == "int8":
+            # Lượng tử hóa động: trọng số Linear lưu int8, activation lượng tử hóa khi chạy
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def parity_check(self, texts: list[str] = None, min_cosine: float = 0.99) -> dict:
+        """
+        So sánh embedding của backend hiện tại với PyTorch float32 trên cùng các câu mẫu.
+        Returns:
+            dict gồm cosine nhỏ nhất/trung bình giữa hai bên và cờ `ok` (min >= min_cosine).
+        """
+        texts = texts or _PARITY_SAMPLES
+        if self.backend == "torch":
+            return {"min_cosine": 1.0, "mean_cosine": 1.0, "ok": True}
+        # Model tham chiếu chỉ tồn tại trong hàm này: được giải phóng ngay sau khi so sánh
+        from sentence_transformers import SentenceTransformer
+        reference_model = SentenceTransformer(self.model_name, cache_folder=self._model_cache_dir, device="cpu")
+        reference = np.asarray(reference_model.encode(texts, convert_to_numpy=True), dtype=np.float32)
+        candidate = self._encode_uncached(list(texts), batch_size=len(texts))
+        # Cosine theo từng câu (không giả định vector đã được chuẩn hóa)
+        cosines = np.sum(reference * candidate, axis=1) / (
+            np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1) + 1e-12
+        )
+        result = {"min_cosine": float(cosines.min()), "mean_cosine": float(cosines.mean()),
+                  "ok": bool(cosines.min() >= min_cosine)}
+        status = "✅" if result["ok"] else "⚠️"
+        print(f"{status} Parity {self.backend} vs torch float32: cosine min {result['min_cosine']:.4f}, "
+              f"trung bình {result['mean_cosine']:.4f} (ngưỡng {min_cosine})")
+        return result
+
+    def _token_lengths(self, texts: list[str]) -> np.ndarray:
+        """Số token (đã cắt theo max_seq_length) của từng văn bản; ước lượng theo ký tự nếu không có tokenizer."""
+        max_length = getattr(self.model, "max_seq_length", None) or 512
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            return np.fromiter((min(max_length, len(t) // 4 + 2) for t in texts), dtype=np.int64, count=len(texts))
+        input_ids = tokenizer(texts, truncation=True, max_length=max_length,
+                              return_attention_mask=False, return_token_type_ids=False)["input_ids"]
+        return np.fromiter((len(ids) for ids in input_ids), dtype=np.int64, count=len(texts))
+
+    def _length_buckets(self, lengths: np.ndarray, batch_size: int) -> list[np.ndarray]:
+        """
+        Chia các văn bản (sắp theo số token giảm dần) thành các batch có độ dài gần nhau.
+        Với EMBEDDING_MAX_BATCH_TOKENS > 0, batch của văn bản ngắn được nới rộng sao cho
+        (số văn bản x độ dài dài nhất) không vượt ngân sách token.
+        """
+        order = np.argsort(-lengths, kind="stable")
+        buckets, start = [], 0
+        while start < len(order):
+            size = batch_size
+            if self.max_batch_tokens > 0:
+                longest = max(1, int(lengths[order[start]]))
+                size = max(1, min(self.max_batch_tokens // longest, batch_size * 8))
+            buckets.append(order[start:start + size])
+            start += size
+        return buckets
+
+    def _encode_uncached(self, texts: list[str], batch_size: int) -> np.ndarray:
+        """
+        Chạy forward pass theo các batch cùng độ dài token để giảm padding, rồi ghi
+        kết quả vào đúng vị trí ban đầu trong một ma trận float32 liên tục.
+        """
+        embeddings = np.empty((len(texts), self.get_dimension()), dtype=np.float32)
+        if not texts:
+            return embeddings
+        for rows in self._length_buckets(self._token_lengths(texts), batch_size):
+            batch = [texts[i] for i in rows]
+            embeddings[rows] = self.model.encode(batch, batch_size=len(batch), show_progress_bar=False,
+                                                 convert_to_numpy=True)
+        return embeddings
+
+    def encode(self, texts: list[str] | str, batch_size: int = 32) -> np.ndarray:
         """
         Mã hóa một hoặc nhiều đoạn văn bản thành vector.
+        Các văn bản đã có trong cache embedding không phải chạy lại model.
         Args:
             texts (list[str] | str): Văn bản cần mã hóa.
-            batch_size (int): Kích thước batch khi xử lý danh sách văn bản.
+            batch_size (int): Kích thước batch khi xử lý danh sách văn bản
+                              (batch văn bản ngắn có thể lớn hơn, xem EMBEDDING_MAX_BATCH_TOKENS).
         Returns:
-            Vector embedding hoặc danh sách các vector.
+            np.ndarray float32: vector (dim,) với một văn bản, hoặc ma trận liên tục
+            (số văn bản x dim) theo đúng thứ tự đầu vào.
         """
-        embeddings = self.model.encode(texts, batch_size=batch_size, show_progress_bar=False)
-        return embeddings.tolist() if hasattr(embeddings, 'tolist') else embeddings
+        single = isinstance(texts, str)
+        items = [texts] if single else list(texts)
+
+        if self.cache is None:
+            embeddings = self._encode_uncached(items, batch_size)
+        else:
+            embeddings, missing = self.cache.lookup(items)
+            if missing:
+                # Chỉ encode mỗi văn bản chưa có một lần, kể cả khi lặp lại trong cùng lô
+                unique_texts = list(dict.fromkeys(items[i] for i in missing))
+                computed = self._encode_uncached(unique_texts, batch_size)
+                self.cache.add(unique_texts, computed)
+                row_of = {text: row for row, text in enumerate(unique_texts)}
+                for i in missing:
+                    embeddings[i] = computed[row_of[items[i]]]
+
+        return embeddings[0] if single else embeddings
 
     def get_dimension(self) -> int:
         """Trả về số chiều của vector embedding."""
@@ -0,0 +1,183 @@
+# src/llm/cache.py
+"""
+Module này cung cấp cache phản hồi LLM lưu trên đĩa (SQLite) để các lần chạy lại
+với cùng prompt (QA, llm_window, propositional) trả kết quả ngay lập tức thay vì
+gọi lại Ollama. Khóa cache gồm tên model, temperature và hash của prompt.
+Cache có giới hạn dung lượng và loại bỏ các mục ít được dùng gần đây nhất (LRU).
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+
+class LLMResponseCache:
+    """
+    Cache phản hồi LLM dựa trên SQLite, giới hạn dung lượng theo LRU.
+    An toàn khi dùng từ nhiều thread (ví dụ ConcurrentLLMExecutor).
+    """
+    def __init__(self, db_path: Path, max_bytes: int = 256 * 1024 * 1024):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                temperature REAL NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, temperature: float, prompt: str) -> str:
+        """Tạo khóa cache từ tên model, temperature và hash của prompt."""
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{model}|{float(temperature):.4f}|{prompt_hash}"
+
+    def get(self, key: str) -> Optional[str]:
+        """Trả về phản hồi đã cache (và cập nhật thời điểm truy cập), hoặc None."""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, model: str, temperature: float, response: str):
+        """Lưu phản hồi vào cache rồi loại bỏ các mục cũ nếu vượt giới hạn dung lượng."""
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, temperature, response, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, float(temperature), response, size, time.time()),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self):
+        """Xóa các mục ít được truy cập gần đây nhất cho tới khi dưới giới hạn dung lượng."""
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access ASC LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+
+    def stats(self) -> Dict[str, float]:
+        """Thống kê cache: số lần hit/miss, số mục và dung lượng hiện tại."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": self._total_bytes,
+        }
+
+
+# Tùy chọn của LLM gốc được đưa vào khóa cache vì chúng thay đổi nội dung phản hồi
+_OUTPUT_OPTIONS = ("num_predict", "num_ctx")
+
+
+class CachedLLM:
+    """
+    Bọc một LLM (ví dụ OllamaLLM) và trả phản hồi từ `LLMResponseCache` khi prompt
+    đã được gọi trước đó với cùng model và temperature.
+    Các thuộc tính khác (model, temperature, ...) được chuyển tiếp tới LLM gốc.
+    """
+    def __init__(self, llm, cache: LLMResponseCache):
+        object.__setattr__(self, "llm", llm)
+        object.__setattr__(self, "cache", cache)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def __setattr__(self, name, value):
+        # Ví dụ get_llm() cập nhật temperature: ghi thẳng vào LLM gốc
+        setattr(self.llm, name, value)
+
+    def _cache_key(self, prompt: str, kwargs: dict) -> str:
+        # Tham số gọi bổ sung (ví dụ stop) cũng ảnh hưởng tới phản hồi nên được đưa vào khóa
+        if kwargs:
+            prompt = f"{prompt}\x00{sorted(kwargs.items())!r}"
+        return self.cache.make_key(self._model_name() + self._options_tag(), self._temperature(), prompt)
+
+    def _options_tag(self) -> str:
+        # Tùy chọn Ollama làm thay đổi phản hồi: num_predict cắt ngắn đầu ra, num_ctx cắt bớt prompt.
+        # keep_alive, num_thread, base_url chỉ ảnh hưởng tốc độ nên không nằm trong khóa.
+        options = [(name, getattr(self.llm, name, None)) for name in _OUTPUT_OPTIONS]
+        return "".join(f";{name}={value}" for name, value in options if value is not None)
+
+    def _model_name(self) -> str:
+        return str(getattr(self.llm, "model", type(self.llm).__name__))
+
+    def _temperature(self) -> float:
+        return float(getattr(self.llm, "temperature", None) or 0.0)
+
+    def invoke(self, prompt: str, **kwargs) -> str:
+        """Giống `llm.invoke`, nhưng trả từ cache nếu có."""
+        key = self._cache_key(prompt, kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        response = self.llm.invoke(prompt, **kwargs)
+        self.cache.put(key, self._model_name(), self._temperature(), response)
+        return response
+
+    def stream(self, prompt: str, cache_tag: str = "", **kwargs) -> Iterator[str]:
+        """
+        Giống `llm.stream`: trả từng đoạn phản hồi. Nếu đã có trong cache thì trả cả phản hồi một lần.
+
+        Phản hồi được lưu cả khi consumer dừng đọc sớm (đóng generator), nên `cache_tag`
+        phải mô tả điều kiện dừng của consumer (ví dụ giới hạn token) để phản hồi bị cắt
+        không bị dùng lại cho một consumer khác. Phản hồi dở dang do lỗi thì không được lưu.
+        """
+        key = self._cache_key(f"{prompt}\x00stream:{cache_tag}", kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        completed = False
+        try:
+            for part in self.llm.stream(prompt, **kwargs):
+                parts.append(part)
+                yield part
+            completed = True
+        except GeneratorExit:
+            completed = True
+            raise
+        finally:
+            if completed and parts:
+                self.cache.put(key, self._model_name(), self._temperature(), "".join(parts))
@@ -6,19 +6,71 @@ instance của LLM được tạo ra (singleton pattern) để tiết kiệm tà
 """
 
 import os
+from typing import Any, Dict, Optional
 from dotenv import load_dotenv
 from langchain_core.language_models.llms import LLM
 from langchain_ollama import OllamaLLM
 
+from src.config.paths import PROJECT_ROOT
+from .cache import CachedLLM, LLMResponseCache
+
 load_dotenv()
 
 # Biến toàn cục để lưu trữ instance của LLM
 _llm_instance = None
 
+def _create_response_cache() -> Optional[LLMResponseCache]:
+    """Tạo cache phản hồi LLM trên đĩa theo cấu hình (LLM_CACHE=false để tắt)."""
+    if os.getenv("LLM_CACHE", "true").lower() not in ("1", "true", "yes"):
+        return None
+    # Đường dẫn tương đối được tính từ thư mục gốc của dự án
+    cache_path = PROJECT_ROOT / os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+    max_mb = float(os.getenv("LLM_CACHE_MAX_MB", 256))
+    try:
+        cache = LLMResponseCache(cache_path, max_bytes=int(max_mb * 1024 * 1024))
+        print(f"✅ Bật cache phản hồi LLM tại: {cache_path}")
+        return cache
+    except Exception as e:
+        print(f"⚠️ Không thể mở cache phản hồi LLM ({e}). Tiếp tục không dùng cache.")
+        return None
+
+# Biến môi trường -> tham số của OllamaLLM (chỉ truyền khi được đặt)
+_OLLAMA_OPTIONS = {
+    "OLLAMA_BASE_URL": "base_url",
+    "OLLAMA_KEEP_ALIVE": "keep_alive",
+    "OLLAMA_NUM_CTX": "num_ctx",
+    "OLLAMA_NUM_THREAD": "num_thread",
+    "OLLAMA_NUM_PREDICT": "num_predict",
+}
+
+def _ollama_options() -> Dict[str, Any]:
+    """
+    Đọc các tùy chọn runtime của Ollama từ biến môi trường.
+    Chỉ giữ các tùy chọn mà phiên bản langchain-ollama đang cài hỗ trợ.
+    """
+    supported = getattr(OllamaLLM, "model_fields", None) or getattr(OllamaLLM, "__fields__", {})
+    options: Dict[str, Any] = {}
+    for env_name, field_name in _OLLAMA_OPTIONS.items():
+        value = os.getenv(env_name, "").strip()
+        if not value:
+            continue
+        if field_name not in supported:
+            print(f"⚠️ Phiên bản langchain-ollama hiện tại không hỗ trợ '{field_name}' ({env_name}), bỏ qua.")
+            continue
+        if field_name == "base_url":
+            options[field_name] = value
+        elif field_name == "keep_alive":
+            # Số giây (ví dụ -1 = giữ model trong RAM mãi mãi) hoặc chuỗi thời lượng ("30m")
+            options[field_name] = int(value) if value.lstrip("-").isdigit() else value
+        else:
+            options[field_name] = int(value)
+    return options
+
 def get_llm(temperature: float = 0.0) -> LLM:
     """
     Lấy một instance của LLM đã được cấu hình.
     Sử dụng singleton pattern để tránh khởi tạo lại mô hình.
+    Các tùy chọn runtime của Ollama (OLLAMA_KEEP_ALIVE, OLLAMA_NUM_CTX, ...) được đọc từ cấu hình.
     Args:
         temperature (float): "Nhiệt độ" của mô hình, kiểm soát sự sáng tạo.
                              0.0 cho câu trả lời nhất quán, >0 cho sự đa dạng.
@@ -33,12 +85,19 @@ def get_llm(temperature: float = 0.0) -> LLM:
         
         if llm_type == "ollama":
             model_name = os.getenv("CHAT_MODEL", "qwen2.5:3b")
+            options = _ollama_options()
             print(f"Đang khởi tạo Ollama LLM với model: {model_name}...")
+            if options:
+                print(f"   Tùy chọn Ollama: {options}")
             _llm_instance = OllamaLLM(
                 model=model_name,
                 temperature=temperature,
+                **options,
             )
             print("✅ Khởi tạo LLM thành công.")
+            cache = _create_response_cache()
+            if cache is not None:
+                _llm_instance = CachedLLM(_llm_instance, cache)
         else:
             raise ValueError(f"Loại LLM '{llm_type}' không được hỗ trợ.")
             
@@ -47,3 +106,9 @@ def get_llm(temperature: float = 0.0) -> LLM:
         _llm_instance.temperature = temperature
 
     return _llm_instance
+
+
+def get_llm_cache_stats() -> Optional[Dict[str, float]]:
+    """Trả về thống kê hit/miss của cache phản hồi LLM, hoặc None nếu cache không bật."""
+    cache = getattr(_llm_instance, "cache", None) if _llm_instance is not None else None
+    return cache.stats() if isinstance(cache, LLMResponseCache) else None
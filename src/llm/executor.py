@@ -0,0 +1,100 @@
+# src/llm/executor.py
+"""
+Module này cung cấp `ConcurrentLLMExecutor` để gửi nhiều prompt tới LLM song song
+với số request đồng thời (in-flight) có giới hạn, tự động thử lại khi lỗi
+(exponential backoff) và luôn trả kết quả theo đúng thứ tự prompt đầu vào.
+Có thể đặt hạn chót (deadline) cho cả lô: prompt chưa bắt đầu khi hết giờ nhận
+giá trị mặc định thay vì tiếp tục chờ LLM.
+Ollama có thể phục vụ nhiều request song song (OLLAMA_NUM_PARALLEL), nên
+việc gửi tuần tự từng prompt làm lãng phí cả server lẫn CPU phía client.
+"""
+
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+from dotenv import load_dotenv
+
+from src.telemetry.tracing import count, span
+from .client import get_llm
+
+load_dotenv()
+
+
+class ConcurrentLLMExecutor:
+    """
+    Thực thi nhiều lời gọi `llm.invoke` song song bằng thread pool.
+    """
+    def __init__(self, llm=None, max_in_flight: int = None, max_retries: int = None, backoff_seconds: float = None):
+        """
+        Args:
+            llm: Instance LLM (mặc định lấy từ get_llm()).
+            max_in_flight (int): Số request tối đa gửi đồng thời tới LLM.
+            max_retries (int): Số lần thử lại khi một lời gọi thất bại.
+            backoff_seconds (float): Thời gian chờ cơ sở, nhân đôi sau mỗi lần thử lại.
+        """
+        self.llm = llm if llm is not None else get_llm()
+        if max_in_flight is None:
+            max_in_flight = int(os.getenv("LLM_MAX_IN_FLIGHT", 4))
+        if max_retries is None:
+            max_retries = int(os.getenv("LLM_MAX_RETRIES", 3))
+        if backoff_seconds is None:
+            backoff_seconds = float(os.getenv("LLM_RETRY_BACKOFF", 1.0))
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max(0, max_retries)
+        self.backoff_seconds = max(0.0, backoff_seconds)
+
+    def invoke(self, prompt: str, deadline: Optional[float] = None) -> str:
+        """
+        Gọi LLM cho một prompt, thử lại với exponential backoff (có jitter) khi lỗi.
+        `deadline` (theo time.monotonic()): không thử lại nếu lần chờ tiếp theo vượt hạn chót.
+        """
+        attempt = 0
+        while True:
+            try:
+                with span("llm.invoke", attempt=attempt + 1):
+                    response = self.llm.invoke(prompt)
+                count("llm.calls")
+                return response
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt) * (1 + random.random() * 0.1)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+                attempt += 1
+                count("llm.retries")
+                print(f"  ⚠ Lỗi khi gọi LLM ({e}). Thử lại lần {attempt}/{self.max_retries} sau {delay:.1f}s...")
+                time.sleep(delay)
+
+    def map(self, prompts: Sequence[str], default: Optional[str] = None,
+            deadline: Optional[float] = None) -> List[Optional[str]]:
+        """
+        Gọi LLM cho tất cả prompt với tối đa `max_in_flight` request đồng thời.
+        Kết quả giữ đúng thứ tự của `prompts`; prompt thất bại sau mọi lần thử lại,
+        hoặc chưa kịp gửi trước `deadline` (theo time.monotonic()), nhận giá trị `default`.
+        Request đang chạy khi hết giờ vẫn được chờ cho tới khi LLM trả lời.
+        """
+        if not prompts:
+            return []
+        if self.max_in_flight == 1 or len(prompts) == 1:
+            return [self.invoke_or_default(prompt, default, deadline) for prompt in prompts]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(prompts))) as pool:
+            return list(pool.map(lambda prompt: self.invoke_or_default(prompt, default, deadline), prompts))
+
+    def invoke_or_default(self, prompt: str, default: Optional[str] = None,
+                          deadline: Optional[float] = None) -> Optional[str]:
+        """
+        Như `invoke`, nhưng trả về `default` thay vì ném lỗi khi mọi lần thử lại đều thất bại
+        (hoặc khi đã quá `deadline`). Dùng để tự gửi prompt vào thread pool riêng.
+        """
+        if deadline is not None and time.monotonic() >= deadline:
+            return default
+        try:
+            return self.invoke(prompt, deadline)
+        except Exception as e:
+            print(f"  ❌ Gọi LLM thất bại sau {self.max_retries} lần thử lại: {e}")
+            return default
@@ -0,0 +1,118 @@
+# src/llm/streaming.py
+"""
+Module này cho phép đọc phản hồi LLM theo kiểu streaming và dừng sinh token ngay khi
+đã nhận đủ một object JSON hoàn chỉnh (ví dụ có khóa `correct_answers`), thay vì chờ
+model sinh hết phần đuôi thừa sau dấu `}` cuối cùng. Đóng stream sẽ ngắt kết nối HTTP
+tới Ollama, và Ollama hủy việc sinh token của request đó.
+"""
+
+import json
+import threading
+from itertools import chain
+from typing import Optional
+
+from src.telemetry.tracing import count, span
+from .cache import CachedLLM
+
+
+class JsonObjectDetector:
+    """
+    Quét văn bản tăng dần (theo từng đoạn stream) và theo dõi độ sâu ngoặc nhọn,
+    bỏ qua ngoặc nằm trong chuỗi JSON. Khi một object ở cấp ngoài cùng đóng lại và
+    parse được, có chứa `required_key` (nếu có), `feed` trả về đoạn văn bản của object đó.
+    """
+    def __init__(self, required_key: Optional[str] = None):
+        self.required_key = required_key
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._start = -1
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> Optional[str]:
+        self.text += chunk
+        text = self.text
+        while self._pos < len(text):
+            char = text[self._pos]
+            self._pos += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                # Chỉ coi là chuỗi khi đang ở trong object; dấu " trong văn bản tự do bị bỏ qua
+                self._in_string = self._depth > 0
+            elif char == "{":
+                if self._depth == 0:
+                    self._start = self._pos - 1
+                self._depth += 1
+            elif char == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = text[self._start:self._pos]
+                    if self._is_complete(candidate):
+                        return candidate
+        return None
+
+    def _is_complete(self, candidate: str) -> bool:
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            return False
+        return isinstance(data, dict) and (self.required_key is None or self.required_key in data)
+
+
+class JsonStreamingLLM:
+    """
+    Bọc một LLM để `invoke` đọc phản hồi theo stream và dừng sớm khi:
+    - đã có object JSON hoàn chỉnh chứa `required_key`, hoặc
+    - đã nhận `max_new_tokens` đoạn stream (Ollama gửi mỗi token một đoạn; None = không giới hạn).
+    Có thể dùng thay cho LLM gốc trong `ConcurrentLLMExecutor` (vẫn có thử lại và chạy song song).
+    """
+    def __init__(self, llm, required_key: Optional[str] = None, max_new_tokens: Optional[int] = None):
+        self.llm = llm
+        self.required_key = required_key
+        self.max_new_tokens = max_new_tokens if max_new_tokens and max_new_tokens > 0 else None
+        # invoke chạy trên nhiều thread của ConcurrentLLMExecutor: các bộ đếm dùng chung một lock
+        self._lock = threading.Lock()
+        self.early_stops = 0
+        self.truncated = 0
+
+    def invoke(self, prompt: str) -> str:
+        detector = JsonObjectDetector(self.required_key)
+        kwargs = {}
+        if isinstance(self.llm, CachedLLM):
+            # Phản hồi bị cắt phụ thuộc vào điều kiện dừng nên điều kiện này nằm trong khóa cache
+            kwargs["cache_tag"] = f"json:{self.required_key};max_new_tokens:{self.max_new_tokens}"
+        stream = iter(self.llm.stream(prompt, **kwargs))
+        tokens = 0
+        try:
+            # Thời gian tới token đầu tiên ~ prefill (xử lý prompt); phần còn lại là sinh token
+            with span("llm.prefill"):
+                first = next(stream, None)
+            with span("llm.generate") as generation:
+                for part in chain([first], stream) if first is not None else ():
+                    tokens += 1
+                    generation["tokens"] = tokens
+                    answer = detector.feed(part)
+                    if answer is not None:
+                        with self._lock:
+                            self.early_stops += 1
+                        generation["early_stop"] = True
+                        return detector.text
+                    if self.max_new_tokens is not None and tokens >= self.max_new_tokens:
+                        with self._lock:
+                            self.truncated += 1
+                        print(f"  ⚠ Phản hồi LLM bị cắt ở giới hạn {self.max_new_tokens} token.")
+                        return detector.text
+                return detector.text
+        finally:
+            count("llm.stream_chunks", tokens)
+            # Đóng stream để ngừng sinh token phía server
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
@@ -0,0 +1,87 @@
+# src/pipeline/manifest.py
+"""
+Module này quản lý manifest của tác vụ extract: hash nội dung của từng file PDF
+và danh sách chunk/point ID đã được index cho file đó. Nhờ manifest, một lần
+chạy extract mới chỉ cần xử lý các PDF mới hoặc đã thay đổi, xóa các point của
+PDF đã bị xóa/thay đổi và upsert phần chênh lệch thay vì build lại toàn bộ.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    """Tính sha256 của nội dung file theo từng khối để không phải đọc cả file vào RAM."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractManifest:
+    """
+    Manifest dạng JSON lưu ở thư mục output:
+    {
+        "version": 1,
+        "settings": {...},                      # cấu hình ảnh hưởng tới index
+        "documents": {
+            "<pdf stem>": {"file": "...", "sha256": "...", "chunk_ids": [...]}
+        }
+    }
+    """
+    def __init__(self, path: Path, settings: Optional[Dict] = None, documents: Optional[Dict[str, Dict]] = None):
+        self.path = Path(path)
+        self.settings = settings or {}
+        self.documents: Dict[str, Dict] = documents or {}
+
+    @classmethod
+    def load(cls, path: Path) -> "ExtractManifest":
+        """Đọc manifest; trả về manifest rỗng nếu file chưa có hoặc không đọc được."""
+        path = Path(path)
+        if not path.exists():
+            return cls(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                print(f"⚠️ Phiên bản manifest không khớp ({data.get('version')}). Sẽ build lại toàn bộ.")
+                return cls(path)
+            return cls(path, data.get("settings"), data.get("documents"))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Không thể đọc manifest {path}: {e}. Sẽ build lại toàn bộ.")
+            return cls(path)
+
+    def save(self):
+        """Ghi manifest ra file tạm rồi đổi tên để tránh file hỏng khi bị ngắt giữa chừng."""
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": MANIFEST_VERSION, "settings": self.settings, "documents": self.documents},
+                f, ensure_ascii=False, indent=2,
+            )
+        tmp_path.replace(self.path)
+
+    def is_compatible(self, settings: Dict) -> bool:
+        """Manifest chỉ dùng được cho incremental extract nếu cấu hình index không đổi."""
+        return bool(self.documents) and self.settings == settings
+
+    def is_unchanged(self, doc_name: str, sha256: str) -> bool:
+        return self.documents.get(doc_name, {}).get("sha256") == sha256
+
+    def chunk_ids_of(self, doc_names: Iterable[str]) -> List[str]:
+        """Tất cả chunk/point ID đã index cho các tài liệu được chỉ định."""
+        ids = []
+        for doc_name in doc_names:
+            ids.extend(self.documents.get(doc_name, {}).get("chunk_ids", []))
+        return ids
+
+    def update_document(self, doc_name: str, file_name: str, sha256: str, chunk_ids: List[str]):
+        self.documents[doc_name] = {"file": file_name, "sha256": sha256, "chunk_ids": chunk_ids}
+
+    def remove_document(self, doc_name: str):
+        self.documents.pop(doc_name, None)
@@ -1,63 +1,213 @@
 # src/pipeline/tasks.py
 """
 Module này điều phối các tác vụ chính của pipeline: extract và qa.
+
+Các thư viện nặng (PyMuPDF, torch/sentence-transformers, qdrant-client, pandas,
+langchain) chỉ được import bên trong tác vụ cần đến chúng, để `--help` hay
+việc import module này không phải trả chi phí khởi động của chúng.
 """
+import os
+import shutil
+import sys
 import traceback
 import json
 from pathlib import Path
 
-from src.data_processing.pdf_parser import PDFMarkdownConverter
-from src.embedding.model import EmbeddingModel
-from src.vectordb.store import VectorStore
-from src.vectordb.indexer import index_documents
-from src.rag_system.qa_handler import QAHandler
-from src.rag_system.retriever import HybridRetriever
+from src.telemetry.tracing import TRACER, span
 from .output_generator import OutputGenerator
+from .manifest import ExtractManifest, file_sha256
+
+# Các module nặng mà mỗi tác vụ import (dùng cho báo cáo thời gian import của main.py).
+# sentence_transformers được EmbeddingModel import khi khởi tạo model.
+TASK_MODULES = {
+    "extract": [
+        "src.data_processing.pdf_parser",
+        "src.embedding.model",
+        "sentence_transformers",
+        "src.vectordb.store",
+        "src.vectordb.indexer",
+        "src.rag_system.bm25",
+        "src.vectordb.corpus",
+    ],
+    "qa": [
+        "src.embedding.model",
+        "sentence_transformers",
+        "src.vectordb.store",
+        "src.rag_system.qa_handler",
+        "src.rag_system.retriever",
+        "src.rag_system.bm25",
+    ],
+}
+
+def _print_llm_cache_stats():
+    """In thống kê cache phản hồi LLM (nếu LLM đã được dùng và cache đang bật)."""
+    if "src.llm.client" not in sys.modules:
+        return  # Tác vụ không dùng LLM: không import langchain chỉ để in thống kê
+    from src.llm.client import get_llm_cache_stats
+    stats = get_llm_cache_stats()
+    if stats:
+        print(f"📊 LLM cache: {stats['hits']} hit / {stats['misses']} miss "
+              f"({stats['hit_rate'] * 100:.1f}%), {stats['entries']} mục, {stats['size_bytes'] / 1024 / 1024:.1f} MB")
+
+def _write_trace_report(output_dir: Path):
+    """In các giai đoạn tốn thời gian nhất và ghi báo cáo trace của tác vụ vào thư mục output."""
+    TRACER.print_report()
+    try:
+        for path in TRACER.write_report(output_dir):
+            print(f"💾 Đã lưu trace vào: {path}")
+    except OSError as e:
+        print(f"⚠️ Không thể ghi báo cáo trace: {e}")
+
+def _index_settings(collection_name: str) -> dict:
+    """Các cấu hình mà nếu thay đổi thì phải build lại toàn bộ index."""
+    strategy = os.getenv("CHUNKING_STRATEGY", "recursive_char")
+    settings = {
+        "collection": collection_name,
+        "chunking_strategy": strategy,
+        "dense_model": os.getenv("DENSE_MODEL", "intfloat/multilingual-e5-base"),
+        "vector_quantization": os.getenv("VECTOR_QUANTIZATION", "none").lower(),
+        # Vector của backend int8/ONNX khác (dù rất ít) vector float32: không trộn trong một collection
+        "embedding_backend": os.getenv("EMBEDDING_BACKEND", "torch").lower(),
+    }
+    # Tham số làm thay đổi điểm cắt (và do đó nội dung/ID chunk) của từng chiến lược
+    if strategy == "semantic_similarity":
+        settings["semantic_local_window"] = int(os.getenv("SEMANTIC_LOCAL_WINDOW", 0))
+    elif strategy == "propositional":
+        settings["propositional_segment_chars"] = int(os.getenv("PROPOSITIONAL_SEGMENT_CHARS", 2000))
+    return settings
+
+def _load_corpus(corpus_path: Path) -> list:
+    if not corpus_path.exists():
+        return []
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
 
 def run_extract_task(paths: dict) -> bool:
     """
     Chạy tác vụ trích xuất: đọc PDF, chunk, embed, và index.
-    Lưu lại corpus để tác vụ QA có thể sử dụng cho BM25.
+    Lưu lại corpus và BM25 index để tác vụ QA có thể sử dụng.
+    Mặc định chạy incremental: dựa vào manifest (hash nội dung từng PDF), chỉ
+    xử lý PDF mới/thay đổi, xóa point của PDF đã xóa/thay đổi và upsert phần mới.
     """
+    from src.data_processing.pdf_parser import convert_documents
+    from src.embedding.model import EmbeddingModel
+    from src.vectordb.store import VectorStore
+    from src.vectordb.indexer import index_documents
+    from src.rag_system.bm25 import BM25Index
+    from src.vectordb.corpus import DocumentRegistry
+
     print("\n" + "="*25 + " BẮT ĐẦU TÁC VỤ EXTRACT " + "="*25)
+    TRACER.reset("extract")
     input_dir = Path(paths["pdf_dir"])
     output_dir = Path(paths["output_dir"])
     corpus_path = output_dir / "corpus.json"
+    bm25_index_dir = output_dir / "bm25_index"
+    collection_name = f"collection_{input_dir.name}"
     
-    converter = PDFMarkdownConverter()
     extracted_data = {}
 
-    pdf_files = list(input_dir.glob("*.pdf"))
+    pdf_files = sorted(input_dir.glob("*.pdf"))
     if not pdf_files:
         print(f"❌ Không tìm thấy file PDF nào trong: {input_dir}")
         return False
 
-    for pdf in pdf_files:
-        pdf_output_sub_dir = output_dir / pdf.stem
-        try:
-            md_content, image_count = converter.convert(pdf, pdf_output_sub_dir)
+    # Xác định PDF nào cần xử lý lại dựa trên manifest
+    manifest = ExtractManifest.load(output_dir / "manifest.json")
+    settings = _index_settings(collection_name)
+    previous_corpus = _load_corpus(corpus_path)
+    incremental = (
+        os.getenv("INCREMENTAL_EXTRACT", "true").lower() in ("1", "true", "yes")
+        and manifest.is_compatible(settings)
+        and bool(previous_corpus)
+    )
+
+    embedding_model = EmbeddingModel()
+    vector_db = VectorStore(collection_name, embedding_model)
+    if incremental and vector_db.count_points() != len(previous_corpus):
+        print("⚠️ Collection không khớp với corpus đã lưu. Chuyển sang build lại toàn bộ...")
+        incremental = False
+
+    file_hashes = {pdf.stem: file_sha256(pdf) for pdf in pdf_files}
+    if incremental:
+        to_convert = [
+            pdf for pdf in pdf_files
+            if not manifest.is_unchanged(pdf.stem, file_hashes[pdf.stem])
+            or not (output_dir / pdf.stem / "main.md").exists()
+        ]
+        removed = sorted(set(manifest.documents) - set(file_hashes))
+        print(f"♻️ Incremental extract: {len(to_convert)} PDF mới/thay đổi, "
+              f"{len(removed)} PDF đã xóa, {len(pdf_files) - len(to_convert)} PDF không đổi.")
+    else:
+        to_convert, removed = pdf_files, []
+        manifest.documents = {}
+        manifest.settings = settings
+
+    # main.md nằm ở output/<pdf>/main.md, ảnh ở output/<pdf>/images/
+    # PDF_WORKERS > 1: chuyển đổi song song theo tài liệu và theo khoảng trang
+    with span("extract.convert_pdfs", documents=len(to_convert)):
+        conversion_results = convert_documents(
+            [(pdf, output_dir / pdf.stem / "images") for pdf in to_convert],
+            workers=int(os.getenv("PDF_WORKERS", 1)),
+            pages_per_task=int(os.getenv("PDF_PAGES_PER_TASK", 32)),
+        )
+    for pdf in to_convert:
+        result = conversion_results.get(pdf.stem)
+        if isinstance(result, Exception):
+            print(f"❌ Lỗi khi xử lý {pdf.name}: {result}")
+            traceback.print_exception(type(result), result, result.__traceback__)
+        elif result is not None:
+            md_content, image_count = result
             extracted_data[pdf.stem] = md_content
             print(f"✅ Trích xuất thành công: {pdf.name} ({image_count} ảnh)")
-        except Exception as e:
-            print(f"❌ Lỗi khi xử lý {pdf.name}: {e}")
-            traceback.print_exc()
 
-    if not extracted_data:
+    if not extracted_data and not incremental:
         print("❌ Không có file PDF nào được xử lý thành công.")
         return False
 
-    embedding_model = EmbeddingModel()
-    collection_name = f"collection_{input_dir.name}"
-    vector_db = VectorStore(collection_name, embedding_model)
-    
-    # Index dữ liệu và lấy lại corpus
-    corpus_for_bm25 = index_documents(extracted_data, vector_db)
+    if incremental:
+        # Chỉ xóa point của tài liệu đã xóa hoặc đã được xử lý lại thành công
+        stale_docs = set(removed) | set(extracted_data)
+        with span("vectordb.delete", documents=len(stale_docs)):
+            vector_db.delete_points(manifest.chunk_ids_of(stale_docs))
+        with span("extract.index", documents=len(extracted_data)):
+            new_entries = index_documents(extracted_data, vector_db, recreate=False) if extracted_data else []
+        corpus_for_bm25 = [doc for doc in previous_corpus if doc["source"] not in stale_docs] + new_entries
+        for doc_name in removed:
+            manifest.remove_document(doc_name)
+            # Xóa luôn output của PDF đã bị xóa để answer.md không còn chứa tài liệu đó
+            shutil.rmtree(output_dir / doc_name, ignore_errors=True)
+    else:
+        # Index dữ liệu và lấy lại corpus
+        with span("extract.index", documents=len(extracted_data)):
+            corpus_for_bm25 = index_documents(extracted_data, vector_db)
+
+    for pdf in to_convert:
+        if pdf.stem in extracted_data:
+            chunk_ids = [doc["id"] for doc in corpus_for_bm25 if doc["source"] == pdf.stem]
+            manifest.update_document(pdf.stem, pdf.name, file_hashes[pdf.stem], chunk_ids)
 
     # Lưu corpus cho tác vụ QA
     with open(corpus_path, 'w', encoding='utf-8') as f:
         json.dump(corpus_for_bm25, f, ensure_ascii=False, indent=2)
     print(f"💾 Đã lưu corpus cho BM25 vào: {corpus_path}")
 
+    # Build BM25 index một lần ở đây để tác vụ QA chỉ cần memory-map
+    with span("extract.bm25_build", chunks=len(corpus_for_bm25)):
+        registry = DocumentRegistry(corpus_for_bm25)
+        bm25_texts = [doc["content"] for doc in registry]
+        bm25_index = BM25Index.build(bm25_texts)
+        bm25_index.save(bm25_index_dir, registry.ids)
+    print(f"💾 Đã lưu BM25 index vào: {bm25_index_dir}")
+    if os.getenv("BM25_PARITY_CHECK", "false").lower() in ("1", "true", "yes"):
+        # So sánh top-n với rank_bm25 (cần cài rank_bm25), kể cả các truy vấn hòa điểm
+        bm25_index.parity_check(bm25_texts)
+    vector_db.memory_report()
+
+    # Manifest được ghi sau cùng: nếu bị ngắt trước đó, lần chạy sau sẽ xử lý lại
+    manifest.save()
+
+    _print_llm_cache_stats()
+    _write_trace_report(output_dir)
     print("\n" + "="*24 + " HOÀN THÀNH TÁC VỤ EXTRACT " + "="*24)
     return True
 
@@ -65,9 +215,17 @@ def run_qa_task(paths: dict):
     """
     Chạy tác vụ trả lời câu hỏi: tải corpus, khởi tạo retriever, và xử lý câu hỏi.
     """
+    from src.embedding.model import EmbeddingModel
+    from src.vectordb.store import VectorStore
+    from src.rag_system.qa_handler import QAHandler
+    from src.rag_system.retriever import HybridRetriever
+    from src.rag_system.bm25 import BM25Index
+
     print("\n" + "="*28 + " BẮT ĐẦU TÁC VỤ QA " + "="*28)
+    TRACER.reset("qa")
     output_dir = Path(paths["output_dir"])
     corpus_path = output_dir / "corpus.json"
+    bm25_index_dir = output_dir / "bm25_index"
 
     # Tải corpus đã được xử lý từ tác vụ extract
     if not corpus_path.exists():
@@ -85,14 +243,24 @@ def run_qa_task(paths: dict):
     collection_name = f"collection_{Path(paths['pdf_dir']).name}"
     vector_db = VectorStore(collection_name, embedding_model)
     
+    # Memory-map BM25 index đã lưu ở tác vụ extract (nếu có)
+    bm25_index = None
+    if bm25_index_dir.exists():
+        try:
+            bm25_index = BM25Index.load(bm25_index_dir)
+        except Exception as e:
+            print(f"⚠️ Không thể tải BM25 index: {e}. Sẽ build lại từ corpus.")
+
     # Khởi tạo Hybrid Retriever
-    retriever = HybridRetriever(vector_db, corpus_data)
+    with span("qa.retriever_init", chunks=len(corpus_data)):
+        retriever = HybridRetriever(vector_db, corpus_data, bm25_index=bm25_index)
     
     # Khởi tạo QA Handler với retriever
     qa_handler = QAHandler(retriever)
     
     # Xử lý các câu hỏi
-    qa_results = qa_handler.process_questions_csv(paths["question_csv"])
+    with span("qa.questions"):
+        qa_results = qa_handler.process_questions_csv(paths["question_csv"])
     if qa_results is None:
         return
 
@@ -106,7 +274,10 @@ def run_qa_task(paths: dict):
             if md_file.exists():
                 extracted_md_data[subdir.name] = md_file.read_text(encoding="utf-8")
 
-    generator.generate_final_output(extracted_md_data, qa_results, paths["zip_name"])
+    with span("qa.output"):
+        generator.generate_final_output(extracted_md_data, qa_results, paths["zip_name"])
+    _print_llm_cache_stats()
+    _write_trace_report(output_dir)
     
     print("\n" + "="*27 + " HOÀN THÀNH TÁC VỤ QA " + "="*27)
 
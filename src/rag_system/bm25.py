@@ -0,0 +1,265 @@
+# src/rag_system/bm25.py
+"""
+Module này chứa engine BM25 (Okapi) dựa trên ma trận thưa CSR term x document.
+Trọng số BM25 của mỗi cặp (term, document) được tính sẵn khi build index, nên
+việc chấm điểm một truy vấn chỉ là cộng các hàng (postings) của các term trong
+truy vấn, chỉ trên các document chứa ít nhất một term.
+Tham số, công thức và cả thứ tự các phép tính dấu phẩy động giữ nguyên như
+`rank_bm25.BM25Okapi`, nên điểm khớp từng bit và thứ tự top-n (kể cả khi hòa điểm) khớp `get_top_n`.
+
+Index có thể được lưu ra thư mục ở dạng nhị phân (.npy) ngay khi extract và
+được memory-map lại ở tác vụ QA, nên QA không cần tokenize lại corpus và nhiều
+tiến trình QA có thể dùng chung một bản trong page cache.
+"""
+
+import hashlib
+import json
+import math
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy import sparse
+
+
+# 2: trọng số tính theo đúng thứ tự phép tính của BM25Okapi (index cũ lệch ở bit cuối, cần build lại)
+INDEX_FORMAT_VERSION = 2
+
+
+def tokenize(text: str) -> List[str]:
+    """Tách từ giống hệt cách HybridRetriever vẫn dùng trước đây."""
+    return text.split(" ")
+
+
+def corpus_fingerprint(doc_ids: Sequence[str]) -> str:
+    """Dấu vân tay của thứ tự chunk ID, dùng để kiểm tra index có khớp với corpus không."""
+    return hashlib.sha1("\n".join(doc_ids).encode("utf-8")).hexdigest()
+
+
+class BM25Index:
+    """
+    BM25 Okapi trên ma trận thưa.
+    `term_matrix` có shape (số term, số document), mỗi phần tử là trọng số BM25
+    đã tính sẵn: idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)).
+    """
+    def __init__(self, term_matrix: sparse.csr_matrix, vocab: Dict[str, int], idf: np.ndarray,
+                 doc_len: np.ndarray, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25,
+                 fingerprint: Optional[str] = None):
+        self.term_matrix = term_matrix
+        self.vocab = vocab
+        self.idf = idf
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.fingerprint = fingerprint
+
+    @property
+    def corpus_size(self) -> int:
+        return self.term_matrix.shape[1]
+
+    @classmethod
+    def build(cls, corpus: Sequence[str], k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25) -> "BM25Index":
+        """Tokenize corpus và tính sẵn toàn bộ trọng số BM25."""
+        vocab: Dict[str, int] = {}
+        rows, cols, tfs = [], [], []
+        doc_len = np.zeros(len(corpus), dtype=np.float64)
+
+        for doc_idx, text in enumerate(corpus):
+            tokens = tokenize(text)
+            doc_len[doc_idx] = len(tokens)
+            for token, tf in Counter(tokens).items():
+                rows.append(vocab.setdefault(token, len(vocab)))
+                cols.append(doc_idx)
+                tfs.append(tf)
+
+        corpus_size = len(corpus)
+        tf_matrix = sparse.csr_matrix(
+            (np.asarray(tfs, dtype=np.float64), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+            shape=(len(vocab), corpus_size),
+        )
+
+        # IDF giống BM25Okapi: idf âm được thay bằng epsilon * idf trung bình.
+        # Tính bằng math.log và cộng dồn tuần tự (theo thứ tự term xuất hiện) như BM25Okapi,
+        # vì np.log / np.mean có thể lệch ở bit cuối và làm đảo thứ tự các document hòa điểm
+        df = np.diff(tf_matrix.indptr)
+        idf = np.array([math.log(corpus_size - int(freq) + 0.5) - math.log(int(freq) + 0.5) for freq in df],
+                       dtype=np.float64)
+        if len(idf):
+            idf_sum = 0.0
+            for value in idf.tolist():
+                idf_sum += value
+            idf[idf < 0] = epsilon * (idf_sum / len(idf))
+
+        avgdl = doc_len.sum() / corpus_size if corpus_size else 0.0
+        length_norm = k1 * (1 - b + b * doc_len / avgdl) if avgdl else np.full(corpus_size, k1)
+
+        tf = tf_matrix.data
+        term_of_entry = np.repeat(np.arange(len(vocab)), np.diff(tf_matrix.indptr))
+        tf_matrix.data = idf[term_of_entry] * (tf * (k1 + 1) / (tf + length_norm[tf_matrix.indices]))
+
+        return cls(tf_matrix, vocab, idf, doc_len, k1=k1, b=b, epsilon=epsilon)
+
+    def save(self, index_dir: Path, doc_ids: Optional[Sequence[str]] = None):
+        """
+        Lưu index ra thư mục: vocabulary (JSON), postings CSR, độ dài document và IDF (.npy).
+        `doc_ids` (nếu có) được lưu dưới dạng fingerprint để kiểm tra khi load.
+        """
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        matrix = self.term_matrix
+        # indptr và indices phải cùng kiểu để scipy không copy khi load từ memory-map
+        index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+        np.save(index_dir / "indptr.npy", matrix.indptr.astype(index_dtype))
+        np.save(index_dir / "indices.npy", matrix.indices.astype(index_dtype))
+        np.save(index_dir / "weights.npy", matrix.data.astype(np.float64))
+        np.save(index_dir / "doc_len.npy", np.asarray(self.doc_len, dtype=np.float64))
+        np.save(index_dir / "idf.npy", np.asarray(self.idf, dtype=np.float64))
+
+        terms = [None] * len(self.vocab)
+        for term, term_idx in self.vocab.items():
+            terms[term_idx] = term
+        with open(index_dir / "vocab.json", "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+
+        if doc_ids is not None:
+            self.fingerprint = corpus_fingerprint(doc_ids)
+        meta = {
+            "version": INDEX_FORMAT_VERSION,
+            "num_terms": matrix.shape[0],
+            "num_docs": matrix.shape[1],
+            "k1": self.k1,
+            "b": self.b,
+            "epsilon": self.epsilon,
+            "fingerprint": self.fingerprint,
+        }
+        with open(index_dir / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, index_dir: Path, mmap: bool = True) -> "BM25Index":
+        """Load index đã lưu; mặc định memory-map các mảng postings thay vì đọc vào RAM."""
+        index_dir = Path(index_dir)
+        with open(index_dir / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Phiên bản BM25 index không được hỗ trợ: {meta.get('version')}")
+
+        mmap_mode = "r" if mmap else None
+        indptr = np.load(index_dir / "indptr.npy", mmap_mode=mmap_mode)
+        indices = np.load(index_dir / "indices.npy", mmap_mode=mmap_mode)
+        weights = np.load(index_dir / "weights.npy", mmap_mode=mmap_mode)
+        term_matrix = sparse.csr_matrix(
+            (weights, indices, indptr), shape=(meta["num_terms"], meta["num_docs"]), copy=False
+        )
+        with open(index_dir / "vocab.json", "r", encoding="utf-8") as f:
+            vocab = {term: term_idx for term_idx, term in enumerate(json.load(f))}
+
+        return cls(
+            term_matrix, vocab,
+            idf=np.load(index_dir / "idf.npy", mmap_mode=mmap_mode),
+            doc_len=np.load(index_dir / "doc_len.npy", mmap_mode=mmap_mode),
+            k1=meta["k1"], b=meta["b"], epsilon=meta["epsilon"],
+            fingerprint=meta.get("fingerprint"),
+        )
+
+    def matches(self, doc_ids: Sequence[str]) -> bool:
+        """Kiểm tra index có được build từ đúng corpus (cùng chunk ID, cùng thứ tự) không."""
+        return self.corpus_size == len(doc_ids) and self.fingerprint == corpus_fingerprint(doc_ids)
+
+    def _score_postings(self, query: str):
+        """
+        Điểm BM25 của các document chứa ít nhất một term của truy vấn.
+        Trọng số được cộng dồn theo đúng thứ tự token trong truy vấn (token lặp lại được cộng
+        nhiều lần) như BM25Okapi.get_scores, để tổng dấu phẩy động giống hệt nhau.
+        Returns:
+            (indices, scores): vị trí document (tăng dần) và điểm tương ứng.
+        """
+        matrix = self.term_matrix
+        rows = [term_idx for term_idx in (self.vocab.get(token) for token in tokenize(query)) if term_idx is not None]
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        postings = [(matrix.indices[matrix.indptr[r]:matrix.indptr[r + 1]],
+                     matrix.data[matrix.indptr[r]:matrix.indptr[r + 1]]) for r in rows]
+        indices = np.unique(np.concatenate([docs for docs, _ in postings]))
+        scores = np.zeros(len(indices), dtype=np.float64)
+        for docs, weights in postings:
+            # Mỗi document xuất hiện tối đa một lần trong một hàng: cộng vector hóa an toàn
+            scores[np.searchsorted(indices, docs)] += weights
+        return indices, scores
+
+    def get_scores(self, query: str) -> np.ndarray:
+        """Điểm BM25 dạng dense cho toàn bộ corpus (giống BM25Okapi.get_scores)."""
+        indices, scores = self._score_postings(query)
+        dense = np.zeros(self.corpus_size, dtype=np.float64)
+        dense[indices] = scores
+        return dense
+
+    def _rank_row(self, indices: np.ndarray, scores: np.ndarray, n: int) -> List[int]:
+        """
+        Chọn top-n document, cùng thứ tự với BM25Okapi.get_top_n (`np.argsort(scores)[::-1]`).
+        Khi top-n không có điểm hòa, thứ tự chỉ phụ thuộc vào điểm nên chỉ cần sắp xếp các
+        postings khớp truy vấn. Khi có hòa điểm (ví dụ truy vấn chỉ gồm term không có trong
+        corpus: mọi document đều 0 điểm), thứ tự giữa các document hòa do thuật toán sắp xếp
+        (không ổn định) của np.argsort quyết định, nên phải sắp xếp cả mảng điểm như get_top_n.
+        """
+        positive = scores > 0
+        if np.count_nonzero(positive) >= n:
+            candidates, candidate_scores = indices[positive], scores[positive]
+            if len(candidate_scores) > n:
+                # Mọi document có điểm >= điểm thứ n (nhiều hơn n nếu hòa ở biên)
+                kth = np.partition(candidate_scores, len(candidate_scores) - n)[len(candidate_scores) - n]
+                keep = candidate_scores >= kth
+                candidates, candidate_scores = candidates[keep], candidate_scores[keep]
+            if len(candidate_scores) == n and len(np.unique(candidate_scores)) == n:
+                return candidates[np.argsort(-candidate_scores)].tolist()
+
+        dense = np.zeros(self.corpus_size, dtype=np.float64)
+        dense[indices] = scores
+        return np.argsort(dense)[::-1][:n].tolist()
+
+    def top_n(self, query: str, n: int = 10) -> List[int]:
+        """Trả về vị trí (trong corpus) của n document có điểm BM25 cao nhất."""
+        return self.top_n_batch([query], n)[0]
+
+    def top_n_batch(self, queries: Sequence[str], n: int = 10) -> List[List[int]]:
+        """Chọn top-n cho từng truy vấn; chỉ duyệt postings của các term trong truy vấn."""
+        if not queries:
+            return []
+        n = min(n, self.corpus_size)
+        if n <= 0:
+            return [[] for _ in queries]
+        return [self._rank_row(*self._score_postings(query), n) for query in queries]
+
+    def parity_check(self, corpus: Sequence[str], queries: Optional[Sequence[str]] = None,
+                     n: int = 10) -> dict:
+        """
+        So sánh top-n với `rank_bm25.BM25Okapi.get_top_n` trên cùng corpus (đúng thứ tự, kể cả hòa điểm).
+        Mặc định dùng các truy vấn lấy từ corpus, thêm truy vấn chỉ gồm term phổ biến nhất
+        (idf thấp) và term không có trong corpus, để mọi document hòa điểm.
+        Returns:
+            dict gồm số truy vấn, số truy vấn lệch thứ tự và cờ `ok`; None nếu chưa cài rank_bm25.
+        """
+        try:
+            from rank_bm25 import BM25Okapi
+        except ImportError:
+            print("⚠️ Chưa cài rank_bm25: bỏ qua kiểm tra parity BM25.")
+            return None
+        if queries is None:
+            rng = np.random.default_rng(0)
+            picks = rng.choice(len(corpus), size=min(len(corpus), 50), replace=False) if len(corpus) else []
+            queries = [" ".join(tokenize(corpus[i])[:8]) for i in picks]
+            if self.vocab:
+                most_common = int(np.argmax(np.diff(self.term_matrix.indptr)))
+                queries.append(next(term for term, idx in self.vocab.items() if idx == most_common))
+            queries.append("\x00term-khong-co-trong-corpus")
+
+        reference = BM25Okapi([tokenize(text) for text in corpus], k1=self.k1, b=self.b, epsilon=self.epsilon)
+        positions = list(range(len(corpus)))
+        expected = [reference.get_top_n(tokenize(query), positions, n=n) for query in queries]
+        mismatched = sum(1 for got, want in zip(self.top_n_batch(queries, n), expected) if got != want)
+        result = {"queries": len(queries), "mismatched": mismatched, "ok": mismatched == 0}
+        status = "✅" if result["ok"] else "⚠️"
+        print(f"{status} Parity BM25 vs rank_bm25: {mismatched}/{len(queries)} truy vấn lệch top-{n}.")
+        return result
@@ -0,0 +1,159 @@
+# src/rag_system/context_builder.py
+"""
+Module này chứa class ContextBuilder, chịu trách nhiệm ghép các chunk được truy xuất
+thành context cho prompt trong giới hạn số token (MAX_CONTEXT_TOKENS):
+- Các chunk liền kề (chunk_index kề nhau) hoặc chồng lấn nội dung của cùng một tài liệu
+  được gộp thành một đoạn, phần văn bản lặp lại do chunk_overlap chỉ giữ một lần.
+- Chunk được thêm theo thứ tự xếp hạng; khi hết ngân sách, các chunk hạng thấp bị bỏ trước.
+"""
+
+import os
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Độ dài chồng lấn tối thiểu/tối đa (ký tự) được tìm giữa hai chunk liền kề
+_MIN_OVERLAP_CHARS = 20
+_MAX_OVERLAP_CHARS = 400
+# Không thêm chunk bị cắt ngắn nếu phần ngân sách còn lại nhỏ hơn số token này
+_MIN_TRUNCATED_TOKENS = 64
+
+
+def _load_tokenizer() -> Optional[Callable]:
+    """Bộ mã hóa tiktoken (cl100k_base), hoặc None nếu chưa cài hoặc không tải được encoding."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"⚠️ Không dùng được tiktoken ({e}). Ước lượng số token theo số ký tự.")
+        return None
+
+
+def _merge_overlap(left: str, right: str) -> Optional[str]:
+    """Ghép `right` sau `left` nếu đuôi của `left` trùng với đầu của `right`, ngược lại trả về None."""
+    longest = min(len(left), len(right), _MAX_OVERLAP_CHARS)
+    for size in range(longest, _MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return None
+
+
+class _Span:
+    """Một đoạn context: các chunk liên tiếp của cùng một tài liệu."""
+    def __init__(self, source: str, first: Optional[int], last: Optional[int], text: str):
+        self.source = source
+        self.first = first
+        self.last = last
+        self.text = text
+
+    def merge(self, other: "_Span") -> Optional["_Span"]:
+        """Đoạn gộp của hai đoạn cùng tài liệu nếu chúng liền kề hoặc chồng lấn, ngược lại None."""
+        if other.source != self.source:
+            return None
+        if None not in (self.first, self.last, other.first, other.last):
+            if other.first >= self.first and other.last <= self.last:
+                return self
+            if self.first >= other.first and self.last <= other.last:
+                return other
+            first, last = min(self.first, other.first), max(self.last, other.last)
+            if other.first == self.last + 1:
+                return _Span(self.source, first, last, _merge_overlap(self.text, other.text) or f"{self.text}\n{other.text}")
+            if other.last == self.first - 1:
+                return _Span(self.source, first, last, _merge_overlap(other.text, self.text) or f"{other.text}\n{self.text}")
+            return None
+        # Không có chunk_index (corpus cũ): chỉ gộp khi phát hiện nội dung chồng lấn
+        text = _merge_overlap(self.text, other.text) or _merge_overlap(other.text, self.text)
+        return _Span(self.source, None, None, text) if text is not None else None
+
+
+def _add_span(spans: List[_Span], new: _Span) -> List[_Span]:
+    """Danh sách đoạn sau khi thêm `new`, gộp dây chuyền các đoạn trở nên liền kề (giữ vị trí của đoạn đầu tiên)."""
+    spans = list(spans)
+    for i, span in enumerate(spans):
+        merged = span.merge(new)
+        if merged is None:
+            continue
+        del spans[i]
+        # Đoạn vừa mở rộng có thể nối được với một đoạn khác của cùng tài liệu
+        for j in range(len(spans) - 1, i - 1, -1):
+            bridged = merged.merge(spans[j])
+            if bridged is not None:
+                merged = bridged
+                del spans[j]
+        spans.insert(i, merged)
+        return spans
+    return spans + [new]
+
+
+class ContextBuilder:
+    """
+    Tạo context cho prompt QA từ các tài liệu đã xếp hạng, giới hạn theo số token.
+    """
+    def __init__(self, max_tokens: int = None):
+        """
+        Args:
+            max_tokens (int): Ngân sách token cho phần context (mặc định MAX_CONTEXT_TOKENS; <= 0 để không giới hạn).
+        """
+        if max_tokens is None:
+            max_tokens = int(os.getenv("MAX_CONTEXT_TOKENS", 2000))
+        self.max_tokens = max_tokens if max_tokens > 0 else None
+        self._tokenizer = None
+        self._tokenizer_loaded = False
+
+    def count_tokens(self, text: str) -> int:
+        if not self._tokenizer_loaded:
+            self._tokenizer = _load_tokenizer()
+            self._tokenizer_loaded = True
+        if self._tokenizer is None:
+            return (len(text) + 3) // 4
+        return len(self._tokenizer.encode(text, disallowed_special=()))
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """Cắt văn bản về tối đa `max_tokens` token, ưu tiên cắt ở ranh giới từ."""
+        if self._tokenizer is not None:
+            text = self._tokenizer.decode(self._tokenizer.encode(text, disallowed_special=())[:max_tokens])
+        else:
+            text = text[:max_tokens * 4]
+        cut = text.rfind(" ")
+        return (text[:cut] if cut > len(text) // 2 else text) + " ..."
+
+    @staticmethod
+    def _strip_source_prefix(content: str, source: str) -> str:
+        # Nội dung chunk được index với tiền tố "[tên tài liệu] " (xem indexer)
+        prefix = f"[{source}] "
+        return content[len(prefix):] if content.startswith(prefix) else content
+
+    @staticmethod
+    def _render(spans: List[_Span]) -> str:
+        # Giữ nguyên định dạng context cũ; các đoạn theo thứ tự xếp hạng của chunk tốt nhất
+        context_parts = [f"[Đoạn {i + 1} - Nguồn: {span.source}]\n[{span.source}] {span.text}"
+                         for i, span in enumerate(spans)]
+        return "\n\n" + "=" * 40 + "\n\n".join(context_parts)
+
+    def build(self, documents: List[Dict[str, str]]) -> str:
+        """
+        Ghép các tài liệu (theo thứ tự xếp hạng) thành context.
+        Mỗi chunk chỉ được thêm nếu toàn bộ context (đã gộp) vẫn nằm trong ngân sách token;
+        chunk đầu tiên không vừa được cắt ngắn nếu còn đủ chỗ, các chunk hạng thấp hơn bị bỏ.
+        """
+        if not documents:
+            return "Không tìm thấy thông tin liên quan trong tài liệu."
+
+        spans: List[_Span] = []
+        for doc in documents:
+            source = doc.get("source", "")
+            chunk_index = doc.get("chunk_index")
+            text = self._strip_source_prefix(doc["content"], source)
+            candidate = _add_span(spans, _Span(source, chunk_index, chunk_index, text))
+            if self.max_tokens is None or self.count_tokens(self._render(candidate)) <= self.max_tokens:
+                spans = candidate
+                continue
+
+            remaining = self.max_tokens - self.count_tokens(self._render(spans + [_Span(source, None, None, "")]))
+            if remaining >= _MIN_TRUNCATED_TOKENS or not spans:
+                spans = spans + [_Span(source, None, None, self._truncate(text, max(1, remaining - 2)))]
+            break
+
+        return self._render(spans)
@@ -4,27 +4,105 @@ Module này chứa class QAHandler, chịu trách nhiệm xử lý toàn bộ lo
 để trả lời câu hỏi, từ việc lấy context, tạo prompt, gọi LLM và phân tích kết quả.
 """
 
+import os
 import re
 import json
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 
 from src.llm.client import get_llm
+from src.llm.executor import ConcurrentLLMExecutor
+from src.llm.streaming import JsonStreamingLLM
+from src.telemetry.tracing import count as trace_count, span
+from .context_builder import ContextBuilder
 from .retriever import HybridRetriever # <-- THAY ĐỔI: Import HybridRetriever
 
+load_dotenv()
+
+# Phần hướng dẫn cố định của layout "prefix": giống hệt nhau (từng byte) ở mọi câu hỏi,
+# nên Ollama dùng lại KV cache của prefix này thay vì prefill lại mỗi lần
+_QA_STATIC_PREFIX = """Bạn là chuyên gia phân tích tài liệu kỹ thuật IoT/Smart Home với khả năng reasoning cao.
+
+### NGUYÊN TẮC QUAN TRỌNG:
+1. CHỈ chọn đáp án được KHẲNG ĐỊNH RÕ RÀNG trong tài liệu.
+2. Nếu tài liệu KHÔNG ĐỀ CẬP hoặc KHÔNG ĐỦ BẰNG CHỨNG, đáp án đó là SAI.
+3. Câu hỏi có thể có MỘT hoặc NHIỀU đáp án đúng.
+4. Đọc KỸ từng lựa chọn, không bỏ sót chi tiết.
+
+### YÊU CẦU ĐỊNH DẠNG (BẮT BUỘC):
+Trả lời ĐÚNG format JSON (không thêm markdown hay text nào khác):
+
+{
+  "reasoning": "Giải thích ngắn gọn từng bước suy luận, đối chiếu từng lựa chọn với tài liệu tham khảo.",
+  "analysis": {
+    "A": "Đúng/Sai - Lý do",
+    "B": "Đúng/Sai - Lý do",
+    "C": "Đúng/Sai - Lý do",
+    "D": "Đúng/Sai - Lý do"
+  },
+  "correct_count": <số nguyên từ 1-4>,
+  "correct_answers": ["A", "B", ...]
+}
+
+"""
+
+QA_PROMPT_LAYOUTS = ("classic", "prefix")
+
+# Đáp án ghi tạm cho câu hỏi mà lời gọi LLM thất bại sau mọi lần thử lại (được liệt kê ở cuối lần chạy)
+_FAILED_ANSWER = (1, ["A"])
+
 class QAHandler:
     """
     Xử lý logic trả lời câu hỏi bằng cách sử dụng một retriever.
     """
     
-    def __init__(self, retriever: HybridRetriever): # <-- THAY ĐỔI: Sử dụng HybridRetriever
+    def __init__(self, retriever: HybridRetriever, batch_size: int = None): # <-- THAY ĐỔI: Sử dụng HybridRetriever
         self.retriever = retriever
         self.llm = get_llm()
+        # Streaming: dừng sinh token ngay khi JSON có "correct_answers" đã đóng,
+        # và không bao giờ sinh quá QA_MAX_NEW_TOKENS token (0 = không giới hạn)
+        answer_llm = self.llm
+        if os.getenv("QA_STREAMING", "true").lower() in ("1", "true", "yes"):
+            answer_llm = JsonStreamingLLM(self.llm, required_key="correct_answers",
+                                          max_new_tokens=int(os.getenv("QA_MAX_NEW_TOKENS", 1024)))
+        # Gửi prompt của cả lô câu hỏi song song (LLM_MAX_IN_FLIGHT), giữ nguyên thứ tự kết quả
+        self.executor = ConcurrentLLMExecutor(answer_llm)
+        # Số câu hỏi được truy xuất chung một lô (embed + search_batch + BM25); <= 1 để tắt
+        if batch_size is None:
+            batch_size = int(os.getenv("QA_BATCH_SIZE", 32))
+        self.batch_size = max(1, batch_size)
+        # Ghép context theo ngân sách MAX_CONTEXT_TOKENS, gộp các chunk liền kề/chồng lấn
+        self.context_builder = ContextBuilder()
+        # "classic": bố cục prompt ban đầu; "prefix": hướng dẫn cố định đặt trước context để tái sử dụng KV cache
+        self.prompt_layout = os.getenv("QA_PROMPT_LAYOUT", "classic").lower()
+        # Số thứ tự (từ 1) các câu hỏi không có phản hồi LLM trong lần chạy gần nhất
+        self.failed_questions: List[int] = []
+        if self.prompt_layout not in QA_PROMPT_LAYOUTS:
+            print(f"⚠️ QA_PROMPT_LAYOUT '{self.prompt_layout}' không hợp lệ, dùng 'classic'.")
+            self.prompt_layout = "classic"
 
     def _create_qa_prompt(self, question: str, options: dict, context: str) -> str:
         options_text = "\n".join([f"{key}. {value}" for key, value in options.items()])
         
+        if self.prompt_layout == "prefix":
+            # Chỉ phần sau prefix cố định thay đổi theo từng câu hỏi
+            return _QA_STATIC_PREFIX + f"""### TÀI LIỆU THAM KHẢO:
+{context}
+
+---
+
+### CÂU HỎI:
+{question}
+
+### CÁC LỰA CHỌN:
+{options_text}
+
+### TRẢ LỜI (JSON):
+"""
+
         return f"""Bạn là chuyên gia phân tích tài liệu kỹ thuật IoT/Smart Home với khả năng reasoning cao.
 
 ### NGUYÊN TẮC QUAN TRỌNG:
@@ -88,33 +166,35 @@ Trả lời ĐÚNG format JSON (không thêm markdown hay text nào khác):
             return 1, ["A"] # Fallback cuối cùng
 
     def _format_context(self, documents: List[Dict[str, str]]) -> str:
-        """Định dạng context từ các tài liệu được truy xuất."""
-        if not documents:
-            return "Không tìm thấy thông tin liên quan trong tài liệu."
-        
-        context_parts = []
-        for i, doc in enumerate(documents):
-            context_parts.append(f"[Đoạn {i+1} - Nguồn: {doc['source']}]\n{doc['content']}")
-        
-        return "\n\n" + "="*40 + "\n\n".join(context_parts)
+        """Định dạng context từ các tài liệu được truy xuất (giới hạn theo MAX_CONTEXT_TOKENS)."""
+        with span("qa.context", chunks=len(documents or [])):
+            return self.context_builder.build(documents)
 
-    def answer_question(self, question: str, options: dict) -> Tuple[int, List[str]]:
-        """
-        Pipeline RAG hoàn chỉnh cho một câu hỏi.
-        """
+    def _prepare_prompt(self, question: str, options: dict,
+                        retrieved_docs: Optional[List[Dict[str, str]]] = None) -> str:
+        """Truy xuất context (nếu chưa có) và tạo prompt cho một câu hỏi."""
         cleaned_options = {k: str(v).strip() if pd.notna(v) else "" for k, v in options.items()}
         
         # Bước 1: Truy xuất tài liệu bằng Hybrid Retriever
-        retrieved_docs = self.retriever.retrieve(question, top_k=10)
+        if retrieved_docs is None:
+            retrieved_docs = self.retriever.retrieve(question, top_k=10)
         
         # Bước 2: Tạo context
         context = self._format_context(retrieved_docs)
         
-        # Bước 3: Generate prompt và gọi LLM
-        prompt = self._create_qa_prompt(question, cleaned_options, context)
-        response = self.llm.invoke(prompt)
+        # Bước 3: Generate prompt
+        return self._create_qa_prompt(question, cleaned_options, context)
+
+    def answer_question(self, question: str, options: dict,
+                        retrieved_docs: Optional[List[Dict[str, str]]] = None) -> Tuple[int, List[str]]:
+        """
+        Pipeline RAG hoàn chỉnh cho một câu hỏi.
+        Nếu `retrieved_docs` đã được truy xuất theo lô thì bỏ qua bước truy xuất.
+        """
+        prompt = self._prepare_prompt(question, options, retrieved_docs)
         
-        # Bước 4: Parse kết quả
+        # Bước 4: Gọi LLM (có thử lại) và parse kết quả
+        response = self.executor.invoke(prompt)
         return self._parse_llm_response(response)
 
     def process_questions_csv(self, csv_path: Path) -> List[Tuple] | None:
@@ -125,21 +205,56 @@ Trả lời ĐÚNG format JSON (không thêm markdown hay text nào khác):
             return None
         
         results = []
+        self.failed_questions = []
         total = len(df)
-        print(f"\n🤔 Bắt đầu trả lời {total} câu hỏi...\n")
+        print(f"\n🤔 Bắt đầu trả lời {total} câu hỏi (lô {self.batch_size}, "
+              f"tối đa {self.executor.max_in_flight} request LLM song song)...\n")
         
-        for idx, row in df.iterrows():
-            question = row.iloc[0]
-            options = {'A': row.iloc[1], 'B': row.iloc[2], 'C': row.iloc[3], 'D': row.iloc[4]}
-            
-            print(f"\n{'='*70}\nCâu {idx + 1}/{total}: {str(question)[:100]}...\n{'='*70}")
-            
-            count, answers = self.answer_question(question, options)
-            results.append((count, answers))
-            
-            print(f"✅ Kết quả: {count} đáp án → {', '.join(answers)}")
-            print(f"Progress: [{idx + 1}/{total}] ({(idx + 1) / total * 100:.1f}%)")
+        rows = [(str(row.iloc[0]), {'A': row.iloc[1], 'B': row.iloc[2], 'C': row.iloc[3], 'D': row.iloc[4]})
+                for _, row in df.iterrows()]
         
+        futures = []
+        reported = 0
+
+        def report(idx: int, response: Optional[str]):
+            """In và ghi kết quả câu `idx` (theo đúng thứ tự câu hỏi)."""
+            print(f"\n{'='*70}\nCâu {idx + 1}/{total}: {rows[idx][0][:100]}...\n{'='*70}")
+            if response is None:
+                # Lời gọi thất bại sau mọi lần thử lại trả về None (không đưa vào bộ parse)
+                self.failed_questions.append(idx + 1)
+                trace_count("qa.failed")
+                results.append(_FAILED_ANSWER)
+                print(f"❌ Không có phản hồi từ LLM. Ghi tạm đáp án {', '.join(_FAILED_ANSWER[1])}.")
+            else:
+                count, answers = self._parse_llm_response(response)
+                results.append((count, answers))
+                print(f"✅ Kết quả: {count} đáp án → {', '.join(answers)}")
+            print(f"Progress: [{idx + 1}/{total}] ({(idx + 1) / total * 100:.1f}%)")
+
+        # Một thread pool cho cả file: prompt được gửi ngay khi có context, nên lô truy xuất
+        # tiếp theo chạy trong lúc các request LLM của lô trước vẫn đang chờ trả lời
+        with ThreadPoolExecutor(max_workers=self.executor.max_in_flight) as pool:
+            for start in range(0, total, self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                batch_docs = self.retriever.retrieve_batch([question for question, _ in batch], top_k=10)
+                for (question, options), retrieved_docs in zip(batch, batch_docs):
+                    prompt = self._prepare_prompt(question, options, retrieved_docs)
+                    futures.append(pool.submit(self.executor.invoke_or_default, prompt, None))
+
+                # In các câu đã xong (không chờ), giữ đúng thứ tự câu hỏi
+                while reported < len(futures) and futures[reported].done():
+                    report(reported, futures[reported].result())
+                    reported += 1
+
+            for idx in range(reported, total):
+                report(idx, futures[idx].result())
+
+        if isinstance(self.executor.llm, JsonStreamingLLM):
+            print(f"\n⏹️  Streaming: {self.executor.llm.early_stops} câu trả lời dừng sớm khi JSON đã đóng, "
+                  f"{self.executor.llm.truncated} bị cắt ở giới hạn QA_MAX_NEW_TOKENS.")
+        if self.failed_questions:
+            print(f"\n❌ {len(self.failed_questions)}/{total} câu hỏi không có câu trả lời do gọi LLM thất bại "
+                  f"(đáp án ghi tạm {', '.join(_FAILED_ANSWER[1])}): câu {', '.join(map(str, self.failed_questions))}.")
         return results
 
 
@@ -5,34 +5,48 @@ sức mạnh của tìm kiếm từ khóa (BM25) và tìm kiếm ngữ nghĩa (V
 để lấy ra các tài liệu liên quan nhất.
 """
 
-from rank_bm25 import BM25Okapi
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from src.vectordb.store import VectorStore
+from src.vectordb.search import search, search_batch
+from src.vectordb.corpus import DocumentRegistry
+from src.telemetry.tracing import span
+from .bm25 import BM25Index
 
 class HybridRetriever:
     """
     Kết hợp BM25 và Vector Search để tìm kiếm thông tin.
     """
-    def __init__(self, vector_store: VectorStore, corpus_data: List[Dict[str, str]]):
+    def __init__(self, vector_store: VectorStore, corpus_data: List[Dict[str, str]],
+                 bm25_index: Optional[BM25Index] = None):
         """
         Khởi tạo retriever.
         
         Args:
             vector_store: Instance của VectorStore (Qdrant).
-            corpus_data: Danh sách các dict, mỗi dict chứa {'content': str, 'source': str}.
+            corpus_data: Danh sách các dict, mỗi dict chứa {'id': str, 'content': str, 'source': str}.
+            bm25_index: BM25 index đã build sẵn (ví dụ memory-map từ tác vụ extract).
+                        Nếu không có hoặc không khớp với corpus, index sẽ được build lại.
         """
         self.vector_store = vector_store
-        self.corpus_data = corpus_data
+        # Registry id -> tài liệu dùng chung cho Vector Search, BM25 và RRF
+        self.registry = DocumentRegistry(corpus_data)
+        self.corpus_data = self.registry.documents
         
-        # Chỉ lấy phần 'content' để tạo corpus cho BM25
-        tokenized_corpus = [doc["content"].split(" ") for doc in self.corpus_data]
-        self.bm25 = BM25Okapi(tokenized_corpus)
-        print(f"✅ Khởi tạo BM25 index thành công với {len(self.corpus_data)} tài liệu.")
+        if bm25_index is not None and bm25_index.matches(self.registry.ids):
+            self.bm25 = bm25_index
+            print(f"✅ Sử dụng BM25 index đã lưu với {len(self.corpus_data)} tài liệu.")
+        else:
+            if bm25_index is not None:
+                print("⚠️ BM25 index đã lưu không khớp với corpus. Đang build lại...")
+            # Chỉ lấy phần 'content' để tạo corpus cho BM25 (ma trận thưa, tính sẵn trọng số)
+            self.bm25 = BM25Index.build([doc["content"] for doc in self.corpus_data])
+            print(f"✅ Khởi tạo BM25 index thành công với {len(self.corpus_data)} tài liệu.")
 
     def _reciprocal_rank_fusion(self, ranked_lists: List[List[str]], k: int = 60) -> Dict[str, float]:
         """
         Thực hiện Reciprocal Rank Fusion để kết hợp các danh sách kết quả.
+        Mỗi danh sách là các chunk ID đã được xếp hạng.
         """
         rrf_scores = {}
         for doc_list in ranked_lists:
@@ -57,34 +71,64 @@ class HybridRetriever:
         print(f"\n🔍 Bắt đầu tìm kiếm lai cho query: '{query[:100]}...'")
         
         # 1. Tìm kiếm bằng Vector Search (Semantic)
-        vector_results = self.vector_store.search(query, top_k=top_k, threshold=0.2)
-        vector_doc_ids = [res.payload['content'] for res in vector_results if res.payload]
+        with span("retrieval.vector_search", queries=1):
+            vector_results = search(query, self.vector_store, top_k=top_k, threshold=0.2)
+        vector_doc_ids = [str(res.id) for res in vector_results if str(res.id) in self.registry]
         print(f"  - Vector Search tìm thấy {len(vector_doc_ids)} kết quả.")
 
         # 2. Tìm kiếm bằng BM25 (Keyword)
-        tokenized_query = query.split(" ")
-        bm25_results = self.bm25.get_top_n(tokenized_query, [doc["content"] for doc in self.corpus_data], n=top_k)
-        bm25_doc_ids = [content for content in bm25_results]
+        with span("retrieval.bm25", queries=1):
+            bm25_doc_ids = [self.registry.id_at(i) for i in self.bm25.top_n(query, n=top_k)]
         print(f"  - BM25 Search tìm thấy {len(bm25_doc_ids)} kết quả.")
         
         # 3. Kết hợp kết quả bằng RRF
+        with span("retrieval.fusion", queries=1):
+            final_results = self._fuse(vector_doc_ids, bm25_doc_ids, top_k)
+        
+        print(f"  - Sau khi kết hợp, trả về {len(final_results)} tài liệu tốt nhất.")
+        return final_results
+
+    def _fuse(self, vector_doc_ids: List[str], bm25_doc_ids: List[str], top_k: int) -> List[Dict[str, str]]:
+        """Kết hợp hai danh sách chunk ID bằng RRF và tra cứu tài liệu gốc từ registry."""
         fused_scores = self._reciprocal_rank_fusion([vector_doc_ids, bm25_doc_ids])
         
         # Sắp xếp các tài liệu dựa trên điểm RRF
         sorted_doc_ids = sorted(fused_scores.keys(), key=lambda x: fused_scores[x], reverse=True)
         
-        # Lấy top_k tài liệu duy nhất từ corpus gốc
-        final_results = []
-        seen_content = set()
-        for doc_id in sorted_doc_ids:
-            if doc_id not in seen_content:
-                # Tìm tài liệu gốc trong corpus
-                original_doc = next((doc for doc in self.corpus_data if doc["content"] == doc_id), None)
-                if original_doc:
-                    final_results.append(original_doc)
-                    seen_content.add(doc_id)
-            if len(final_results) >= top_k:
-                break
+        # Lấy top_k tài liệu từ registry (tra cứu O(1) theo chunk ID)
+        return self.registry.get_many(sorted_doc_ids[:top_k])
+
+    def retrieve_batch(self, queries: List[str], top_k: int = 10) -> List[List[Dict[str, str]]]:
+        """
+        Tìm kiếm lai cho nhiều truy vấn cùng lúc: một lần embed, một request
+        search_batch tới Qdrant và một phép nhân ma trận BM25 cho cả lô.
         
-        print(f"  - Sau khi kết hợp, trả về {len(final_results)} tài liệu tốt nhất.")
-        return final_results
+        Args:
+            queries: Danh sách câu hỏi hoặc chuỗi truy vấn.
+            top_k: Số lượng tài liệu cần trả về cho mỗi truy vấn.
+            
+        Returns:
+            Danh sách kết quả cho từng truy vấn, theo đúng thứ tự đầu vào.
+        """
+        if not queries:
+            return []
+        print(f"\n🔍 Bắt đầu tìm kiếm lai theo lô cho {len(queries)} query...")
+        
+        # 1. Vector Search cho cả lô
+        with span("retrieval.vector_search", queries=len(queries)):
+            vector_batch = search_batch(queries, self.vector_store, top_k=top_k, threshold=0.2)
+        
+        # 2. BM25 cho cả lô
+        with span("retrieval.bm25", queries=len(queries)):
+            bm25_batch = self.bm25.top_n_batch(queries, n=top_k)
+        
+        # 3. Kết hợp từng truy vấn bằng RRF
+        all_results = []
+        with span("retrieval.fusion", queries=len(queries)):
+            for vector_results, bm25_positions in zip(vector_batch, bm25_batch):
+                vector_doc_ids = [str(res.id) for res in vector_results if str(res.id) in self.registry]
+                bm25_doc_ids = [self.registry.id_at(i) for i in bm25_positions]
+                all_results.append(self._fuse(vector_doc_ids, bm25_doc_ids, top_k))
+        
+        print(f"  - Đã truy xuất xong {len(all_results)} query.")
+        return all_results
@@ -0,0 +1,80 @@
+# src/telemetry/imports.py
+"""
+Module này đo thời gian import của các module bằng `python -X importtime` trong
+một tiến trình con sạch (không bị ảnh hưởng bởi các module đã nạp sẵn), rồi tổng
+hợp theo package gốc để thấy ngay thư viện nào làm chậm thời gian khởi động.
+"""
+
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from src.config.paths import PROJECT_ROOT
+
+# Dòng của -X importtime: "import time:   self [us] | cumulative | imported package"
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def measure_imports(modules: Sequence[str], cwd: Optional[Path] = None) -> Dict:
+    """
+    Import các module trong một tiến trình con với -X importtime.
+
+    Returns:
+        Dict gồm `total_ms` (thời gian import tích lũy của các module yêu cầu),
+        `packages` (thời gian tự thân cộng dồn theo package gốc, ms) và
+        `modules` (thời gian tích lũy của từng module yêu cầu, ms).
+    """
+    code = "; ".join(f"import {module}" for module in modules)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=str(cwd or PROJECT_ROOT), capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        error = "\n".join(line for line in completed.stderr.splitlines() if not line.startswith("import time:"))
+        raise RuntimeError(f"Không thể import {', '.join(modules)}:\n{error.strip()}")
+
+    packages: Dict[str, float] = defaultdict(float)
+    cumulative: Dict[str, float] = {}
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, _, name = match.groups()
+        packages[name.split(".")[0]] += int(self_us) / 1000
+        cumulative[name] = int(cumulative_us) / 1000
+
+    module_times = {module: cumulative.get(module, 0.0) for module in modules}
+    return {
+        # Thời gian tự thân của mọi module được nạp = tổng thời gian import
+        "total_ms": sum(packages.values()),
+        "packages": dict(sorted(packages.items(), key=lambda item: item[1], reverse=True)),
+        "modules": module_times,
+    }
+
+
+def print_import_report(label: str, modules: List[str], top: int = 10,
+                        budget_ms: Optional[float] = None) -> bool:
+    """
+    In báo cáo thời gian import của một nhóm module.
+
+    Returns:
+        False nếu import lỗi hoặc tổng thời gian vượt `budget_ms` (để CLI trả mã lỗi khi có regression).
+    """
+    try:
+        report = measure_imports(modules)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return False
+    print(f"\n⏱️  Import '{label}': {report['total_ms']:.0f} ms")
+    for module, ms in report["modules"].items():
+        print(f"   - {module:<40} {ms:>8.1f} ms (tích lũy)")
+    print(f"   Top {top} package theo thời gian import:")
+    for package, ms in list(report["packages"].items())[:top]:
+        print(f"     {package:<38} {ms:>8.1f} ms")
+    if budget_ms is not None and report["total_ms"] > budget_ms:
+        print(f"❌ Vượt ngân sách import: {report['total_ms']:.0f} ms > {budget_ms:.0f} ms")
+        return False
+    return True
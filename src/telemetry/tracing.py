@@ -0,0 +1,229 @@
+# src/telemetry/tracing.py
+"""
+Module này cung cấp lớp đo đạc nhẹ cho pipeline: span đo thời gian theo từng giai đoạn
+(parse PDF, chunking, embedding, upsert, search, BM25, LLM, ...) và bộ đếm (counter).
+Cuối mỗi lần chạy, `write_report` ghi báo cáo JSON (tổng hợp theo giai đoạn) và tùy chọn
+Chrome trace (mở bằng chrome://tracing hoặc https://ui.perfetto.dev) vào thư mục output.
+
+Chỉ dùng thư viện chuẩn để việc import không làm chậm khởi động. Cấu hình:
+- TRACE_ENABLED (mặc định true): tắt thì span/counter gần như không tốn chi phí.
+- TRACE_FORMAT: json (mặc định), chrome hoặc both.
+- TRACE_MEMORY (mặc định false): đo bộ nhớ Python đỉnh của từng span bằng tracemalloc
+  (làm chậm chương trình; với nhiều thread, đỉnh được tính chung cho cả tiến trình).
+- TRACE_MAX_EVENTS: số sự kiện tối đa giữ cho Chrome trace (tổng hợp không bị giới hạn).
+Các tiến trình con (ví dụ worker chuyển đổi PDF) gửi sự kiện về bằng `drain_events`
+và tiến trình chính gộp lại bằng `merge_events`.
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+load_dotenv()
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Bộ nhớ RSS đỉnh của tiến trình (MB), hoặc None nếu không đo được."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về byte
+    return peak / 1024 / 1024 if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class Tracer:
+    """Ghi lại span và counter của một lần chạy; an toàn khi dùng từ nhiều thread."""
+
+    def __init__(self):
+        self.enabled = _env_flag("TRACE_ENABLED", "true")
+        self.trace_memory = _env_flag("TRACE_MEMORY", "false")
+        self.max_events = int(os.getenv("TRACE_MAX_EVENTS", 200000))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, label: str = "run"):
+        """Bắt đầu một lần chạy mới: xóa sự kiện, tổng hợp và counter."""
+        with self._lock:
+            self.label = label
+            self.started_at = time.time()
+            self._events: List[Dict[str, Any]] = []
+            self._dropped_events = 0
+            self._durations: Dict[str, List[float]] = {}
+            self._memory_peaks: Dict[str, float] = {}
+            self._counters: Dict[str, float] = {}
+            self._open_memory_spans: List[List[float]] = []
+        if self.enabled and self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _fold_memory_peak(self) -> int:
+        """Cộng dồn đỉnh tracemalloc hiện tại vào mọi span đang mở rồi đặt lại đỉnh."""
+        peak = tracemalloc.get_traced_memory()[1]
+        for holder in self._open_memory_spans:
+            holder[0] = max(holder[0], peak)
+        tracemalloc.reset_peak()
+        return peak
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict[str, Any]]:
+        """
+        Đo thời gian một khối lệnh. `attrs` (và các khóa được thêm vào dict trả về)
+        được ghi vào sự kiện, ví dụ số chunk hoặc kích thước lô.
+        """
+        if not self.enabled:
+            yield attrs
+            return
+        memory_holder = None
+        if self.trace_memory:
+            with self._lock:
+                self._fold_memory_peak()
+                memory_holder = [0.0]
+                self._open_memory_spans.append(memory_holder)
+        start_us = time.time_ns() // 1000
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                if memory_holder is not None:
+                    self._fold_memory_peak()
+                    self._open_memory_spans.remove(memory_holder)
+                    attrs["py_peak_mb"] = round(memory_holder[0] / 1024 / 1024, 2)
+                    self._memory_peaks[name] = max(self._memory_peaks.get(name, 0.0), attrs["py_peak_mb"])
+                self._record_locked({
+                    "name": name, "ph": "X", "ts": start_us, "dur": int(duration * 1_000_000),
+                    "pid": os.getpid(), "tid": threading.get_ident(), "args": attrs,
+                })
+
+    def _record_locked(self, event: Dict[str, Any]):
+        self._durations.setdefault(event["name"], []).append(event["dur"] / 1000)
+        if len(self._events) < self.max_events:
+            self._events.append(event)
+        else:
+            self._dropped_events += 1
+
+    def count(self, name: str, value: float = 1):
+        """Cộng `value` vào counter `name`."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def drain_events(self) -> Dict[str, Any]:
+        """Lấy (và xóa) sự kiện, counter đã ghi trong tiến trình này để gửi về tiến trình chính."""
+        with self._lock:
+            drained = {"events": self._events, "counters": self._counters}
+            self._events, self._counters, self._durations = [], {}, {}
+        return drained
+
+    def merge_events(self, drained: Optional[Dict[str, Any]]):
+        """Gộp sự kiện, counter nhận từ tiến trình con (xem `drain_events`)."""
+        if not self.enabled or not drained:
+            return
+        with self._lock:
+            for event in drained.get("events", []):
+                self._record_locked(event)
+            for name, value in drained.get("counters", {}).items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def summary(self) -> Dict[str, Any]:
+        """Tổng hợp theo giai đoạn: số lần, tổng/trung bình/p50/p95/max (ms) và bộ nhớ đỉnh."""
+        with self._lock:
+            stages = {}
+            for name, durations in sorted(self._durations.items()):
+                values = sorted(durations)
+                stages[name] = {
+                    "count": len(values),
+                    "total_ms": round(sum(values), 3),
+                    "mean_ms": round(sum(values) / len(values), 3),
+                    "p50_ms": round(_percentile(values, 0.50), 3),
+                    "p95_ms": round(_percentile(values, 0.95), 3),
+                    "max_ms": round(values[-1], 3),
+                }
+                if name in self._memory_peaks:
+                    stages[name]["py_peak_mb"] = self._memory_peaks[name]
+            return {
+                "label": self.label,
+                "started_at": self.started_at,
+                "wall_time_s": round(time.time() - self.started_at, 3),
+                "peak_rss_mb": _peak_rss_mb(),
+                "stages": stages,
+                "counters": dict(sorted(self._counters.items())),
+                "dropped_events": self._dropped_events,
+            }
+
+    def write_report(self, output_dir: Path, trace_format: str = None) -> List[Path]:
+        """
+        Ghi báo cáo của lần chạy vào `output_dir`:
+        trace_<label>.json (tổng hợp) và/hoặc trace_<label>.chrome.json (Chrome trace).
+        """
+        if not self.enabled:
+            return []
+        trace_format = (trace_format or os.getenv("TRACE_FORMAT", "json")).lower()
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        summary = self.summary()
+        written = []
+        if trace_format in ("json", "both"):
+            path = output_dir / f"trace_{self.label}.json"
+            path.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+            written.append(path)
+        if trace_format in ("chrome", "both"):
+            path = output_dir / f"trace_{self.label}.chrome.json"
+            with self._lock:
+                events = list(self._events)
+            counters = [{"name": name, "ph": "C", "ts": events[-1]["ts"] if events else 0, "pid": os.getpid(),
+                         "args": {"value": value}} for name, value in summary["counters"].items()]
+            path.write_text(json.dumps({"traceEvents": events + counters, "otherData": summary},
+                                       ensure_ascii=False, default=str), encoding="utf-8")
+            written.append(path)
+        return written
+
+    def print_report(self, top: int = 15):
+        """In các giai đoạn tốn thời gian nhất của lần chạy."""
+        if not self.enabled:
+            return
+        summary = self.summary()
+        rss = f", RSS đỉnh {summary['peak_rss_mb']:.0f} MB" if summary["peak_rss_mb"] is not None else ""
+        print(f"\n⏱️  Trace '{summary['label']}': {summary['wall_time_s']:.1f}s{rss}")
+        stages = sorted(summary["stages"].items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        for name, stage in stages[:top]:
+            print(f"   - {name:<28} {stage['total_ms'] / 1000:>9.2f}s  x{stage['count']:<6} "
+                  f"p50 {stage['p50_ms']:>8.1f} ms  p95 {stage['p95_ms']:>8.1f} ms")
+        for name, value in summary["counters"].items():
+            print(f"   # {name:<28} {value:g}")
+
+
+# Tracer dùng chung của tiến trình
+TRACER = Tracer()
+
+
+def span(name: str, **attrs):
+    """Span trên tracer dùng chung, ví dụ: `with span("embedding.batch", size=len(texts)): ...`."""
+    return TRACER.span(name, **attrs)
+
+
+def count(name: str, value: float = 1):
+    """Counter trên tracer dùng chung."""
+    TRACER.count(name, value)
@@ -0,0 +1,113 @@
+# src/vectordb/backend.py
+"""
+Module này định nghĩa giao diện backend lưu trữ vector (`VectorBackend`) mà
+`VectorStore` sử dụng. Có hai cài đặt:
+- `qdrant_backend.QdrantBackend`: dùng Qdrant server (mặc định).
+- `local_backend.LocalBackend`: backend nhúng chạy ngay trong tiến trình, không cần service.
+Việc chọn backend được thực hiện qua biến môi trường VECTOR_BACKEND
+(xem `client.get_vector_backend`).
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+VectorBatch = Union[np.ndarray, Sequence[Sequence[float]]]
+
+# Chế độ lưu vector cho collection mới (VECTOR_QUANTIZATION):
+# - none: float32 đầy đủ
+# - float16: lưu nửa độ chính xác, không cần rescore
+# - int8: scalar quantization, tìm trên mã int8 rồi rescore bằng vector gốc
+# - binary: 1 bit/chiều, tìm theo dấu rồi rescore bằng vector gốc
+QUANTIZATION_MODES = ("none", "float16", "int8", "binary")
+
+
+def validate_quantization(quantization: str) -> str:
+    quantization = (quantization or "none").lower()
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"VECTOR_QUANTIZATION không hợp lệ: {quantization} "
+                         f"(chỉ hỗ trợ {', '.join(QUANTIZATION_MODES)}).")
+    return quantization
+
+
+def estimate_footprint(points: int, dimension: int, quantization: str, originals_in_ram: bool) -> Dict[str, Any]:
+    """
+    Ước lượng dung lượng vector của một collection (không tính payload và đồ thị HNSW).
+    Với int8/binary, vector gốc float32 vẫn được giữ để rescore (trên đĩa hoặc trong RAM).
+    """
+    original_bytes = points * dimension * (2 if quantization == "float16" else 4)
+    if quantization == "int8":
+        quantized_bytes = points * dimension
+    elif quantization == "binary":
+        quantized_bytes = points * ((dimension + 7) // 8)
+    else:
+        quantized_bytes = 0
+    ram_bytes = quantized_bytes + (original_bytes if originals_in_ram or not quantized_bytes else 0)
+    return {
+        "quantization": quantization,
+        "points": points,
+        "dimension": dimension,
+        "original_bytes": original_bytes,
+        "quantized_bytes": quantized_bytes,
+        "ram_bytes": ram_bytes,
+        "float32_bytes": points * dimension * 4,
+    }
+
+
+@dataclass
+class SearchHit:
+    """Một kết quả tìm kiếm; cùng các thuộc tính dùng tới của `qdrant_client.models.ScoredPoint`."""
+    id: str
+    score: float
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+
+class VectorBackend(ABC):
+    """Các thao tác lưu trữ/tìm kiếm vector mà pipeline cần (khoảng cách cosine)."""
+
+    # Số ID tối đa mỗi lần gọi `delete` từ VectorStore.delete_points (None = tất cả trong một lần)
+    delete_batch_size: Optional[int] = 1000
+
+    @abstractmethod
+    def collection_exists(self, collection_name: str) -> bool:
+        ...
+
+    @abstractmethod
+    def create_collection(self, collection_name: str, dimension: int, quantization: str = "none"):
+        ...
+
+    @abstractmethod
+    def recreate_collection(self, collection_name: str, dimension: int, quantization: str = "none"):
+        ...
+
+    @abstractmethod
+    def upsert(self, collection_name: str, ids: List[str], vectors: VectorBatch,
+               payloads: List[Dict[str, Any]], wait: bool = True):
+        ...
+
+    @abstractmethod
+    def delete(self, collection_name: str, ids: List[str]):
+        ...
+
+    @abstractmethod
+    def count(self, collection_name: str) -> int:
+        ...
+
+    @abstractmethod
+    def search(self, collection_name: str, query_vectors: VectorBatch, limit: int,
+               score_threshold: Optional[float] = None) -> List[List[SearchHit]]:
+        """
+        Tìm kiếm theo lô: trả về danh sách kết quả cho từng vector truy vấn.
+        Với collection lượng tử hóa, backend lấy dư ứng viên (oversampling) rồi
+        rescore bằng vector gốc trước khi áp dụng limit và score_threshold.
+        """
+
+    @abstractmethod
+    def collection_info(self, collection_name: str) -> dict:
+        ...
+
+    @abstractmethod
+    def memory_footprint(self, collection_name: str) -> Dict[str, Any]:
+        """Dung lượng vector của collection (xem `estimate_footprint`)."""
@@ -1,18 +1,103 @@
 import os
+import threading
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
-from qdrant_client import QdrantClient
+
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize the Qdrant client as a singleton instance
-# Default values are provided for robustness
-QDRANT_CLIENT = QdrantClient(
-    host=os.getenv("QDRANT_HOST", "localhost"),
-    port=int(os.getenv("QDRANT_PORT", 6333)),
-    timeout=int(os.getenv("QDRANT_TIMEOUT", 20))
-)
-
-def get_qdrant_client() -> QdrantClient:
-    """Returns the singleton Qdrant client instance."""
-    return QDRANT_CLIENT
\ No newline at end of file
+# The Qdrant client is a singleton created on first use, so importing this module
+# (e.g. via src.pipeline.tasks) neither imports qdrant_client nor opens a connection.
+_qdrant_client = None
+_client_lock = threading.Lock()
+
+def _env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+def _create_qdrant_client() -> "QdrantClient":
+    """Builds the client from the environment. Default values are provided for robustness."""
+    import httpx
+    from qdrant_client import QdrantClient
+
+    prefer_grpc = _env_flag("QDRANT_PREFER_GRPC")
+    pool_size = int(os.getenv("QDRANT_POOL_SIZE", 8))
+    kwargs = {}
+    if prefer_grpc:
+        # Vectors travel as protobuf instead of JSON; raise gRPC's 4 MB message cap for bulk upserts
+        max_message_mb = int(os.getenv("QDRANT_GRPC_MAX_MESSAGE_MB", 64))
+        kwargs["grpc_options"] = {
+            "grpc.max_send_message_length": max_message_mb * 1024 * 1024,
+            "grpc.max_receive_message_length": max_message_mb * 1024 * 1024,
+            "grpc.keepalive_time_ms": 30000,
+        }
+    else:
+        # Reuse keep-alive connections across requests (qdrant-client disables keep-alive by default)
+        kwargs["limits"] = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+
+    client = QdrantClient(
+        host=os.getenv("QDRANT_HOST", "localhost"),
+        port=int(os.getenv("QDRANT_PORT", 6333)),
+        grpc_port=int(os.getenv("QDRANT_GRPC_PORT", 6334)),
+        prefer_grpc=prefer_grpc,
+        timeout=int(os.getenv("QDRANT_TIMEOUT", 20)),
+        **kwargs,
+    )
+    print(f"✅ Qdrant client ready ({'gRPC' if prefer_grpc else 'HTTP'}).")
+    return client
+
+def get_qdrant_client() -> "QdrantClient":
+    """Returns the singleton Qdrant client instance, creating it on first call."""
+    global _qdrant_client
+    if _qdrant_client is None:
+        with _client_lock:
+            if _qdrant_client is None:
+                _qdrant_client = _create_qdrant_client()
+    return _qdrant_client
+
+def __getattr__(name: str):
+    # Backwards compatibility: QDRANT_CLIENT used to be a module-level instance
+    if name == "QDRANT_CLIENT":
+        return get_qdrant_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Shared vector backend for all VectorStore instances (created on first use)
+_vector_backend = None
+_backend_lock = threading.Lock()
+
+def get_vector_backend():
+    """
+    Returns the singleton vector backend selected by VECTOR_BACKEND:
+    - "qdrant" (default): the Qdrant server configured above.
+    - "local": an embedded in-process store under LOCAL_VECTOR_DIR (no service needed).
+    """
+    global _vector_backend
+    with _backend_lock:
+        if _vector_backend is not None:
+            return _vector_backend
+        backend_type = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+        if backend_type == "qdrant":
+            from .qdrant_backend import QdrantBackend
+            _vector_backend = QdrantBackend(
+                get_qdrant_client(),
+                oversampling=float(os.getenv("VECTOR_RESCORE_OVERSAMPLING", 2.0)),
+                originals_on_disk=_env_flag("QDRANT_ORIGINALS_ON_DISK", "true"),
+            )
+        elif backend_type == "local":
+            from src.config.paths import PROJECT_ROOT
+            from .local_backend import LocalBackend
+            root_dir = PROJECT_ROOT / os.getenv("LOCAL_VECTOR_DIR", ".cache/vectors")
+            _vector_backend = LocalBackend(
+                root_dir,
+                oversampling=float(os.getenv("VECTOR_RESCORE_OVERSAMPLING", 2.0)),
+                index=os.getenv("LOCAL_INDEX", "auto").lower(),
+                ivf_min_points=int(os.getenv("LOCAL_IVF_MIN_POINTS", 50000)),
+                nprobe=int(os.getenv("LOCAL_IVF_NPROBE", 8)),
+                max_pending_points=int(os.getenv("LOCAL_MAX_PENDING_POINTS", 32768)),
+            )
+            print(f"✅ Using local vector backend at: {root_dir}")
+        else:
+            raise ValueError(f"Unsupported VECTOR_BACKEND: {backend_type} (expected qdrant or local).")
+    return _vector_backend
@@ -0,0 +1,71 @@
+# src/vectordb/corpus.py
+"""
+Module này quản lý định danh (chunk ID) ổn định cho từng chunk và một registry
+tra cứu id -> tài liệu dùng chung cho Vector Search, BM25 và RRF.
+Nhờ đó mọi phép tra cứu tài liệu gốc đều là O(1) thay vì quét toàn bộ corpus.
+"""
+
+import hashlib
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Namespace cố định để uuid5 sinh ra cùng một ID cho cùng một chunk giữa các lần chạy
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1c2a8e-4b7d-5e9a-9c3f-2d8b1e0a7c54")
+
+
+def make_chunk_id(source: str, chunk_index: int, content: str) -> str:
+    """
+    Sinh chunk ID ổn định (UUID dạng chuỗi, hợp lệ làm point ID của Qdrant).
+    ID phụ thuộc vào tài liệu nguồn, vị trí chunk và nội dung chunk.
+    """
+    digest = hashlib.sha1(content.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{source}:{chunk_index}:{digest}"))
+
+
+class DocumentRegistry:
+    """
+    Registry id -> tài liệu cho corpus đã index.
+    Giữ nguyên thứ tự của corpus để BM25 có thể ánh xạ vị trí (int) sang chunk ID.
+    """
+    def __init__(self, corpus_data: List[Dict]):
+        self.documents: List[Dict] = []
+        self.ids: List[str] = []
+        self._by_id: Dict[str, Dict] = {}
+        self._position: Dict[str, int] = {}
+
+        for position, doc in enumerate(corpus_data):
+            if "id" not in doc:
+                # corpus.json cũ (trước khi có chunk ID): sinh ID theo cùng quy tắc
+                doc = {**doc, "id": make_chunk_id(doc.get("source", ""), doc.get("chunk_index", position), doc["content"])}
+            doc_id = doc["id"]
+            if doc_id in self._by_id:
+                continue
+            self._position[doc_id] = len(self.documents)
+            self._by_id[doc_id] = doc
+            self.documents.append(doc)
+            self.ids.append(doc_id)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._by_id
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.documents)
+
+    def get(self, doc_id: str) -> Optional[Dict]:
+        """Trả về tài liệu theo chunk ID, hoặc None nếu không có."""
+        return self._by_id.get(doc_id)
+
+    def id_at(self, position: int) -> str:
+        """Trả về chunk ID tại vị trí `position` trong corpus."""
+        return self.ids[position]
+
+    def position_of(self, doc_id: str) -> int:
+        """Trả về vị trí của chunk ID trong corpus."""
+        return self._position[doc_id]
+
+    def get_many(self, doc_ids: Iterable[str]) -> List[Dict]:
+        """Tra cứu nhiều ID cùng lúc, bỏ qua các ID không tồn tại."""
+        return [self._by_id[doc_id] for doc_id in doc_ids if doc_id in self._by_id]
@@ -1,80 +1,200 @@
 # src/vectordb/indexer.py
 """
-Module này chứa logic để chunking, embedding, và tải dữ liệu vào Qdrant.
+Module này chứa logic để chunking, embedding, và tải dữ liệu vào vector store.
+
+Indexing chạy theo kiểu streaming (producer/consumer): thread chính chunk và
+embed theo từng lô có kích thước cố định, trong khi các lô trước đó được các
+thread upload gửi lên vector backend với `wait=False`. Hàng đợi giữa hai bên có giới hạn
+nên bộ nhớ đỉnh không phụ thuộc vào số lượng tài liệu. Lô cuối cùng được gửi với
+`wait=True`, đóng vai trò rào chắn nhất quán cho toàn bộ các lô trước.
 """
 
-import uuid
 import os
-import json
+import queue
+import threading
+import time
 from dotenv import load_dotenv
-from typing import Dict, List, Generator, Tuple
-from qdrant_client.models import PointStruct
+from typing import Any, Dict, List, Optional, Tuple
 
 from .store import VectorStore
-from src.chunking import get_chunking_strategy
+from .corpus import make_chunk_id
+from src.chunking import get_chunk_iterator
+from src.telemetry.tracing import count, span
 
 load_dotenv()
 
-def _batch_generator(data: List, batch_size: int) -> Generator[List, None, None]:
-    """Tạo ra các khối (batches) dữ liệu từ một danh sách."""
-    for i in range(0, len(data), batch_size):
-        yield data[i:i + batch_size]
+# Một lô point gửi cho VectorStore.upsert_points: (ids, vectors, payloads)
+_PointBatch = Tuple[List[str], Any, List[Dict[str, Any]]]
+
+class _StreamingUploader:
+    """
+    Consumer của pipeline: các thread lấy lô point từ hàng đợi có giới hạn và
+    upsert với wait=False. Lô mới nhất luôn được giữ lại để gửi cuối cùng với
+    wait=True khi `close()` (rào chắn nhất quán).
+    """
+    _STOP = object()
+
+    def __init__(self, vector_store: VectorStore, workers: int, max_pending: int):
+        self.vector_store = vector_store
+        self.uploaded = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, max_pending))
+        self._held: Optional[_PointBatch] = None
+        self._errors: List[Exception] = []
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"vector-upload-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _worker(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is self._STOP:
+                    return
+                if self._errors:
+                    continue  # Đã có lỗi: chỉ rút cạn hàng đợi để producer không bị chặn
+                with span("vectordb.upsert", points=len(batch[0]), wait=False):
+                    self.vector_store.upsert_points(*batch, wait=False)
+                with self._lock:
+                    self.uploaded += len(batch[0])
+            except Exception as e:
+                self._errors.append(e)
+            finally:
+                self._queue.task_done()
 
-def index_documents(extracted_data: Dict[str, str], vector_store: VectorStore) -> List[Dict[str, str]]:
+    def submit(self, batch: _PointBatch):
+        """Đưa một lô vào hàng đợi (chặn nếu hàng đợi đầy - backpressure cho producer)."""
+        if self._errors:
+            raise self._errors[0]
+        if self._held is not None:
+            self._queue.put(self._held)
+        self._held = batch
+
+    def _stop_workers(self):
+        for _ in self._threads:
+            self._queue.put(self._STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def abort(self):
+        """Dừng các thread upload mà không gửi lô đang giữ (dùng khi producer gặp lỗi)."""
+        self._errors.append(RuntimeError("Indexing bị hủy"))
+        self._stop_workers()
+        self._held = None
+
+    def close(self):
+        """Chờ mọi lô được gửi, rồi gửi lô cuối với wait=True làm rào chắn nhất quán."""
+        self._stop_workers()
+        if self._errors:
+            raise self._errors[0]
+        if self._held is not None:
+            with span("vectordb.upsert", points=len(self._held[0]), wait=True):
+                self.vector_store.upsert_points(*self._held, wait=True)
+            self.uploaded += len(self._held[0])
+            self._held = None
+
+
+def index_documents(extracted_data: Dict[str, str], vector_store: VectorStore, recreate: bool = True,
+                    batch_size: int = None, upload_workers: int = None, max_pending_batches: int = None) -> List[Dict[str, str]]:
     """
     Xử lý và index dữ liệu, đồng thời trả về corpus cho BM25.
-    
+    Mỗi chunk được gán một chunk ID ổn định, dùng làm point ID trong vector store
+    và làm khóa `id` trong corpus.
+
+    Args:
+        extracted_data: Nội dung Markdown của từng tài liệu cần index.
+        vector_store: Collection đích.
+        recreate: Xóa và tạo lại collection trước khi index. Đặt False để chỉ
+                  upsert các tài liệu được truyền vào (incremental extract).
+        batch_size: Số chunk mỗi lô embed/upload (mặc định INDEX_BATCH_SIZE).
+        upload_workers: Số thread upload song song (mặc định INDEX_UPLOAD_WORKERS).
+        max_pending_batches: Số lô tối đa chờ upload (mặc định INDEX_MAX_PENDING_BATCHES).
+
     Returns:
         List[Dict[str, str]]: Corpus chứa tất cả các chunk để sử dụng cho BM25.
     """
-    print("🔄 Bắt đầu quá trình chunking và indexing...")
-    
+    print("🔄 Bắt đầu quá trình chunking và indexing (streaming)...")
+
     chunking_strategy_name = os.getenv("CHUNKING_STRATEGY", "recursive_char")
-    chunk_text = get_chunking_strategy(chunking_strategy_name)
-    
-    vector_store.recreate_collection()
-    
-    all_points = []
+    # Chiến lược có `iter_chunks` (propositional, semantic_similarity) trả chunk dần dần:
+    # chunk được embed và upload ngay, không chờ chunk xong cả tài liệu
+    iter_chunks = get_chunk_iterator(chunking_strategy_name)
+    if batch_size is None:
+        batch_size = int(os.getenv("INDEX_BATCH_SIZE", 128))
+    if upload_workers is None:
+        upload_workers = int(os.getenv("INDEX_UPLOAD_WORKERS", 2))
+    if max_pending_batches is None:
+        max_pending_batches = int(os.getenv("INDEX_MAX_PENDING_BATCHES", 4))
+    batch_size = max(1, batch_size)
+
+    if recreate:
+        vector_store.recreate_collection()
+
     corpus_for_bm25 = []
+    pending_chunks: List[Dict] = []
     total_chunks = 0
-    
-    for doc_name, content in extracted_data.items():
-        print(f"  - Đang xử lý tài liệu: {doc_name}")
-        
-        raw_chunks = chunk_text(content)
-        if not raw_chunks:
-            print(f"    - ⚠️ Không tạo được chunk nào cho {doc_name}.")
-            continue
-            
-        chunks = [f"[{doc_name}] {chunk}" for chunk in raw_chunks]
-        
-        embeddings = vector_store.embedding_model.encode(chunks)
-        
-        for chunk, emb in zip(chunks, embeddings):
-            all_points.append(
-                PointStruct(
-                    id=str(uuid.uuid4()),
-                    vector=emb,
-                    payload={"content": chunk, "source": doc_name}
-                )
-            )
-            corpus_for_bm25.append({"content": chunk, "source": doc_name})
-        
-        print(f"    - Đã tạo {len(chunks)} chunks.")
-        total_chunks += len(chunks)
-
-    if all_points:
-        BATCH_SIZE = 128
-        print(f"\n🚀 Đang tải {len(all_points)} điểm dữ liệu lên Qdrant theo từng khối {BATCH_SIZE} điểm...")
-        
-        for batch in _batch_generator(all_points, BATCH_SIZE):
-            vector_store.client.upsert(
-                collection_name=vector_store.collection_name,
-                points=batch,
-                wait=True
-            )
-            print(f"   - Đã tải lên thành công {len(batch)} điểm.")
-    
+    uploader = _StreamingUploader(vector_store, upload_workers, max_pending_batches)
+
+    def flush():
+        """Embed một lô chunk và chuyển cho uploader."""
+        if not pending_chunks:
+            return
+        with span("embedding.batch", size=len(pending_chunks)):
+            embeddings = vector_store.embedding_model.encode([entry["content"] for entry in pending_chunks])
+        count("embedding.texts", len(pending_chunks))
+        ids = [entry["id"] for entry in pending_chunks]
+        payloads = [
+            {"chunk_id": entry["id"], "chunk_index": entry["chunk_index"],
+             "content": entry["content"], "source": entry["source"]}
+            for entry in pending_chunks
+        ]
+        uploader.submit((ids, embeddings, payloads))
+        pending_chunks.clear()
+
+    try:
+        for doc_name, content in extracted_data.items():
+            print(f"  - Đang xử lý tài liệu: {doc_name}")
+
+            with span("index.document", doc=doc_name, strategy=chunking_strategy_name) as doc_span:
+                chunk_index = 0
+                chunking_s = 0.0
+                raw_chunks = iter_chunks(content)
+                while True:
+                    # Chỉ tính thời gian sinh chunk (không gồm embed/upload xen giữa)
+                    start = time.perf_counter()
+                    raw_chunk = next(raw_chunks, None)
+                    chunking_s += time.perf_counter() - start
+                    if raw_chunk is None:
+                        break
+                    chunk = f"[{doc_name}] {raw_chunk}"
+                    chunk_id = make_chunk_id(doc_name, chunk_index, chunk)
+                    entry = {"id": chunk_id, "chunk_index": chunk_index, "content": chunk, "source": doc_name}
+                    corpus_for_bm25.append(entry)
+                    pending_chunks.append(entry)
+                    chunk_index += 1
+                    if len(pending_chunks) >= batch_size:
+                        flush()
+                doc_span["chunks"] = chunk_index
+                doc_span["chunking_ms"] = round(chunking_s * 1000, 3)
+            count("chunks", chunk_index)
+            count("chunking_ms", round(chunking_s * 1000, 3))
+            if not chunk_index:
+                print(f"    - ⚠️ Không tạo được chunk nào cho {doc_name}.")
+                continue
+
+            print(f"    - Đã tạo {chunk_index} chunks.")
+            total_chunks += chunk_index
+
+        flush()
+    except Exception:
+        uploader.abort()
+        raise
+    # Chờ các lô đang upload và gửi lô cuối với wait=True
+    uploader.close()
+
+    print(f"   - Đã tải lên thành công {uploader.uploaded} điểm dữ liệu.")
     print(f"✅ Hoàn thành indexing! Tổng cộng {total_chunks} chunks.")
     return corpus_for_bm25
-
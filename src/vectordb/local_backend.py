@@ -0,0 +1,501 @@
+# src/vectordb/local_backend.py
+"""
+Module này cài đặt `VectorBackend` chạy ngay trong tiến trình, không cần Qdrant server.
+
+Mỗi collection là một thư mục gồm:
+- `vectors.npy`: ma trận vector đã chuẩn hóa (float32 hoặc float16), đọc bằng memory-map.
+- `codes.npy` (collection int8/binary): mã lượng tử của ma trận trên, nạp hẳn vào RAM.
+- `ids.json` / `payloads.jsonl`: point ID và payload theo đúng thứ tự hàng.
+- `meta.json`: số chiều, kiểu dữ liệu và số point.
+- `ivf_centroids.npy` / `ivf_assign.npy` (tùy chọn): chỉ mục IVF phân vùng bằng k-means.
+
+Tìm kiếm mặc định là exact: tích vô hướng giữa các vector đã chuẩn hóa (= cosine)
+tính theo từng khối hàng để bộ nhớ không phụ thuộc kích thước collection. Với
+collection lượng tử hóa, điểm được tính trên mã int8/binary để chọn dư ứng viên
+(oversampling) rồi rescore bằng vector gốc. Với collection lớn có thể bật IVF:
+chỉ quét các cụm gần truy vấn nhất (LOCAL_IVF_NPROBE).
+Thao tác ghi được gom trong RAM và ghi xuống đĩa khi upsert với wait=True, khi số
+point đang chờ vượt LOCAL_MAX_PENDING_POINTS, khi xóa, hoặc khi tiến trình kết thúc.
+Mỗi lần ghi sao chép ma trận vector theo từng khối hàng nên không cần nạp cả collection vào RAM.
+"""
+
+import atexit
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .backend import SearchHit, VectorBackend, VectorBatch, estimate_footprint, validate_quantization
+
+FORMAT_VERSION = 1
+# Số hàng quét mỗi khối khi tìm kiếm exact / gán cụm IVF
+_BLOCK_ROWS = 16384
+
+
+def _normalize(vectors: VectorBatch, dimension: Optional[int] = None) -> np.ndarray:
+    """Chuyển sang ma trận float32 và chuẩn hóa L2 từng hàng (vector 0 giữ nguyên)."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    if dimension is not None and matrix.shape[1] != dimension:
+        raise ValueError(f"Số chiều vector ({matrix.shape[1]}) khác với collection ({dimension}).")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Vị trí của k điểm cao nhất trong mỗi hàng, sắp xếp giảm dần."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < scores.shape[1]:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+def _spherical_kmeans(data: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """K-means trên mặt cầu đơn vị (độ tương đồng cosine); trả về các tâm cụm đã chuẩn hóa."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=n_clusters, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        empty = ~np.any(sums, axis=1)
+        if empty.any():
+            # Cụm rỗng: khởi tạo lại bằng các điểm ngẫu nhiên
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class _LocalCollection:
+    """Dữ liệu và chỉ mục của một collection; mọi thao tác đều được bảo vệ bởi `lock`."""
+
+    def __init__(self, path: Path, dimension: int, quantization: str = "none", max_pending: int = 0):
+        self.path = path
+        self.dimension = dimension
+        self.quantization = quantization
+        self.dtype = np.dtype(np.float16 if quantization == "float16" else np.float32)
+        self.lock = threading.RLock()
+        self.ids: List[str] = []
+        self.payloads: List[Dict[str, Any]] = []
+        self.row_of: Dict[str, int] = {}
+        self.vectors = np.empty((0, dimension), dtype=self.dtype)
+        self.pending: Dict[str, Tuple[np.ndarray, Dict[str, Any]]] = {}
+        # Tự ghi xuống đĩa khi số point đang chờ đạt ngưỡng này (0 = chỉ khi flush)
+        self.max_pending = max_pending
+        # Mã lượng tử (int8: n x dim, binary: n x ceil(dim/8) bit đã pack) và hệ số theo chiều của int8
+        self.codes: Optional[np.ndarray] = None
+        self.code_scale = np.ones(dimension, dtype=np.float32)
+        self.centroids: Optional[np.ndarray] = None
+        self.cluster_rows: Optional[List[np.ndarray]] = None
+
+    # ---- Lưu trữ ----
+    @classmethod
+    def create(cls, path: Path, dimension: int, quantization: str = "none",
+               max_pending: int = 0) -> "_LocalCollection":
+        collection = cls(path, dimension, quantization, max_pending)
+        path.mkdir(parents=True, exist_ok=True)
+        collection._write()
+        return collection
+
+    @classmethod
+    def load(cls, path: Path, max_pending: int = 0) -> "_LocalCollection":
+        with open(path / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Phiên bản collection cục bộ không khớp ({meta.get('version')}).")
+        collection = cls(path, meta["dimension"], meta.get("quantization", "none"), max_pending)
+        with open(path / "ids.json", "r", encoding="utf-8") as f:
+            collection.ids = json.load(f)
+        with open(path / "payloads.jsonl", "r", encoding="utf-8") as f:
+            collection.payloads = [json.loads(line) for line in f if line.strip()]
+        collection.row_of = {point_id: row for row, point_id in enumerate(collection.ids)}
+        if collection.ids:
+            collection.vectors = np.load(path / "vectors.npy", mmap_mode="r")
+            if collection.quantized:
+                collection.codes = np.load(path / "codes.npy")
+                collection.code_scale = np.asarray(meta.get("code_scale", collection.code_scale), dtype=np.float32)
+        if len(collection.vectors) != len(collection.ids) or len(collection.payloads) != len(collection.ids):
+            raise ValueError(f"Dữ liệu collection cục bộ tại {path} không nhất quán.")
+        collection._load_ivf()
+        return collection
+
+    def _write(self, fill_vectors: Optional[Callable[[np.ndarray], None]] = None):
+        """
+        Ghi toàn bộ collection ra file tạm rồi đổi tên (meta.json ghi sau cùng).
+        `fill_vectors(out)` điền ma trận vector mới (len(ids) hàng) vào memmap đích theo
+        từng khối, đọc từ `self.vectors` cũ, để không phải giữ cả ma trận trong RAM.
+        """
+        def replace(name: str, write):
+            tmp = self.path / f"{name}.tmp"
+            with open(tmp, "wb") as f:
+                write(f)
+            os.replace(tmp, self.path / name)
+
+        if self.ids:
+            tmp = self.path / "vectors.npy.tmp"
+            out = np.lib.format.open_memmap(tmp, mode="w+", dtype=self.dtype, shape=(len(self.ids), self.dimension))
+            fill_vectors(out)
+            out.flush()
+            del out
+            os.replace(tmp, self.path / "vectors.npy")
+            # Đọc lại bằng memory-map thay vì giữ bản sao trong RAM
+            self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        else:
+            replace("vectors.npy", lambda f: np.save(f, np.empty((0, self.dimension), dtype=self.dtype)))
+            self.vectors = np.empty((0, self.dimension), dtype=self.dtype)
+        replace("ids.json", lambda f: f.write(json.dumps(self.ids).encode("utf-8")))
+        replace("payloads.jsonl", lambda f: f.writelines(
+            (json.dumps(p, ensure_ascii=False) + "\n").encode("utf-8") for p in self.payloads
+        ))
+        if self.quantized:
+            self._quantize()
+            replace("codes.npy", lambda f: np.save(f, self.codes))
+        meta = {"version": FORMAT_VERSION, "dimension": self.dimension, "dtype": self.dtype.name,
+                "quantization": self.quantization, "code_scale": self.code_scale.tolist(), "count": len(self.ids)}
+        replace("meta.json", lambda f: f.write(json.dumps(meta).encode("utf-8")))
+
+    @property
+    def quantized(self) -> bool:
+        """int8/binary: tìm trên mã lượng tử rồi rescore; none/float16 tính điểm trực tiếp."""
+        return self.quantization in ("int8", "binary")
+
+    def _quantize(self):
+        """Tính lại mã lượng tử cho toàn bộ ma trận (gọi mỗi lần ghi xuống đĩa)."""
+        if self.quantization == "binary":
+            self.codes = np.packbits(np.asarray(self.vectors) > 0, axis=1)
+            return
+        # int8 đối xứng theo từng chiều: |x| lớn nhất của chiều đó ứng với 127
+        max_abs = np.zeros(self.dimension, dtype=np.float32)
+        for start in range(0, len(self.ids), _BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+            max_abs = np.maximum(max_abs, np.abs(block).max(axis=0))
+        max_abs[max_abs == 0] = 1.0
+        self.code_scale = max_abs / 127
+        codes = np.empty(self.vectors.shape, dtype=np.int8)
+        for start in range(0, len(self.ids), _BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+            codes[start:start + len(block)] = np.clip(np.rint(block / self.code_scale), -127, 127)
+        self.codes = codes
+
+    def flush(self):
+        """Áp dụng các upsert đang chờ vào ma trận và ghi xuống đĩa."""
+        with self.lock:
+            if not self.pending:
+                return
+            old_rows = len(self.ids)
+            for point_id in self.pending:
+                if point_id not in self.row_of:
+                    self.row_of[point_id] = len(self.ids)
+                    self.ids.append(point_id)
+                    self.payloads.append({})
+            rows = np.empty(len(self.pending), dtype=np.int64)
+            updates = np.empty((len(self.pending), self.dimension), dtype=self.dtype)
+            for i, (point_id, (vector, payload)) in enumerate(self.pending.items()):
+                rows[i] = self.row_of[point_id]
+                updates[i] = vector
+                self.payloads[rows[i]] = payload
+
+            def fill(out: np.ndarray):
+                for start in range(0, old_rows, _BLOCK_ROWS):
+                    stop = min(start + _BLOCK_ROWS, old_rows)
+                    out[start:stop] = self.vectors[start:stop]
+                out[rows] = updates
+
+            self.pending.clear()
+            self._invalidate_ivf()
+            self._write(fill)
+
+    # ---- Ghi ----
+    def upsert(self, ids: List[str], vectors: VectorBatch, payloads: List[Dict[str, Any]]):
+        matrix = _normalize(vectors, self.dimension)
+        with self.lock:
+            for point_id, vector, payload in zip(ids, matrix, payloads):
+                self.pending[str(point_id)] = (vector, payload or {})
+            # Giới hạn bộ nhớ của các upsert wait=False đang gom
+            if self.max_pending and len(self.pending) >= self.max_pending:
+                self.flush()
+
+    def delete(self, ids: List[str]):
+        """Xóa nhiều point bằng một lần nén collection (gọi một lần cho cả danh sách ID)."""
+        with self.lock:
+            for point_id in ids:
+                self.pending.pop(str(point_id), None)
+            self.flush()
+            keep_mask = np.ones(len(self.ids), dtype=bool)
+            for point_id in ids:
+                row = self.row_of.get(str(point_id))
+                if row is not None:
+                    keep_mask[row] = False
+            if keep_mask.all():
+                return
+            keep = np.flatnonzero(keep_mask)
+
+            def fill(out: np.ndarray):
+                for start in range(0, len(keep), _BLOCK_ROWS):
+                    out[start:start + _BLOCK_ROWS] = self.vectors[keep[start:start + _BLOCK_ROWS]]
+
+            self.ids = [self.ids[row] for row in keep]
+            self.payloads = [self.payloads[row] for row in keep]
+            self.row_of = {point_id: row for row, point_id in enumerate(self.ids)}
+            self._invalidate_ivf()
+            self._write(fill)
+
+    def count(self) -> int:
+        with self.lock:
+            return len(self.ids) + sum(1 for pid in self.pending if pid not in self.row_of)
+
+    # ---- IVF ----
+    def _invalidate_ivf(self):
+        self.centroids = None
+        self.cluster_rows = None
+        for name in ("ivf_centroids.npy", "ivf_assign.npy"):
+            (self.path / name).unlink(missing_ok=True)
+
+    def _load_ivf(self):
+        centroids_path, assign_path = self.path / "ivf_centroids.npy", self.path / "ivf_assign.npy"
+        if not (centroids_path.exists() and assign_path.exists()):
+            return
+        assign = np.load(assign_path)
+        if len(assign) != len(self.ids):
+            return
+        self._set_ivf(np.load(centroids_path), assign)
+
+    def _set_ivf(self, centroids: np.ndarray, assign: np.ndarray):
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(len(centroids) + 1))
+        self.centroids = centroids
+        self.cluster_rows = [order[bounds[c]:bounds[c + 1]] for c in range(len(centroids))]
+
+    def build_ivf(self, n_clusters: Optional[int] = None, sample_size: int = 256):
+        """Phân vùng collection bằng spherical k-means (mặc định ~sqrt(N) cụm) và lưu chỉ mục."""
+        with self.lock:
+            self.flush()
+            total = len(self.ids)
+            if total == 0:
+                return
+            n_clusters = max(1, min(total, n_clusters or int(np.sqrt(total))))
+            rng = np.random.default_rng(0)
+            train_rows = np.sort(rng.choice(total, size=min(total, n_clusters * sample_size), replace=False))
+            centroids = _spherical_kmeans(np.asarray(self.vectors[train_rows], dtype=np.float32), n_clusters)
+            assign = np.empty(total, dtype=np.int32)
+            for start in range(0, total, _BLOCK_ROWS):
+                block = np.asarray(self.vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+                assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+            np.save(self.path / "ivf_centroids.npy", centroids)
+            np.save(self.path / "ivf_assign.npy", assign)
+            self._set_ivf(centroids, assign)
+            print(f"✅ Đã xây dựng chỉ mục IVF ({n_clusters} cụm) cho {total} vector tại: {self.path}")
+
+    # ---- Tìm kiếm ----
+    def _approx_scores(self, queries: np.ndarray, rows) -> np.ndarray:
+        """Điểm (số truy vấn x số hàng) tính trên dữ liệu dùng để quét: mã lượng tử hoặc vector."""
+        if self.quantization == "int8":
+            return (queries * self.code_scale) @ self.codes[rows].astype(np.float32).T
+        if self.quantization == "binary":
+            signs = np.unpackbits(self.codes[rows], axis=1, count=self.dimension).astype(np.float32) * 2 - 1
+            return (queries @ signs.T) / np.sqrt(self.dimension)
+        return queries @ np.asarray(self.vectors[rows], dtype=np.float32).T
+
+    def _rescore(self, query: np.ndarray, rows: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Tính lại điểm chính xác của các ứng viên bằng vector gốc và giữ `limit` hàng tốt nhất."""
+        order = np.argsort(rows)  # Đọc memory-map theo thứ tự tăng dần
+        rows = rows[order]
+        scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+        top = _top_k(scores.reshape(1, -1), limit)[0]
+        return scores[top], rows[top]
+
+    def _candidates(self, limit: int, oversampling: float) -> int:
+        return int(np.ceil(limit * oversampling)) if self.quantized else limit
+
+    def search_exact(self, queries: np.ndarray, limit: int,
+                     oversampling: float = 1.0) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Quét toàn bộ collection theo từng khối, giữ top-k tạm thời cho mỗi truy vấn."""
+        candidates = self._candidates(limit, oversampling)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self.ids), _BLOCK_ROWS):
+            stop = min(start + _BLOCK_ROWS, len(self.ids))
+            scores = np.concatenate([best_scores, self._approx_scores(queries, slice(start, stop))], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(
+                np.arange(start, stop), (len(queries), stop - start))], axis=1)
+            top = _top_k(scores, candidates)
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+        if not self.quantized:
+            return list(zip(best_scores, best_rows))
+        return [self._rescore(query, rows, limit) for query, rows in zip(queries, best_rows)]
+
+    def search_ivf(self, query: np.ndarray, limit: int, nprobe: int,
+                   oversampling: float = 1.0) -> Tuple[np.ndarray, np.ndarray]:
+        """Chỉ tính điểm trên các hàng thuộc `nprobe` cụm gần truy vấn nhất."""
+        probe = _top_k((query @ self.centroids.T).reshape(1, -1), nprobe)[0]
+        rows = np.sort(np.concatenate([self.cluster_rows[c] for c in probe]))
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        scores = self._approx_scores(query.reshape(1, -1), rows)
+        top = _top_k(scores, self._candidates(limit, oversampling))[0]
+        if not self.quantized:
+            return scores[0, top], rows[top]
+        return self._rescore(query, rows[top], limit)
+
+
+class LocalBackend(VectorBackend):
+    """
+    Backend vector nhúng: lưu collection trên đĩa tại `root_dir`, tìm kiếm bằng numpy.
+
+    Args:
+        root_dir: Thư mục chứa các collection.
+        oversampling: Hệ số lấy dư ứng viên trước khi rescore (collection int8/binary).
+        index: "exact", "ivf" hoặc "auto" (IVF khi số point >= ivf_min_points).
+        ivf_min_points: Ngưỡng số point để chế độ "auto" dùng IVF.
+        nprobe: Số cụm IVF được quét cho mỗi truy vấn.
+        max_pending_points: Số point upsert wait=False tối đa gom trong RAM trước khi tự ghi xuống đĩa (0 = không giới hạn).
+    """
+
+    # Xóa cả danh sách ID trong một lần gọi: mỗi lần xóa phải ghi lại toàn bộ collection
+    delete_batch_size = None
+
+    def __init__(self, root_dir: Path, oversampling: float = 2.0, index: str = "auto",
+                 ivf_min_points: int = 50000, nprobe: int = 8, max_pending_points: int = 32768):
+        if index not in ("exact", "ivf", "auto"):
+            raise ValueError(f"LOCAL_INDEX không hợp lệ: {index} (chỉ hỗ trợ exact, ivf, auto).")
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.oversampling = max(1.0, oversampling)
+        self.index = index
+        self.ivf_min_points = ivf_min_points
+        self.nprobe = max(1, nprobe)
+        self.max_pending_points = max(0, max_pending_points)
+        self._collections: Dict[str, _LocalCollection] = {}
+        self._lock = threading.Lock()
+        # Ghi các upsert còn đang gom trong RAM khi tiến trình kết thúc
+        atexit.register(self.flush)
+
+    def _path(self, collection_name: str) -> Path:
+        return self.root_dir / collection_name
+
+    def _get(self, collection_name: str) -> _LocalCollection:
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is None:
+                if not (self._path(collection_name) / "meta.json").exists():
+                    raise KeyError(f"Collection '{collection_name}' không tồn tại tại {self.root_dir}.")
+                collection = _LocalCollection.load(self._path(collection_name), self.max_pending_points)
+                self._collections[collection_name] = collection
+            return collection
+
+    def flush(self):
+        for collection in list(self._collections.values()):
+            collection.flush()
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return collection_name in self._collections or (self._path(collection_name) / "meta.json").exists()
+
+    def create_collection(self, collection_name: str, dimension: int, quantization: str = "none"):
+        quantization = validate_quantization(quantization)
+        with self._lock:
+            if collection_name in self._collections or (self._path(collection_name) / "meta.json").exists():
+                raise ValueError(f"Collection '{collection_name}' already exists")
+            self._collections[collection_name] = _LocalCollection.create(
+                self._path(collection_name), dimension, quantization, self.max_pending_points
+            )
+
+    def recreate_collection(self, collection_name: str, dimension: int, quantization: str = "none"):
+        quantization = validate_quantization(quantization)
+        with self._lock:
+            self._collections.pop(collection_name, None)
+            shutil.rmtree(self._path(collection_name), ignore_errors=True)
+            self._collections[collection_name] = _LocalCollection.create(
+                self._path(collection_name), dimension, quantization, self.max_pending_points
+            )
+
+    def upsert(self, collection_name: str, ids: List[str], vectors: VectorBatch,
+               payloads: List[Dict[str, Any]], wait: bool = True):
+        collection = self._get(collection_name)
+        collection.upsert(ids, vectors, payloads)
+        if wait:
+            collection.flush()
+
+    def delete(self, collection_name: str, ids: List[str]):
+        self._get(collection_name).delete(ids)
+
+    def count(self, collection_name: str) -> int:
+        return self._get(collection_name).count()
+
+    def _use_ivf(self, collection: _LocalCollection) -> bool:
+        if self.index == "exact":
+            return False
+        if self.index == "auto" and len(collection.ids) < self.ivf_min_points:
+            return False
+        if collection.centroids is None:
+            collection.build_ivf()
+        # Quét hết các cụm thì exact nhanh hơn
+        return collection.centroids is not None and self.nprobe < len(collection.centroids)
+
+    def search(self, collection_name: str, query_vectors: VectorBatch, limit: int,
+               score_threshold: Optional[float] = None) -> List[List[SearchHit]]:
+        collection = self._get(collection_name)
+        with collection.lock:
+            collection.flush()
+            queries = _normalize(query_vectors, collection.dimension)
+            if not collection.ids or limit <= 0:
+                return [[] for _ in range(len(queries))]
+            if self._use_ivf(collection):
+                results = [collection.search_ivf(query, limit, self.nprobe, self.oversampling) for query in queries]
+            else:
+                results = collection.search_exact(queries, limit, self.oversampling)
+
+            batch_hits = []
+            for scores, rows in results:
+                hits = []
+                for score, row in zip(scores, rows):
+                    if score_threshold is not None and score < score_threshold:
+                        break  # Điểm đã sắp xếp giảm dần
+                    hits.append(SearchHit(id=collection.ids[row], score=float(score),
+                                          payload=collection.payloads[row]))
+                batch_hits.append(hits)
+            return batch_hits
+
+    def collection_info(self, collection_name: str) -> dict:
+        collection = self._get(collection_name)
+        with collection.lock:
+            collection.flush()
+            points = len(collection.ids)
+            return {
+                "status": "green",
+                "backend": "local",
+                "points_count": points,
+                "vectors_count": points,
+                "indexed_vectors_count": points if collection.centroids is not None else 0,
+                "config": {"params": {"vectors": {"size": collection.dimension, "distance": "Cosine"}}},
+                "storage": {
+                    "path": str(collection.path),
+                    "dtype": collection.dtype.name,
+                    "quantization": collection.quantization,
+                    "vector_bytes": points * collection.dimension * collection.dtype.itemsize,
+                    "code_bytes": collection.codes.nbytes if collection.codes is not None else 0,
+                    "index": "ivf" if collection.centroids is not None else "exact",
+                    "ivf_clusters": len(collection.centroids) if collection.centroids is not None else 0,
+                },
+            }
+
+    def memory_footprint(self, collection_name: str) -> Dict[str, Any]:
+        collection = self._get(collection_name)
+        with collection.lock:
+            collection.flush()
+            # Vector gốc được memory-map: với int8/binary chỉ các ứng viên cần rescore mới được đọc
+            footprint = estimate_footprint(len(collection.ids), collection.dimension,
+                                           collection.quantization, originals_in_ram=False)
+        footprint["backend"] = "local"
+        return footprint
@@ -1,14 +1,14 @@
 # src/vectordb/search.py
 """
-Module này cung cấp các chức năng tìm kiếm nâng cao trên Qdrant,
+Module này cung cấp các chức năng tìm kiếm nâng cao trên vector backend (Qdrant hoặc cục bộ),
 bao gồm tìm kiếm vector đơn giản và các chiến lược phức tạp hơn như MMR
 để tăng sự đa dạng của kết quả.
 """
 from typing import List, Any
-from qdrant_client.models import ScoredPoint
+from .backend import SearchHit
 from .store import VectorStore
 
-def search(query: str, vector_store: VectorStore, top_k: int = 5, threshold: float = 0.3) -> List[ScoredPoint]:
+def search(query: str, vector_store: VectorStore, top_k: int = 5, threshold: float = 0.3) -> List[SearchHit]:
     """
     Thực hiện tìm kiếm vector trong collection.
 
@@ -19,21 +19,46 @@ def search(query: str, vector_store: VectorStore, top_k: int = 5, threshold: flo
         threshold (float): Ngưỡng điểm tương đồng tối thiểu.
 
     Returns:
-        List[ScoredPoint]: Danh sách các kết quả tìm thấy.
+        List[SearchHit]: Danh sách các kết quả tìm thấy.
     """
     print(f"🔍 Đang tìm kiếm với truy vấn: '{query[:50]}...'")
     
-    # 1. Embed câu truy vấn
-    query_vector = vector_store.embedding_model.encode(query)
+    # 1. Embed câu truy vấn (ma trận 1 x dim)
+    query_vectors = vector_store.embedding_model.encode([query])
     
-    # 2. Thực hiện tìm kiếm trong Qdrant
-    search_results = vector_store.client.search(
-        collection_name=vector_store.collection_name,
-        query_vector=query_vector,
-        limit=top_k,
-        score_threshold=threshold,
-        with_payload=True  # Lấy cả payload (nội dung, nguồn,...)
-    )
+    # 2. Thực hiện tìm kiếm trong backend (kèm payload: nội dung, nguồn,...)
+    search_results = vector_store.backend.search(
+        vector_store.collection_name, query_vectors, limit=top_k, score_threshold=threshold
+    )[0]
     
     print(f"  - Tìm thấy {len(search_results)} kết quả phù hợp.")
     return search_results
+
+def search_batch(queries: List[str], vector_store: VectorStore, top_k: int = 5, threshold: float = 0.3) -> List[List[SearchHit]]:
+    """
+    Tìm kiếm vector cho nhiều truy vấn cùng lúc: embed tất cả truy vấn trong
+    một lần gọi model và gửi một request tìm kiếm theo lô duy nhất tới backend.
+
+    Args:
+        queries (List[str]): Danh sách câu truy vấn.
+        vector_store (VectorStore): Kho vector để tìm kiếm.
+        top_k (int): Số lượng kết quả hàng đầu cho mỗi truy vấn.
+        threshold (float): Ngưỡng điểm tương đồng tối thiểu.
+
+    Returns:
+        List[List[SearchHit]]: Kết quả cho từng truy vấn, theo đúng thứ tự đầu vào.
+    """
+    if not queries:
+        return []
+    print(f"🔍 Đang tìm kiếm theo lô {len(queries)} truy vấn...")
+
+    # 1. Embed toàn bộ truy vấn trong một lần gọi
+    query_vectors = vector_store.embedding_model.encode(list(queries))  # ma trận float32
+
+    # 2. Gửi một request tìm kiếm cho cả lô
+    batch_results = vector_store.backend.search(
+        vector_store.collection_name, query_vectors, limit=top_k, score_threshold=threshold
+    )
+
+    print(f"  - Tìm thấy tổng cộng {sum(len(r) for r in batch_results)} kết quả phù hợp.")
+    return batch_results
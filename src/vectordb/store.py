@@ -1,21 +1,35 @@
 # src/vectordb/store.py
 """
-Module này định nghĩa class `VectorStore` để quản lý các collection trong Qdrant.
+Module này định nghĩa class `VectorStore` để quản lý các collection vector.
 Nó đóng gói logic tạo collection, xóa, và các thao tác quản trị khác.
+Việc lưu trữ được ủy quyền cho một `VectorBackend` (Qdrant hoặc backend cục bộ,
+chọn qua VECTOR_BACKEND).
 """
 
-from qdrant_client.models import VectorParams, Distance, HnswConfigDiff
-from .client import get_qdrant_client
-from ..embedding.model import EmbeddingModel
+import os
+from typing import TYPE_CHECKING, Any, Dict, List
+from dotenv import load_dotenv
+from .backend import VectorBackend, VectorBatch, validate_quantization
+from .client import get_vector_backend
+
+if TYPE_CHECKING:
+    from ..embedding.model import EmbeddingModel
+
+load_dotenv()
 
 class VectorStore:
     """
-    Lớp quản lý một collection cụ thể trong Qdrant.
+    Lớp quản lý một collection cụ thể trong vector backend.
     """
-    def __init__(self, collection_name: str, embedding_model: EmbeddingModel):
-        self.client = get_qdrant_client()
+    def __init__(self, collection_name: str, embedding_model: "EmbeddingModel", backend: VectorBackend = None,
+                 quantization: str = None):
+        self.backend = backend or get_vector_backend()
+        # QdrantClient gốc (None với backend cục bộ)
+        self.client = getattr(self.backend, "client", None)
         self.collection_name = collection_name
         self.embedding_model = embedding_model
+        # Chế độ lưu vector cho collection mới (none, float16, int8, binary)
+        self.quantization = validate_quantization(quantization or os.getenv("VECTOR_QUANTIZATION", "none"))
         
         # Tự động tạo collection nếu chưa tồn tại
         self._create_collection_if_not_exists()
@@ -25,18 +39,11 @@ class VectorStore:
         Tạo collection với cấu hình tối ưu nếu nó chưa tồn tại.
         """
         try:
-            # collection_exists nhanh hơn get_collection
-            if not self.client.collection_exists(self.collection_name):
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=self.embedding_model.get_dimension(),
-                        distance=Distance.COSINE
-                    ),
-                    # Cấu hình HNSW để cân bằng giữa tốc độ và độ chính xác
-                    hnsw_config=HnswConfigDiff(m=16, ef_construct=100)
+            if not self.backend.collection_exists(self.collection_name):
+                self.backend.create_collection(
+                    self.collection_name, self.embedding_model.get_dimension(), self.quantization
                 )
-                print(f"✅ Collection '{self.collection_name}' đã được tạo.")
+                print(f"✅ Collection '{self.collection_name}' đã được tạo (quantization: {self.quantization}).")
         except Exception as e:
             # Xử lý trường hợp collection đã tồn tại do race condition
             if "already exists" not in str(e):
@@ -46,19 +53,54 @@ class VectorStore:
     def recreate_collection(self):
         """Xóa và tạo lại collection. Hữu ích khi muốn làm mới dữ liệu."""
         print(f"⚠️ Đang xóa và tạo lại collection '{self.collection_name}'...")
-        self.client.recreate_collection(
-            collection_name=self.collection_name,
-            vectors_config=VectorParams(
-                size=self.embedding_model.get_dimension(),
-                distance=Distance.COSINE
-            ),
+        self.backend.recreate_collection(
+            self.collection_name, self.embedding_model.get_dimension(), self.quantization
         )
-        print(f"✅ Collection '{self.collection_name}' đã được làm mới.")
+        print(f"✅ Collection '{self.collection_name}' đã được làm mới (quantization: {self.quantization}).")
+
+    def upsert_points(self, ids: List[str], vectors: VectorBatch, payloads: List[Dict[str, Any]], wait: bool = True):
+        """
+        Upsert một lô point. Với wait=False, Qdrant xác nhận ngay khi ghi vào WAL
+        (backend cục bộ chỉ gom vào RAM); một lần upsert wait=True sau đó chỉ trả về
+        khi mọi thao tác trước đã được áp dụng.
+        """
+        self.backend.upsert(self.collection_name, ids, vectors, payloads, wait=wait)
+
+    def delete_points(self, point_ids: List[str], batch_size: int = None):
+        """
+        Xóa các point theo ID (ví dụ chunk của tài liệu đã bị xóa hoặc thay đổi).
+        Mặc định chia lô theo `delete_batch_size` của backend (Qdrant: 1000 ID mỗi request,
+        backend cục bộ: một lần nén collection cho toàn bộ danh sách).
+        """
+        batch_size = batch_size or self.backend.delete_batch_size or max(1, len(point_ids))
+        for i in range(0, len(point_ids), batch_size):
+            self.backend.delete(self.collection_name, point_ids[i:i + batch_size])
+        if point_ids:
+            print(f"🗑️ Đã xóa {len(point_ids)} point khỏi collection '{self.collection_name}'.")
+
+    def count_points(self) -> int:
+        """Đếm chính xác số point hiện có trong collection."""
+        return self.backend.count(self.collection_name)
 
     def get_collection_info(self) -> dict:
         """Lấy thông tin về collection, ví dụ: số lượng vector."""
         try:
-            return self.client.get_collection(self.collection_name).model_dump()
+            return self.backend.collection_info(self.collection_name)
         except Exception as e:
             print(f"Không thể lấy thông tin collection '{self.collection_name}': {e}")
             return {}
+
+    def memory_report(self) -> Dict[str, Any]:
+        """In và trả về dung lượng vector của collection theo chế độ lượng tử hóa hiện tại."""
+        try:
+            footprint = self.backend.memory_footprint(self.collection_name)
+        except Exception as e:
+            print(f"Không thể lấy dung lượng collection '{self.collection_name}': {e}")
+            return {}
+        mib = 1024 * 1024
+        saving = footprint["float32_bytes"] / footprint["ram_bytes"] if footprint["ram_bytes"] else 1.0
+        print(f"📦 Collection '{self.collection_name}' ({footprint['quantization']}, {footprint['points']} vector): "
+              f"RAM vector ~{footprint['ram_bytes'] / mib:.1f} MiB "
+              f"(float32: {footprint['float32_bytes'] / mib:.1f} MiB, giảm {saving:.1f}x), "
+              f"vector gốc {footprint['original_bytes'] / mib:.1f} MiB")
+        return footprint